@@ -0,0 +1,155 @@
+"""Local load test for the read-only JSON API.
+
+By default a throwaway data directory is created with one account whose
+diary is filled with mock entries. The API is then started with uvicorn in a
+child process and hit by concurrent clients for a fixed duration. Clients keep
+the ETag of every URL and revalidate with If-None-Match, like a mobile app
+would. Pass --url/--user/--password to load an already running server.
+
+    python benchmarks/api_load.py --entries 5000 --concurrency 32 --duration 20
+
+Exits with status 1 when the overall p99 latency misses the target
+(Config.API_CONFIG['p99_target_ms'] unless --p99-ms is given).
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import random
+import socket
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from seed import PASSWORD, prepare_data  # 同时把 src 加入 sys.path
+from config import Config
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+USER = 'loadtest'
+
+
+def _serve(port):
+    import uvicorn
+    from api import app
+
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def start_server():
+    """在子进程中启动 API（fork 继承临时数据目录的配置），返回地址和进程"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.get_context('fork').Process(target=_serve, args=(port,), daemon=True)
+    process.start()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/api/health", timeout=1)
+            return base_url, process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("API server did not start")
+
+
+def workload(tags):
+    """Weighted request mix: (name, path, weight)"""
+    mix = [
+        ('entries', '/api/entries?limit=50', 40),
+        ('entries_range', '/api/entries?start=2024-01-01&end=2024-12-31&limit=20', 10),
+        ('search', '/api/search?q=%E5%BF%83%E6%83%85&limit=20', 15),
+        ('tags', '/api/tags?limit=20', 10),
+        ('insights', '/api/insights', 20),
+    ]
+    if tags:
+        mix.append(('entries_tags', f"/api/entries?tags={','.join(tags[:2])}&limit=20", 5))
+    return mix
+
+
+async def client(http, mix, deadline, samples, etags):
+    names, paths, weights = zip(*mix)
+    while time.perf_counter() < deadline:
+        idx = random.choices(range(len(paths)), weights)[0]
+        headers = {}
+        if paths[idx] in etags and random.random() < 0.5:
+            headers['If-None-Match'] = etags[paths[idx]]
+        started = time.perf_counter()
+        response = await http.get(paths[idx], headers=headers)
+        elapsed = time.perf_counter() - started
+        if response.status_code not in (200, 304):
+            samples.setdefault('errors', []).append(response.status_code)
+            continue
+        if 'etag' in response.headers:
+            etags[paths[idx]] = response.headers['etag']
+        samples.setdefault(names[idx], []).append(elapsed)
+        samples.setdefault('_status', []).append(response.status_code)
+
+
+async def run_load(base_url, user, password, mix, concurrency, duration):
+    samples = {}
+    etags = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, auth=(user, password), limits=limits,
+                                 headers={'Accept-Encoding': 'gzip'}, timeout=30) as http:
+        # 预热：认证缓存、标签索引、写作日历
+        for _, path, _ in mix:
+            await http.get(path)
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(client(http, mix, deadline, samples, etags) for _ in range(concurrency)))
+    return samples
+
+
+def report(samples, duration, target_ms):
+    statuses = samples.pop('_status', [])
+    errors = samples.pop('errors', [])
+    all_latencies = np.concatenate([np.array(values) for values in samples.values()]) * 1000
+    print(f"{'endpoint':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in sorted(samples.items()):
+        latencies = np.array(values) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{name:<16}{len(values):>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+    p50, p95, p99 = np.percentile(all_latencies, [50, 95, 99])
+    print(f"{'all':<16}{len(all_latencies):>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+    print(f"throughput: {len(all_latencies) / duration:.0f} req/s, "
+          f"304 responses: {statuses.count(304)}, errors: {len(errors)}")
+    passed = p99 <= target_ms and not errors
+    print(f"p99 target {target_ms} ms: {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="base URL of a running API (default: start a local one)")
+    parser.add_argument('--user', default=USER)
+    parser.add_argument('--password', default=PASSWORD)
+    parser.add_argument('--entries', type=int, default=2000, help="entries to generate for the local run")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--p99-ms', type=float, default=Config.API_CONFIG['p99_target_ms'])
+    args = parser.parse_args()
+
+    tags = []
+    if args.url:
+        base_url = args.url
+    else:
+        root, count, tags = prepare_data(args.entries, [args.user], args.password)
+        print(f"Generated {count} entries in {root}")
+        base_url, server = start_server()
+
+    try:
+        samples = asyncio.run(run_load(base_url, args.user, args.password, workload(tags),
+                                       args.concurrency, args.duration))
+    finally:
+        if not args.url:
+            server.terminate()
+    sys.exit(0 if report(samples, args.duration, args.p99_ms) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Concurrent-session load test for the Streamlit app, driven by AppTest.
+
+Each simulated session signs in, filters the timeline by tag, searches,
+changes the insights period, writes and saves a new entry, and goes back
+to the timeline. Accounts are spread over the sessions, and each account
+gets a seeded diary of --entries entries.
+
+AppTest keeps a process-wide runtime for the duration of a script run, so
+sessions cannot run in threads of one process. Instead --workers forked
+processes run concurrently (sharing the seeded databases and the on-disk
+cache, as replicas would), and each worker keeps its share of the sessions
+open at once, interleaving them step by step the way one Streamlit server
+interleaves its users' reruns. Memory growth per open session is measured
+inside the workers, after every session's first run (so the one-off
+import of the app and its dependencies is not counted per session).
+
+    python benchmarks/app_sessions.py --sessions 8 --workers 2 --users 4 --entries 5000
+
+Reports per-step p50/p95/p99 latency of a script run, throughput in runs per
+second and RSS growth. --output writes the numbers as JSON so runs can be
+compared; --max-p99-ms makes the script exit with status 1 when any step
+is slower than that.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+
+from seed import PASSWORD, SRC_DIR, prepare_data  # 同时把 src 加入 sys.path
+from i18n.zh import TRANSLATIONS as ZH
+
+APP_PATH = str(SRC_DIR / 'app.py')
+SEARCH_TERMS = ('开心', '工作', '朋友', '咖啡', '散步', '项目')
+
+
+def rss_bytes():
+    """当前进程的常驻内存"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # 非 Linux：退而使用峰值（macOS 单位为字节，其他为 KB）
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class SessionError(RuntimeError):
+    pass
+
+
+def _find(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise SessionError(f"No widget labelled {label!r}")
+
+
+class Session:
+    """一个模拟用户：持有自己的 AppTest，flow() 每运行一次脚本就让出一次"""
+
+    def __init__(self, username, password, timeout):
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.samples = []
+        self.at = None
+        self.rng = random.Random(username + str(os.getpid()))
+
+    def _pin_choices(self):
+        # AppTest 用格式化后的选项文本回传 selectbox/radio 的值，带 format_func 的
+        # 控件（语言切换器、标签匹配方式）在重新运行时会找不到当前值，这里按下标固定
+        for widget in (*self.at.selectbox, *self.at.radio):
+            try:
+                widget.index
+            except ValueError:
+                widget.set_value(widget.options[widget.proto.default])
+
+    def run(self, step):
+        self._pin_choices()
+        started = time.perf_counter()
+        self.at.run(timeout=self.timeout)
+        elapsed = time.perf_counter() - started
+        if self.at.exception:
+            raise SessionError(f"{self.username} {step}: {self.at.exception[0].value}")
+        self.samples.append((step, elapsed))
+
+    def sign_in(self):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+        self.run('open')
+        yield
+        _find(self.at.text_input, ZH['login.username']).input(self.username)
+        _find(self.at.text_input, ZH['login.password']).input(self.password)
+        _find(self.at.button, ZH['login.sign_in']).click()
+        self.run('sign_in')
+        if 'user' not in self.at.session_state:
+            raise SessionError(f"{self.username} sign_in: not signed in")
+        yield
+
+    def filter_tags(self):
+        _find(self.at.sidebar.selectbox, ZH['timeline.filter_by']).set_value(ZH['timeline.tags'])
+        self.run('filter_tags')
+        yield
+        tags = _find(self.at.sidebar.multiselect, ZH['timeline.select_tags'])
+        if tags.options:
+            tags.set_value([self.rng.choice(tags.options)])
+            self.run('filter_tags')
+            yield
+
+    def search(self):
+        _find(self.at.sidebar.selectbox, ZH['timeline.filter_by']).set_value(ZH['timeline.search'])
+        self.run('search')
+        yield
+        _find(self.at.sidebar.text_input, ZH['timeline.search_placeholder']).input(
+            self.rng.choice(SEARCH_TERMS)
+        )
+        self.run('search')
+        yield
+
+    def insights(self):
+        start = self.at.date_input(key='insights_start_date')
+        end = self.at.date_input(key='insights_end_date')
+        span = (end.value - start.value).days
+        start.set_value(start.value + timedelta(days=self.rng.randint(0, max(span // 2, 0))))
+        self.run('insights')
+        yield
+
+    def save(self):
+        _find(self.at.sidebar.radio, ZH['nav.title']).set_value(ZH['nav.new_entry'])
+        self.run('editor')
+        yield
+        _find(self.at.text_input, ZH['editor.entry_title']).input(f"负载测试 {time.time():.0f}")
+        _find(self.at.text_area, ZH['editor.content']).input(
+            f"今天{self.rng.choice(SEARCH_TERMS)}，心情不错。" * 5
+        )
+        _find(self.at.button, ZH['editor.save']).click()
+        self.run('save')
+        if not self.at.success:
+            raise SessionError(f"{self.username} save: no success message")
+        yield
+        _find(self.at.sidebar.radio, ZH['nav.title']).set_value(ZH['nav.timeline'])
+        self.run('timeline')
+        yield
+
+    def flow(self, iterations):
+        yield from self.sign_in()
+        for _ in range(iterations):
+            yield from self.filter_tags()
+            yield from self.search()
+            yield from self.insights()
+            yield from self.save()
+
+
+def run_worker(usernames, iterations, timeout):
+    """在一个进程中交替推进多个会话，返回耗时样本、失败和内存增长"""
+    logging.getLogger().setLevel(logging.WARNING)
+    rss_start = rss_bytes()
+    sessions = [Session(username, PASSWORD, timeout) for username in usernames]
+    flows = [session.flow(iterations) for session in sessions]
+    failures = []
+    rss_warm = None
+    while flows:
+        for flow in list(flows):
+            try:
+                next(flow)
+            except StopIteration:
+                flows.remove(flow)
+            except Exception as e:
+                failures.append(str(e))
+                flows.remove(flow)
+        # 第一轮之后所有会话都已打开，应用和依赖的导入不计入每个会话的内存
+        if rss_warm is None:
+            rss_warm = rss_bytes()
+    return {
+        'samples': [sample for session in sessions for sample in session.samples],
+        'failures': failures,
+        'sessions': len(sessions),
+        'rss_start': rss_start,
+        'rss_warm': rss_warm or rss_start,
+        'rss_end': rss_bytes(),
+    }
+
+
+def summarize(samples, wall_seconds):
+    steps = {}
+    for step, elapsed in samples:
+        steps.setdefault(step, []).append(elapsed * 1000)
+    result = {'steps': {}, 'runs': len(samples), 'wall_seconds': wall_seconds,
+              'throughput': len(samples) / wall_seconds if wall_seconds else 0.0}
+    for step, values in steps.items():
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        result['steps'][step] = {'count': len(values), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=4, help="simulated sessions")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help="processes running the sessions concurrently")
+    parser.add_argument('--users', type=int, default=2, help="accounts the sessions are spread over")
+    parser.add_argument('--entries', type=int, default=2000, help="seeded entries per account")
+    parser.add_argument('--iterations', type=int, default=2, help="passes through the flow per session")
+    parser.add_argument('--timeout', type=float, default=300, help="seconds allowed per script run")
+    parser.add_argument('--max-p99-ms', type=float, help="fail when a step's p99 exceeds this")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    usernames = [f"load{index:03d}" for index in range(max(1, args.users))]
+    root, count, _ = prepare_data(args.entries, usernames)
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"Seeded {len(usernames)} accounts with {count} entries each in {root}")
+
+    workers = max(1, min(args.workers, args.sessions))
+    assignments = [[] for _ in range(workers)]
+    for index in range(args.sessions):
+        assignments[index % workers].append(usernames[index % len(usernames)])
+
+    started = time.perf_counter()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        reports = list(pool.map(run_worker, assignments, [args.iterations] * workers,
+                                [args.timeout] * workers))
+    wall_seconds = time.perf_counter() - started
+
+    samples = [sample for report in reports for sample in report['samples']]
+    failures = [failure for report in reports for failure in report['failures']]
+    growth = sum(report['rss_end'] - report['rss_warm'] for report in reports)
+    result = summarize(samples, wall_seconds)
+    result.update({
+        'sessions': args.sessions, 'workers': workers, 'users': len(usernames), 'entries': count,
+        'iterations': args.iterations, 'failures': failures,
+        'rss_worker_start_mb': max(report['rss_start'] for report in reports) / 2**20,
+        'rss_worker_warm_mb': max(report['rss_warm'] for report in reports) / 2**20,
+        'rss_worker_end_mb': max(report['rss_end'] for report in reports) / 2**20,
+        'rss_per_session_mb': growth / 2**20 / max(args.sessions, 1),
+    })
+
+    print(f"{'step':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, stats in result['steps'].items():
+        print(f"{step:<14}{stats['count']:>7}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}"
+              f"{stats['p99_ms']:>10.0f}")
+    print(f"{result['runs']} script runs in {wall_seconds:.1f} s with {workers} workers: "
+          f"{result['throughput']:.2f} runs/s")
+    print(f"Worker RSS: {result['rss_worker_start_mb']:.0f} MB at start, "
+          f"{result['rss_worker_warm_mb']:.0f} MB with all sessions open, "
+          f"{result['rss_worker_end_mb']:.0f} MB at the end "
+          f"({result['rss_per_session_mb']:.1f} MB growth per session)")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(result, output, indent=2)
+
+    slow = [step for step, stats in result['steps'].items()
+            if args.max_p99_ms is not None and stats['p99_ms'] > args.max_p99_ms]
+    if slow:
+        print(f"p99 above {args.max_p99_ms} ms: {', '.join(slow)}")
+    sys.exit(1 if failures or slow else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Render time of the insight charts: pyecharts objects vs. option dicts.
+
+For each chart panel, builds the chart from the same synthetic aggregates
+three ways and times the Python work of one script run up to the point the
+options are handed to the Streamlit component (which serializes them once
+more; that step is included for all three):
+
+  pyecharts  the previous path: pyecharts chart objects, serialized and
+             parsed again by st_pyecharts
+  spec       chart_specs option dict and to_json(), a cache miss
+  cached     parsing the JSON from the shared cache, what a rerun does
+
+    python benchmarks/chart_render.py --buckets 365 --repeat 50
+
+Exits with status 1 when building a spec is slower than the pyecharts path
+for any panel.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+import simplejson
+from pyecharts import options as opts
+from pyecharts.charts import Bar, Calendar, Line, Pie, ThemeRiver, WordCloud
+from pyecharts.charts.base import default
+
+import seed  # noqa: F401  把 src 加入 sys.path
+import chart_specs
+from chart_specs import CHART_CONFIG
+
+FONT = CHART_CONFIG['font_family']
+MOODS = ['开心', '平静', '难过', '焦虑', '兴奋', '疲惫']
+
+
+def aggregates(buckets, topics, rng):
+    """与洞察页各图表查询结果形状相同的数据"""
+    first = date.today() - timedelta(days=buckets)
+    labels = [(first + timedelta(days=day)).isoformat() for day in range(buckets)]
+    return {
+        'labels': labels,
+        'moods': {mood: [rng.randrange(5) for _ in labels] for mood in MOODS},
+        'counts': [rng.randrange(4) for _ in labels],
+        'heatmap': [[label, rng.randrange(1, 5)] for label in labels if rng.random() < 0.7],
+        'first': first,
+        'last': first + timedelta(days=buckets - 1),
+        'distribution': [(mood, rng.randrange(10, 500)) for mood in MOODS],
+        'words': [(f'词语{index}', 1000 - index * 7) for index in range(100)],
+        'topics': [(label, rng.randrange(1, 10), f'主题{topic}')
+                   for label in labels[::7] for topic in range(topics)],
+    }
+
+
+# ---------------------------------------------------------------------------
+# 之前的 pyecharts 写法
+# ---------------------------------------------------------------------------
+
+def _title(title):
+    return opts.TitleOpts(title=title, subtitle='subtitle', title_textstyle_opts=opts.TextStyleOpts(font_family=FONT))
+
+
+def _axes(y_name, **y_axis):
+    return dict(
+        xaxis_opts=opts.AxisOpts(type_="category", name='date', name_location="end",
+                                 axislabel_opts=opts.LabelOpts(rotate=45)),
+        yaxis_opts=opts.AxisOpts(type_="value", name=y_name, name_location="end", **y_axis),
+        tooltip_opts=opts.TooltipOpts(trigger="axis"),
+    )
+
+
+def mood_trends(data):
+    line = Line()
+    line.add_xaxis(data['labels'])
+    for idx, (mood, values) in enumerate(data['moods'].items()):
+        line.add_yaxis(series_name=mood, y_axis=values, symbol_size=8,
+                       itemstyle_opts=opts.ItemStyleOpts(color=CHART_CONFIG['mood_colors'][idx]),
+                       label_opts=opts.LabelOpts(is_show=False))
+    line.set_global_opts(title_opts=_title('mood trends'),
+                         legend_opts=opts.LegendOpts(pos_top="5%", pos_left="center", orient="horizontal"),
+                         **_axes('times'))
+    return line
+
+
+def writing_frequency(data):
+    bar = Bar()
+    bar.add_xaxis(data['labels'])
+    bar.add_yaxis('entries', data['counts'], itemstyle_opts=opts.ItemStyleOpts(color='#1976D2'),
+                  label_opts=opts.LabelOpts(is_show=False))
+    bar.set_global_opts(title_opts=_title('writing frequency'),
+                        **_axes('entries', min_=0, max_=max(data['counts']) + 1, interval=1))
+    return bar
+
+
+def writing_calendar(data):
+    calendar = Calendar()
+    calendar.add(series_name='entries', yaxis_data=data['heatmap'], calendar_opts=opts.CalendarOpts(
+        range_=[data['first'].isoformat(), data['last'].isoformat()],
+        daylabel_opts=opts.CalendarDayLabelOpts(name_map='cn'),
+        monthlabel_opts=opts.CalendarMonthLabelOpts(name_map='cn'),
+    ))
+    calendar.set_global_opts(
+        title_opts=_title('writing calendar'),
+        visualmap_opts=opts.VisualMapOpts(max_=max(count for _, count in data['heatmap']), min_=0,
+                                          orient="horizontal", is_piecewise=False, pos_top="bottom",
+                                          pos_left="center", range_color=CHART_CONFIG['calendar_colors']),
+        tooltip_opts=opts.TooltipOpts(formatter="{c}"),
+    )
+    return calendar
+
+
+def mood_distribution(data):
+    return (
+        Pie()
+        .add("", [list(z) for z in data['distribution']], radius=["40%", "75%"])
+        .set_global_opts(title_opts=_title('mood distribution'), legend_opts=opts.LegendOpts(
+            orient="vertical", pos_top="15%", pos_left="2%", textstyle_opts=opts.TextStyleOpts(font_family=FONT)))
+        .set_series_opts(label_opts=opts.LabelOpts(formatter="{b}: {c} ({d}%)", font_family=FONT))
+    )
+
+
+def topic_wordcloud(data):
+    return (
+        WordCloud()
+        .add("", data['words'], word_size_range=[15, 80], textstyle_opts=opts.TextStyleOpts(font_family=FONT))
+        .set_global_opts(title_opts=_title('topic words'))
+    )
+
+
+def topic_trends(data):
+    return (
+        ThemeRiver()
+        .add(series_name=[], data=[list(row) for row in data['topics']],
+             singleaxis_opts=opts.SingleAxisOpts(pos_top="50", pos_bottom="50", type_="time"))
+        .set_global_opts(title_opts=_title('topic trends'),
+                         tooltip_opts=opts.TooltipOpts(trigger="axis", axis_pointer_type="line"),
+                         legend_opts=opts.LegendOpts(pos_top="15%", orient="horizontal",
+                                                     textstyle_opts=opts.TextStyleOpts(font_family=FONT)))
+    )
+
+
+PYECHARTS = {chart.__name__: chart for chart in (
+    mood_trends, writing_frequency, writing_calendar, mood_distribution, topic_wordcloud, topic_trends)}
+
+
+def pyecharts_path(name, data):
+    chart = PYECHARTS[name](data)
+    # st_pyecharts 的做法
+    return json.loads(simplejson.dumps(chart.get_options(), default=default, ignore_nan=True))
+
+
+# ---------------------------------------------------------------------------
+# chart_specs
+# ---------------------------------------------------------------------------
+
+def build_spec(name, data):
+    colors = CHART_CONFIG['mood_colors']
+    if name == 'mood_trends':
+        return chart_specs.time_series(
+            'mood trends', 'subtitle', data['labels'],
+            [chart_specs.series('line', mood, values, color=colors[idx], symbolSize=8)
+             for idx, (mood, values) in enumerate(data['moods'].items())],
+            'date', 'times')
+    if name == 'writing_frequency':
+        return chart_specs.time_series(
+            'writing frequency', 'subtitle', data['labels'],
+            [chart_specs.series('bar', 'entries', data['counts'], color='#1976D2')],
+            'date', 'entries', min=0, max=max(data['counts']) + 1, interval=1)
+    if name == 'writing_calendar':
+        return chart_specs.calendar_heatmap('writing calendar', 'subtitle', 'entries', data['heatmap'],
+                                            data['first'], data['last'], 'zh')
+    if name == 'mood_distribution':
+        return chart_specs.pie('mood distribution', 'subtitle', data['distribution'])
+    if name == 'topic_wordcloud':
+        return chart_specs.word_cloud('topic words', 'subtitle', data['words'])
+    return chart_specs.theme_river('topic trends', 'subtitle', data['topics'])
+
+
+def spec_path(name, data):
+    return json.loads(chart_specs.to_json(build_spec(name, data)))
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        options = function()
+        # 组件把参数再序列化一次，三种写法都要经过
+        json.dumps(options)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), options
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buckets', type=int, default=365, help="time buckets on the x axis")
+    parser.add_argument('--topics', type=int, default=10, help="topics in the theme river")
+    parser.add_argument('--repeat', type=int, default=30, help="timed runs per panel and path")
+    args = parser.parse_args()
+
+    data = aggregates(args.buckets, args.topics, random.Random(0))
+    print(f"{'panel':<20}{'pyecharts ms':>14}{'spec ms':>10}{'cached ms':>11}{'pyecharts KB':>14}{'spec KB':>9}")
+    slower = []
+    totals = [0.0, 0.0, 0.0]
+    for name in PYECHARTS:
+        old_ms, old = timed(lambda: pyecharts_path(name, data), args.repeat)
+        new_ms, _ = timed(lambda: spec_path(name, data), args.repeat)
+        spec = chart_specs.to_json(build_spec(name, data))
+        cached_ms, _ = timed(lambda: json.loads(spec), args.repeat)
+        old_kb = len(json.dumps(old, ensure_ascii=False, separators=(',', ':')).encode()) / 1024
+        print(f"{name:<20}{old_ms:>14.2f}{new_ms:>10.2f}{cached_ms:>11.2f}{old_kb:>14.1f}"
+              f"{len(spec.encode()) / 1024:>9.1f}")
+        totals = [total + ms for total, ms in zip(totals, (old_ms, new_ms, cached_ms))]
+        if new_ms > old_ms:
+            slower.append(name)
+
+    print(f"{'all panels':<20}{totals[0]:>14.2f}{totals[1]:>10.2f}{totals[2]:>11.2f}")
+    if slower:
+        print(f"Spec slower than pyecharts: {', '.join(slower)}")
+    sys.exit(1 if slower else 0)
+
+
+if __name__ == "__main__":
+    main()
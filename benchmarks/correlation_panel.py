@@ -0,0 +1,109 @@
+"""Timing of the mood correlation panel at millions of entries.
+
+Fills a throwaway database with synthetic entries (mood, weather, location,
+date, created_at only; the panel reads nothing else) in the old text-column
+layout, brings it up to date with the schema module as the app does (including
+the lookup-table migration), then measures the one-off
+encoding scan that is cached per data version and the contingency
+tables for random date ranges, which is what runs whenever the user changes
+the period.
+
+    python benchmarks/correlation_panel.py --entries 2000000 --ranges 50
+
+Exits with status 1 when the p95 time for a date range misses the target
+(Config.CORRELATION_CONFIG['target_ms'] unless --max-ms is given).
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import seed  # noqa: F401  把 src 加入 sys.path
+from config import Config
+from correlations import encode_entries, mood_correlations
+from schema import create_tables, ensure_schema, migrate, migrate_storage
+
+MOODS = ['开心', '平静', '难过', '焦虑', '兴奋', '疲惫', None]
+WEATHERS = ['晴朗', '多云', '阴天', '小雨', '大雨', '雪', None]
+LOCATIONS = ['家', '公司', '咖啡馆', '图书馆', '公园'] + [f'城市{i}' for i in range(200)] + [None]
+
+
+def fill(db, count, days, rng):
+    create_tables(db)
+    first = date.today() - timedelta(days=days)
+
+    def rows():
+        for index in range(count):
+            day = first + timedelta(days=rng.randrange(days))
+            mood = rng.choice(MOODS)
+            weather = rng.choice(WEATHERS)
+            # 让晴天和开心有一些关联，热图上能看出结构
+            if mood == '开心' and rng.random() < 0.3:
+                weather = '晴朗'
+            yield (str(index), day.isoformat(), f"{day.isoformat()} {rng.randrange(24):02d}:{rng.randrange(60):02d}:00",
+                   mood, weather, rng.choice(LOCATIONS))
+
+    db.executemany("INSERT INTO entries (id, date, title, created_at, mood, weather, location) "
+                   "VALUES (?, ?, '', ?, ?, ?, ?)", rows())
+    db.commit()
+    return first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000000, help="synthetic entries")
+    parser.add_argument('--days', type=int, default=3650, help="span of entry dates in days")
+    parser.add_argument('--ranges', type=int, default=30, help="random date ranges to time")
+    parser.add_argument('--max-ms', type=float, default=Config.CORRELATION_CONFIG['target_ms'],
+                        help="fail when the p95 time for a date range is above this")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory(prefix='diary-corr-') as directory:
+        db = sqlite3.connect(str(Path(directory) / 'diary.db'))
+        started = time.perf_counter()
+        first = fill(db, args.entries, args.days, rng)
+        print(f"Filled {args.entries} entries in {time.perf_counter() - started:.1f} s")
+
+        started = time.perf_counter()
+        ensure_schema(db)
+        migrate(db)
+        migrate_storage(db)
+        print(f"Schema and migrations: {time.perf_counter() - started:.1f} s")
+
+        started = time.perf_counter()
+        encoded = encode_entries(db)
+        encode_seconds = time.perf_counter() - started
+        print(f"Encoding scan: {encode_seconds:.2f} s, {encoded.nbytes / 2**20:.1f} MB cached")
+        db.close()
+
+    samples = []
+    for index in range(args.ranges):
+        # 第一次是全部日期，其余是随机时间段
+        if index == 0:
+            start, end = first, first + timedelta(days=args.days)
+        else:
+            start = first + timedelta(days=rng.randrange(args.days))
+            end = start + timedelta(days=rng.randrange(1, args.days))
+        started = time.perf_counter()
+        tables = mood_correlations(encoded, start, end)
+        samples.append((time.perf_counter() - started) * 1000)
+        if index == 0:
+            for dimension, table in tables.items():
+                print(f"  {dimension:<9} {len(table['moods'])}x{len(table['labels'])} "
+                      f"n={table['total']} V={table['cramers_v']:.3f}")
+
+    p50, p95 = np.percentile(samples, [50, 95])
+    print(f"Date ranges: {len(samples)}, p50 {p50:.1f} ms, p95 {p95:.1f} ms, max {max(samples):.1f} ms "
+          f"(target {args.max_ms:.0f} ms)")
+    sys.exit(1 if p95 > args.max_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Per-page memory profile of the Streamlit app, driven by AppTest.
+
+Runs one session through the same flow as app_sessions.py (timeline, tag
+filter, search, insights, editor, save) plus the clipper and admin pages,
+with the app's memory test mode on: every page run is wrapped in
+tracemalloc, and the peak Python allocation of each run is reported next to
+the process RSS.
+
+    python benchmarks/memory_profile.py --entries 20000
+
+Exits with status 1 when any page's peak is above --max-peak-mb (default:
+MEMORY_CONFIG['page_budget_mb']), so a change that makes a page build its
+whole result set in memory again is caught before it reaches a 512 MB
+container. --output writes the numbers as JSON.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+from app_sessions import Session, SessionError, _find, rss_bytes
+from seed import PASSWORD, prepare_data
+from config import Config
+from i18n.zh import TRANSLATIONS as ZH
+
+
+class ProfiledSession(Session):
+    """每次运行前清空页面峰值，运行后记下这次运行的峰值"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.peaks = []
+
+    def run(self, step):
+        from memory_budget import page_peaks, reset_page_peaks
+
+        reset_page_peaks()
+        super().run(step)
+        for page, stats in page_peaks().items():
+            self.peaks.append((step, page, stats['last_mb'], rss_bytes()))
+
+    def other_pages(self):
+        for page in (ZH['nav.web_clipper'], ZH['nav.admin']):
+            navigation = _find(self.at.sidebar.radio, ZH['nav.title'])
+            if page in navigation.options:
+                navigation.set_value(page)
+                self.run(page)
+                yield
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=5000, help="seeded entries")
+    parser.add_argument('--timeout', type=float, default=300, help="seconds allowed per script run")
+    parser.add_argument('--max-peak-mb', type=float, default=Config.MEMORY_CONFIG['page_budget_mb'],
+                        help="fail when a page run allocates more than this at peak")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    _, count, _ = prepare_data(args.entries, ['memprofile'])
+    logging.getLogger().setLevel(logging.WARNING)
+    Config.MEMORY_CONFIG['profile'] = True
+    print(f"Seeded {count} entries")
+
+    session = ProfiledSession('memprofile', PASSWORD, args.timeout)
+    started = time.perf_counter()
+    try:
+        for _ in session.flow(1):
+            pass
+        for _ in session.other_pages():
+            pass
+    except SessionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
+    wall_seconds = time.perf_counter() - started
+
+    print(f"{'step':<14}{'page':<10}{'peak MB':>10}{'RSS MB':>10}")
+    for step, page, peak_mb, rss in session.peaks:
+        print(f"{step:<14}{page:<10}{peak_mb:>10.1f}{rss / 2**20:>10.0f}")
+    worst = max((peak_mb for _, _, peak_mb, _ in session.peaks), default=0.0)
+    print(f"{len(session.peaks)} page runs in {wall_seconds:.1f} s, largest peak {worst:.1f} MB "
+          f"(budget {args.max_peak_mb:.0f} MB)")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'entries': count,
+                'max_peak_mb': args.max_peak_mb,
+                'runs': [{'step': step, 'page': page, 'peak_mb': peak_mb, 'rss_mb': rss / 2**20}
+                         for step, page, peak_mb, rss in session.peaks],
+            }, output, indent=2)
+
+    over = sorted({step for step, _, peak_mb, _ in session.peaks if peak_mb > args.max_peak_mb})
+    if over:
+        print(f"Peak above {args.max_peak_mb:.0f} MB: {', '.join(over)}")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Seeded, throwaway data directories for the benchmarks.
+
+prepare_data() points every Config path at a fresh temp directory, creates
+the requested accounts and fills the first account's diary with mock
+entries (the demo generator, duplicated with shifted dates until the target
+size is reached). The other accounts get a copy of that shard.
+"""
+import shutil
+import sqlite3
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from config import Config  # noqa: E402
+
+PASSWORD = 'loadtest-password'
+SEED_TAGS = ('工作', '生活', '旅行', '读书', '运动', '家人')
+
+
+def use_temp_data_dir():
+    """Point Config at a new temp directory and return it"""
+    root = Path(tempfile.mkdtemp(prefix='diary-bench-'))
+    Config.DATA_DIR = root
+    Config.DB_PATH = root / 'diary.db'
+    Config.UPLOAD_DIR = root / 'uploads'
+    Config.CLIP_CACHE_DIR = root / 'clip_cache'
+    Config.VECTOR_DIR = root / 'vectors'
+    Config.TOPIC_MODEL_PATH = root / 'topic_model.npz'
+    Config.ACCOUNTS_DB_PATH = root / 'accounts.db'
+    Config.USERS_DIR = root / 'users'
+    Config.CACHE_DB_PATH = root / 'cache.db'
+    Config.ATTACHMENT_CACHE_DIR = root / 'attachment_cache'
+    Config.MAINTENANCE_DB_PATH = root / 'maintenance.db'
+    Config.MAINTENANCE_LOCK_PATH = root / 'maintenance.lock'
+    Config()
+    return root
+
+
+def _grow(db_path, entries):
+    """复制模拟日记并把日期往前平移，直到达到目标数量"""
+    db = sqlite3.connect(str(db_path))
+    db.execute("CREATE TEMP TABLE seed AS SELECT id FROM entries")
+    seed = db.execute("SELECT COUNT(*) FROM seed").fetchone()[0]
+    shift = 0
+    while seed and db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] < entries:
+        shift += 31
+        db.execute(f"""
+            INSERT INTO entries (id, date, title, content, mood_id, weather_id, location_id, attachments)
+            SELECT id || '_{shift}', date(date, '-{shift} days'), title, content, mood_id, weather_id,
+                   location_id, attachments
+            FROM entries WHERE id IN (SELECT id FROM seed)
+        """)
+        db.execute(f"""
+            INSERT INTO entry_tags (entry_id, tag_id)
+            SELECT entry_id || '_{shift}', tag_id FROM entry_tags
+            WHERE entry_id IN (SELECT id FROM seed)
+        """)
+    db.commit()
+    return db
+
+
+def _tag(db):
+    """模拟数据没有标签时，按 rowid 给每篇日记分配一到两个标签"""
+    if db.execute("SELECT COUNT(*) FROM tags").fetchone()[0]:
+        return
+    db.executemany("INSERT INTO tags (id, name) VALUES (?, ?)",
+                   [(str(uuid.uuid4()), name) for name in SEED_TAGS])
+    db.execute(f"""
+        INSERT OR IGNORE INTO entry_tags (entry_id, tag_id)
+        SELECT e.id, t.id FROM entries e
+        JOIN tags t ON t.rowid = e.rowid % {len(SEED_TAGS)} + 1
+    """)
+    db.execute("""
+        INSERT OR IGNORE INTO entry_tags (entry_id, tag_id)
+        SELECT e.id, t.id FROM entries e
+        JOIN tags t ON t.rowid = e.rowid % 4 + 1
+        WHERE e.rowid % 3 = 0
+    """)
+    db.commit()
+
+
+def prepare_data(entries, users=('loadtest',), password=PASSWORD):
+    """Create the accounts and their diaries; returns (root, entries per user, tag names)"""
+    root = use_temp_data_dir()
+
+    from mock_data import generate_mock_data
+    from schema import ensure_schema, migrate, migrate_storage
+    from sentiment import score_entries
+    from tenancy import create_first_admin, create_user, get_tenant
+    from topic_model import fold_in
+
+    users = list(users)
+    create_first_admin(users[0], password)
+    for username in users[1:]:
+        create_user(username, password)
+    first = get_tenant(users[0])
+    generate_mock_data(first.db_path, first.topic_model_path)
+
+    db = _grow(first.db_path, entries)
+    _tag(db)
+    ensure_schema(db)
+    migrate(db)
+    migrate_storage(db)
+    fold_in(db, model_path=first.topic_model_path)
+    score_entries(db)
+    count = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    tags = [row[0] for row in db.execute("SELECT name FROM tags LIMIT 5")]
+    db.close()
+
+    for username in users[1:]:
+        shutil.copytree(first.data_dir, get_tenant(username).data_dir, dirs_exist_ok=True)
+    return root, count, tags
@@ -0,0 +1,168 @@
+"""写作日历：按天计数的紧凑数组，用于热力图、连续写作天数和"那年今日"
+
+每天的日记数存放在一个 int32 数组中，下标为距 1970-01-01 的天数（减去数组起点）。
+数组按 entries 的 rowid 水位增量同步，之后任意时间段的统计都是数组切片上的向量运算。
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+_EPOCH = date(1970, 1, 1)
+
+
+def epoch_day(day):
+    """日期转换为距 1970-01-01 的天数"""
+    if not isinstance(day, date):
+        day = date.fromisoformat(str(day))
+    return (day - _EPOCH).days
+
+
+def _runs(active):
+    """返回布尔数组中连续 True 段的 (起点, 终点)，终点不含"""
+    edges = np.diff(np.concatenate(([0], active.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+class ActivityCalendar:
+    """一个数据库对应的每日写作计数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._counts = np.zeros(0, dtype=np.int32)
+        self._origin = 0         # _counts[0] 对应的 epoch day
+        self._rowid = 0          # 已加载的 entries 最大 rowid
+        self._mark = None        # 水位上那一行的 (id, date)
+
+    def _unchanged(self, db):
+        """上次加载到的最后一行是否还在原处"""
+        return not self._rowid or db.execute(
+            "SELECT id, substr(date, 1, 10) FROM entries WHERE rowid = ?", (self._rowid,)
+        ).fetchone() == self._mark
+
+    def _ensure_range(self, first, last):
+        """扩展数组使其覆盖 [first, last]，按倍数预留空间"""
+        if not len(self._counts):
+            self._origin = first
+            self._counts = np.zeros(max(last - first + 1, 366), dtype=np.int32)
+            return
+        end = self._origin + len(self._counts)
+        if first < self._origin:
+            grow = max(self._origin - first, len(self._counts))
+            self._counts = np.concatenate((np.zeros(grow, dtype=np.int32), self._counts))
+            self._origin -= grow
+        if last >= end:
+            grow = max(last - end + 1, len(self._counts))
+            self._counts = np.concatenate((self._counts, np.zeros(grow, dtype=np.int32)))
+
+    def refresh(self, db):
+        """从数据库增量加载新日记的日期"""
+        with self._lock:
+            if not self._unchanged(db):
+                # 数据库被重建过（例如重新生成模拟数据或恢复备份），从头加载
+                self._reset()
+            max_rowid, = db.execute("SELECT COALESCE(MAX(rowid), 0) FROM entries").fetchone()
+            if max_rowid == self._rowid:
+                return
+
+            rows = db.execute(
+                "SELECT rowid, substr(date, 1, 10), id FROM entries WHERE rowid > ? ORDER BY rowid",
+                (self._rowid,)
+            ).fetchall()
+            if not rows:
+                return
+            days = np.array([row[1] for row in rows], dtype='datetime64[D]').astype(np.int64)
+            self._ensure_range(int(days.min()), int(days.max()))
+            np.add.at(self._counts, days - self._origin, 1)
+            self._rowid = rows[-1][0]
+            self._mark = (rows[-1][2], rows[-1][1])
+
+    def _slice(self, start, end):
+        """返回 [start, end] 每天的日记数，超出已有数据的部分为 0"""
+        first, last = epoch_day(start), epoch_day(end)
+        result = np.zeros(max(last - first + 1, 0), dtype=np.int32)
+        lo = max(first, self._origin)
+        hi = min(last, self._origin + len(self._counts) - 1)
+        if lo <= hi:
+            result[lo - first:hi - first + 1] = self._counts[lo - self._origin:hi - self._origin + 1]
+        return result
+
+    def counts(self, start, end):
+        """返回 [start, end] 每天的日记数"""
+        with self._lock:
+            return self._slice(start, end)
+
+    def bucket_totals(self, start, end, keys):
+        """按桶（bucket_keys 返回的起始日期）汇总 [start, end] 的日记数"""
+        with self._lock:
+            counts = self._slice(start, end)
+        if not len(counts):
+            return [0] * len(keys)
+        first = epoch_day(start)
+        offsets = np.array([max(epoch_day(key) - first, 0) for key in keys], dtype=np.int64)
+        return np.add.reduceat(counts, offsets).tolist()
+
+    def heatmap(self, start, end):
+        """返回热力图数据 [[ISO 日期, 日记数], ...]，只包含写过日记的日子"""
+        with self._lock:
+            counts = self._slice(start, end)
+        first = np.datetime64(_EPOCH) + np.timedelta64(epoch_day(start), 'D')
+        days = np.flatnonzero(counts)
+        return [[str(first + offset), int(counts[offset])] for offset in days]
+
+    def streaks(self, start, end):
+        """返回 (截至 end 的当前连续天数, 时间段内最长连续天数)
+
+        end 当天还没写时，截至前一天的连续记录仍算作当前连续。
+        """
+        with self._lock:
+            active = self._slice(start, end) > 0
+        if not active.any():
+            return 0, 0
+        starts, stops = _runs(active)
+        longest = int((stops - starts).max())
+        last = len(active) - 1
+        current = 0
+        if stops[-1] in (last + 1, last):
+            current = int(stops[-1] - starts[-1])
+        return current, longest
+
+    def active_days(self, start, end):
+        """时间段内写过日记的天数"""
+        with self._lock:
+            return int(np.count_nonzero(self._slice(start, end)))
+
+    def on_this_day(self, day):
+        """返回往年同月同日写过日记的日期，按年份倒序"""
+        if not isinstance(day, date):
+            day = date.fromisoformat(str(day))
+        with self._lock:
+            if not len(self._counts):
+                return []
+            first_year = (_EPOCH + timedelta(days=self._origin)).year
+            dates = []
+            for year in range(day.year - 1, first_year - 1, -1):
+                try:
+                    candidate = day.replace(year=year)
+                except ValueError:
+                    continue  # 2 月 29 日
+                offset = epoch_day(candidate) - self._origin
+                if 0 <= offset < len(self._counts) and self._counts[offset]:
+                    dates.append(candidate)
+            return dates
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def get_activity_calendar(db_path):
+    """获取指定数据库的共享写作日历"""
+    with _calendars_lock:
+        calendar = _calendars.get(str(db_path))
+        if calendar is None:
+            calendar = _calendars[str(db_path)] = ActivityCalendar()
+        return calendar
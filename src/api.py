@@ -0,0 +1,357 @@
+"""只读 HTTP/JSON API：供移动端和小组件读取日记和统计数据
+
+    python src/api.py          # 或 uvicorn api:app --app-dir src --port 8502
+
+使用 HTTP Basic 认证（与网页版相同的账户），每个请求从该用户的连接池取连接；
+用户的数据库在本进程中第一次被访问时建表和迁移（与网页端相同）。
+所有响应都带 ETag，它由用户、请求地址和用户数据的版本（Tenant.data_version()，
+写入用户可见数据的提交才会改变）算出；客户端带上 If-None-Match 且数据没有变化时
+直接返回 304，不查询日记。较大的响应用 gzip 压缩，
+压缩与否内容相同但字节不同，所以 ETag 是弱校验值（W/"..."）。
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from activity_calendar import get_activity_calendar
+from bucketing import bucket_expression, bucket_keys, bucket_label, choose_granularity, fill_series
+from config import Config
+from entry_bodies import load_body
+from entry_queries import date_filter, entry_dict, fetch_entries, semantic_filter, tag_filter, text_filter
+from tag_query import MODE_ALL, MODE_ANY
+from schema import prepare
+from tag_service import get_tag_index, suggest_tags
+from tenancy import authenticate, get_tenant
+
+logger = logging.getLogger(__name__)
+
+API_CONFIG = Config.API_CONFIG
+
+
+# ---------------------------------------------------------------------------
+# 认证
+# ---------------------------------------------------------------------------
+
+class _AuthCache:
+    """缓存认证结果，避免每个请求都做一次 PBKDF2"""
+
+    def __init__(self, ttl, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def _key(username, password):
+        return hashlib.sha256(f"{username}\0{password}".encode('utf-8')).digest()
+
+    def get(self, username, password):
+        key = self._key(username, password)
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        user = authenticate(username, password)
+        if user is not None:
+            with self._lock:
+                if len(self._entries) >= self.max_size:
+                    self._entries.clear()
+                self._entries[key] = (user, time.monotonic() + self.ttl)
+        return user
+
+
+_auth_cache = _AuthCache(API_CONFIG['auth_cache_ttl'])
+
+
+def _tenant(request):
+    """从 Basic 认证头解析用户，返回其 Tenant"""
+    header = request.headers.get('authorization', '')
+    scheme, _, credentials = header.partition(' ')
+    user = None
+    if scheme.lower() == 'basic':
+        try:
+            username, _, password = base64.b64decode(credentials).decode('utf-8').partition(':')
+            user = _auth_cache.get(username, password)
+        except (binascii.Error, UnicodeDecodeError):
+            user = None
+    if user is None:
+        raise HTTPException(401, headers={'WWW-Authenticate': 'Basic realm="diary"'})
+    tenant = get_tenant(user['username'])
+    if not tenant.db_path.exists():
+        raise HTTPException(404, detail="No diary for this account yet")
+    try:
+        prepare(tenant)
+    except sqlite3.Error as e:
+        logger.error(f"Could not prepare the database of {tenant.username}: {e}", exc_info=True)
+        raise HTTPException(500, detail="Database unavailable")
+    return tenant
+
+
+# ---------------------------------------------------------------------------
+# 条件响应
+# ---------------------------------------------------------------------------
+
+def _etag(tenant, request):
+    fingerprint = f"{tenant.username}|{tenant.data_version()}|{request.url.path}?{request.url.query}"
+    return 'W/"' + hashlib.blake2b(fingerprint.encode('utf-8'), digest_size=16).hexdigest() + '"'
+
+
+def _matches(etag, if_none_match):
+    """If-None-Match 按弱比较：忽略 W/ 前缀"""
+    if if_none_match.strip() == '*':
+        return True
+    return etag.removeprefix('W/') in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+
+
+def _conditional(request, build):
+    """数据未变化时返回 304，否则调用 build(tenant, db) 生成 JSON 响应"""
+    tenant = _tenant(request)
+    etag = _etag(tenant, request)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if _matches(etag, request.headers.get('if-none-match', '')):
+        return Response(status_code=304, headers=headers)
+
+    db = tenant.connect()
+    try:
+        payload = build(tenant, db)
+    except sqlite3.Error as e:
+        logger.error(f"API query failed for {tenant.username}: {e}")
+        raise HTTPException(500, detail="Query failed")
+    finally:
+        db.close()
+    return JSONResponse(payload, headers=headers)
+
+
+# ---------------------------------------------------------------------------
+# 参数
+# ---------------------------------------------------------------------------
+
+def _int_param(request, name, default, maximum):
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise HTTPException(400, detail=f"{name} must be an integer")
+    return max(1, min(value, maximum))
+
+
+def _date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, detail=f"{name} must be YYYY-MM-DD")
+
+
+def _list_param(request, name):
+    return [item.strip() for item in request.query_params.get(name, '').split(',') if item.strip()]
+
+
+def _encode_cursor(row):
+    return base64.urlsafe_b64encode(json.dumps([row[1], row[0]]).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if isinstance(after, list) and len(after) == 2:
+            return after
+    except (ValueError, binascii.Error):
+        pass
+    raise HTTPException(400, detail="Invalid cursor")
+
+
+def _date_range(db, request):
+    """查询参数中的起止日期，缺省时使用全部日记的日期范围"""
+    start, end = _date_param(request, 'start'), _date_param(request, 'end')
+    if start is None or end is None:
+        min_date, max_date = db.execute("SELECT MIN(date), MAX(date) FROM entries").fetchone()
+        today = date.today()
+        start = start or (date.fromisoformat(min_date[:10]) if min_date else today)
+        end = end or (date.fromisoformat(max_date[:10]) if max_date else today)
+    if start > end:
+        raise HTTPException(400, detail="start must not be after end")
+    return start, end
+
+
+# ---------------------------------------------------------------------------
+# 接口
+# ---------------------------------------------------------------------------
+
+def health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+def list_entries(request):
+    """分页列出日记，可按日期和标签过滤；用 next_cursor 取下一页"""
+    limit = _int_param(request, 'limit', API_CONFIG['page_size'], API_CONFIG['max_page_size'])
+    cursor = request.query_params.get('cursor')
+    after = _decode_cursor(cursor) if cursor else None
+    mode = MODE_ALL if request.query_params.get('mode') == 'all' else MODE_ANY
+
+    def build(tenant, db):
+        conditions, params = [], []
+        start, end = _date_param(request, 'start'), _date_param(request, 'end')
+        if start or end:
+            date_conditions, date_params = date_filter(start or date.min, end or date.max)
+            conditions += date_conditions
+            params += date_params
+        tag_conditions, tag_params = tag_filter(
+            db, _list_param(request, 'tags'), _list_param(request, 'exclude'), mode
+        )
+        rows = fetch_entries(db, conditions + tag_conditions, params + tag_params,
+                             limit=limit + 1, after=after)
+        next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return {'entries': [entry_dict(row) for row in rows[:limit]], 'next_cursor': next_cursor}
+
+    return _conditional(request, build)
+
+
+def get_entry(request):
+    """单篇日记，列表接口只返回 preview，这里附带全文 content"""
+    entry_id = request.path_params['entry_id']
+
+    def build(tenant, db):
+        rows = fetch_entries(db, ["e.id = ?"], [entry_id])
+        if not rows:
+            raise HTTPException(404, detail="Entry not found")
+        entry = entry_dict(rows[0])
+        entry['content'] = load_body(db, entry_id)
+        return entry
+
+    return _conditional(request, build)
+
+
+def search(request):
+    """全文子串搜索，semantic=1 时使用向量索引做语义搜索"""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        raise HTTPException(400, detail="q is required")
+    limit = _int_param(request, 'limit', API_CONFIG['page_size'], API_CONFIG['max_page_size'])
+    semantic = request.query_params.get('semantic') in ('1', 'true')
+
+    def build(tenant, db):
+        if semantic:
+            conditions, params, scores = semantic_filter(db, tenant.vector_dir, query, limit)
+            entries = [entry_dict(row) for row in fetch_entries(db, conditions, params)]
+            for entry in entries:
+                entry['score'] = round(scores.get(entry['id'], 0.0), 4)
+            entries.sort(key=lambda entry: entry['score'], reverse=True)
+        else:
+            conditions, params = text_filter(query)
+            entries = [entry_dict(row) for row in fetch_entries(db, conditions, params, limit=limit)]
+        return {'query': query, 'semantic': semantic, 'entries': entries}
+
+    return _conditional(request, build)
+
+
+def list_tags(request):
+    """标签补全，按使用次数和最近使用时间排序"""
+    query = request.query_params.get('q', '')
+    limit = _int_param(request, 'limit', API_CONFIG['page_size'], API_CONFIG['max_page_size'])
+
+    def build(tenant, db):
+        names = suggest_tags(db, tenant.db_path, query, (), limit)
+        index = get_tag_index(tenant.db_path)
+        tags = []
+        for name in names:
+            count, last_used = index.usage(name)
+            tags.append({'name': name, 'count': count, 'last_used': last_used})
+        return {'tags': tags}
+
+    return _conditional(request, build)
+
+
+def insights(request):
+    """时间段内的写作频率、字数、连续写作天数、心情分布和主题"""
+
+    def build(tenant, db):
+        start, end = _date_range(db, request)
+        granularity = choose_granularity(start, end)
+        keys = bucket_keys(start, end, granularity)
+
+        calendar = get_activity_calendar(tenant.db_path)
+        calendar.refresh(db)
+        counts = calendar.bucket_totals(start, end, keys)
+        current_streak, longest_streak = calendar.streaks(start, end)
+
+        words = db.execute(f"""
+            SELECT {bucket_expression(granularity)} as bucket, AVG(word_count)
+            FROM entries
+            WHERE date BETWEEN ? AND ?
+            GROUP BY bucket
+        """, (str(start), str(end))).fetchall()
+        avg_words = fill_series(keys, words, default=None)
+        moods = db.execute("""
+            SELECT m.name, g.count
+            FROM (
+                SELECT mood_id, COUNT(*) AS count FROM entries
+                WHERE date BETWEEN ? AND ? AND mood_id IS NOT NULL
+                GROUP BY mood_id
+            ) g
+            JOIN moods m ON m.id = g.mood_id
+            ORDER BY g.count DESC
+        """, (str(start), str(end))).fetchall()
+        topics = db.execute("""
+            SELECT tp.topic, COUNT(*) FROM entries e
+            JOIN topics tp ON tp.entry_id = e.id
+            WHERE e.date BETWEEN ? AND ? AND tp.topic IS NOT NULL
+            GROUP BY tp.topic ORDER BY COUNT(*) DESC LIMIT 10
+        """, (str(start), str(end))).fetchall()
+
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'granularity': granularity,
+            'buckets': [
+                {
+                    'start': key,
+                    'label': bucket_label(key, granularity),
+                    'entries': count,
+                    'avg_words': round(avg, 1) if avg is not None else None,
+                }
+                for key, count, avg in zip(keys, counts, avg_words)
+            ],
+            'active_days': calendar.active_days(start, end),
+            'streaks': {'current': current_streak, 'longest': longest_streak},
+            'moods': [{'mood': mood, 'count': count} for mood, count in moods],
+            'topics': [{'topic': topic, 'count': count} for topic, count in topics],
+        }
+
+    return _conditional(request, build)
+
+
+routes = [
+    Route('/api/health', health),
+    Route('/api/entries', list_entries),
+    Route('/api/entries/{entry_id}', get_entry),
+    Route('/api/search', search),
+    Route('/api/tags', list_tags),
+    Route('/api/insights', insights),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(GZipMiddleware, minimum_size=API_CONFIG['gzip_min_size'])],
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(app, host=API_CONFIG['host'], port=API_CONFIG['port'])
@@ -1,16 +1,46 @@
 import streamlit as st
 import sqlite3
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
 import json
 from pathlib import Path
 import uuid
 import shutil
+import hmac
 import logging
 import os
 from config import Config
+from activity_calendar import get_activity_calendar
+from clipper import clip_urls
+from bucketing import DAY, bucket_expression, bucket_keys, bucket_label, choose_granularity, fill_series
 from i18n.manager import t, I18nManager
 from streamlit_timeline import timeline
 from annotated_text import annotated_text
+from tag_query import MODE_ALL, MODE_ANY
+from tag_service import suggest_tags
+from text_metrics import compute_metrics
+from vector_index import get_vector_index
+from timeline_cards import CARD_CSS, EN_WEEKDAYS, ZH_WEEKDAYS, entry_version, render_card
+from entry_queries import count_entries, date_filter, iter_entries, semantic_filter, tag_filter, text_filter
+from topic_model import fold_in as fold_in_topics
+from sentiment import score_entries as score_sentiment
+from tenancy import (AccountError, authenticate, create_first_admin, create_user, get_tenant,
+                     has_users, scan_shards)
+from shared_cache import get_cache
+from attachment_text import STATUS_UNSUPPORTED, resume_pending
+from entry_bodies import load_body, store_body
+from maintenance import get_scheduler, maintenance_stats, start_maintenance
+from memory_budget import iter_rows, keep_common, text_chunks, track_page
+from chart_specs import (CHART_CONFIG, calendar_heatmap, pie, series, theme_river, time_series,
+                         to_json as chart_json, word_cloud)
+from correlations import encode_entries, mood_correlations
+from drafts import get_draft_writer, latest_draft
+from local_time import get_timezone, set_timezone, stamp_entries as stamp_local_time, timezones
+from save_pipeline import (TASKS as SAVE_TASKS, entry_status, get_save_worker, queue_tasks,
+                           resume_pending as resume_saves)
+from vocabulary import (KINDS as VOCABULARY_KINDS, options as vocabulary_options,
+                        resolve as resolve_vocabulary)
+from schema import create_tables, ensure_schema, migrate as migrate_schema
 
 # 设置 watchdog 的日志级别为 WARNING，减少调试输出
 logging.getLogger('watchdog').setLevel(logging.WARNING)
@@ -22,14 +52,51 @@ logger = logging.getLogger(__name__)
 # 使用 Config 类的属性
 config = Config()
 ALLOWED_EXTENSIONS = config.APP_CONFIG['allowed_extensions']
+MEMORY_CONFIG = config.MEMORY_CONFIG
+VOCABULARY_CONFIG = config.VOCABULARY_CONFIG
+SAVE_CONFIG = config.SAVE_CONFIG
+
+# 相似检索返回的条数
+SEMANTIC_SEARCH_LIMIT = 20
+SIMILAR_ENTRIES_LIMIT = 10
+
+# 语言选择器中显示的名称
+LANGUAGE_NAMES = {'zh': '中文', 'en': 'English'}
+
+def current_tenant():
+    """Return the data directory and connection pool of the signed-in user"""
+    return get_tenant(st.session_state['user']['username'])
+
+def cached(name, params, compute):
+    """Return compute() for the signed-in user's data through the shared cache
+
+    Results are keyed by the user's database version, so any committed write
+    invalidates them; other replicas on the same volume reuse them.
+    """
+    tenant = current_tenant()
+    return get_cache().get_or_compute(str(tenant.db_path), tenant.data_version(), name, params, compute)
+
+def chart_spec(panel, params, build):
+    """Return the ECharts option JSON of a chart through the shared cache
+
+    The JSON is keyed by panel, params (date range, granularity), the user's
+    data version and the interface language, so reruns skip building it.
+    """
+    lang = I18nManager.get_current_lang()
+    return cached(f'chart.{panel}', (*params, lang), lambda: chart_json(build()))
+
+def show_chart(spec, height="300px"):
+    """Render option JSON from chart_spec()"""
+    from streamlit_echarts import st_echarts
+    st_echarts(options=json.loads(spec), height=height)
 
 def init_db():
     """Initialize database connection"""
     try:
-        config = Config()
-        db = sqlite3.connect(str(config.DB_PATH))
-        db.execute("PRAGMA foreign_keys = ON")
-        return db
+        # 有请求时后台维护让出
+        get_scheduler().note_activity()
+        # 连接来自当前用户的连接池，close() 会把它放回池中
+        return current_tenant().connect()
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         return None
@@ -64,12 +131,13 @@ def save_uploaded_file(uploaded_file):
     try:
         # Debug logging
         logger.debug(f"Attempting to save file: {uploaded_file.name}")
-        logger.debug(f"Upload directory: {config.UPLOAD_DIR}")
+        tenant = current_tenant()
+        logger.debug(f"Upload directory: {tenant.upload_dir}")
         
         # Ensure upload directory exists with proper permissions
-        config.UPLOAD_DIR.mkdir(exist_ok=True, parents=True)
-        logger.debug(f"Upload directory exists: {config.UPLOAD_DIR.exists()}")
-        logger.debug(f"Upload directory permissions: {oct(config.UPLOAD_DIR.stat().st_mode)[-3:]}")
+        tenant.upload_dir.mkdir(exist_ok=True, parents=True)
+        logger.debug(f"Upload directory exists: {tenant.upload_dir.exists()}")
+        logger.debug(f"Upload directory permissions: {oct(tenant.upload_dir.stat().st_mode)[-3:]}")
         
         # Create unique filename
         file_extension = Path(uploaded_file.name).suffix.lower()
@@ -79,7 +147,7 @@ def save_uploaded_file(uploaded_file):
             return None
             
         unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = config.UPLOAD_DIR / unique_filename
+        file_path = tenant.upload_dir / unique_filename
         
         # Debug file path
         logger.debug(f"Generated file path: {file_path}")
@@ -100,7 +168,7 @@ def save_uploaded_file(uploaded_file):
                 raise Exception("File was not saved successfully")
                 
             # Return relative path from data directory
-            relative_path = file_path.relative_to(config.DATA_DIR)
+            relative_path = file_path.relative_to(tenant.data_dir)
             logger.debug(f"Returning relative path: {relative_path}")
             return str(relative_path)
             
@@ -113,14 +181,22 @@ def save_uploaded_file(uploaded_file):
         st.error(f"Failed to save uploaded file: {str(e)}")
         return None
 
-def save_entry(title, content, uploaded_files, tags=None, mood=None, weather=None, location=None):
-    """Save entry with attachments and tags"""
+def save_entry(title, content, uploaded_files, tags=None, mood=None, weather=None, location=None,
+               attachments=None):
+    """Save entry with attachments and tags, returning the new entry's id (None on failure)
+    
+    `attachments` holds paths (relative to the data directory) of files that
+    are already in the upload store, e.g. images downloaded by the clipper.
+    Only the entry itself is written here; indexing, topics, sentiment and
+    attachment text are queued in the same transaction and done in the
+    background (see save_pipeline).
+    """
     db = init_db()
     entry_id = str(uuid.uuid4())
     
     try:
         # Save uploaded files
-        attachment_paths = []
+        attachment_paths = list(attachments or [])
         if uploaded_files:
             for file in uploaded_files:
                 path = save_uploaded_file(file)
@@ -130,50 +206,82 @@ def save_entry(title, content, uploaded_files, tags=None, mood=None, weather=Non
                     raise Exception("Failed to save uploaded file")
         
         # Save entry to database
+        char_count, cjk_count, word_count, sentence_count = compute_metrics(content)
         db.execute('''
-            INSERT INTO entries (id, date, title, content, attachments, mood, weather, location)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO entries (id, date, title, attachments, mood_id, weather_id, location_id,
+                                 char_count, cjk_count, word_count, sentence_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             entry_id,
             datetime.now().strftime('%Y-%m-%d'),
             title,
-            content,
             json.dumps(attachment_paths),
-            mood,
-            weather,
-            location
+            resolve_vocabulary(db, 'mood', mood),
+            resolve_vocabulary(db, 'weather', weather),
+            resolve_vocabulary(db, 'location', location),
+            char_count,
+            cjk_count,
+            word_count,
+            sentence_count
         ))
+        store_body(db, entry_id, content)
+        stamp_local_time(db, [entry_id])
         
         # Save tags
         if tags:
-            for tag in tags:
-                # First, ensure the tag exists in the tags table
-                db.execute('INSERT OR IGNORE INTO tags (id, name) VALUES (?, ?)', 
-                         (str(uuid.uuid4()), tag))
-                
-                # Get the tag_id
-                cursor = db.execute('SELECT id FROM tags WHERE name = ?', (tag,))
-                tag_id = cursor.fetchone()[0]
-                
-                # Link the tag to the entry
-                db.execute('''
-                    INSERT INTO entry_tags (entry_id, tag_id)
-                    VALUES (?, ?)
-                ''', (entry_id, tag_id))
-        
+            tags = list(dict.fromkeys(tags))
+            db.executemany('INSERT OR IGNORE INTO tags (id, name) VALUES (?, ?)',
+                           [(str(uuid.uuid4()), tag) for tag in tags])
+            placeholders = ','.join('?' for _ in tags)
+            db.execute(f'''
+                INSERT INTO entry_tags (entry_id, tag_id)
+                SELECT ?, id FROM tags WHERE name IN ({placeholders})
+            ''', (entry_id, *tags))
+        
+        # 派生工作和日记在同一事务中登记，提交后交给后台执行
+        queue_tasks(db, entry_id)
         db.commit()
-        return True
+        get_save_worker().submit(current_tenant(), entry_id)
+        saved = st.session_state.setdefault('saved_entries', [])
+        saved.insert(0, entry_id)
+        del saved[SAVE_CONFIG['status_entries']:]
+        return entry_id
         
     except Exception as e:
         logger.error(f"Error saving entry: {e}")
         db.rollback()
-        return False
+        return None
     finally:
         db.close()
 
+def update_vector_index(db):
+    """Index entries that are not in the vector index yet"""
+    try:
+        get_vector_index(current_tenant().vector_dir).sync(db)
+    except Exception as e:
+        # 相似检索是附加功能，索引失败不影响保存
+        logger.error(f"Error updating vector index: {e}", exc_info=True)
+
+def enrich_entries(db, entry_ids=None):
+    """Assign topics and sentiment scores to new entries"""
+    # 主题和情感分析是附加功能，失败不影响保存
+    try:
+        fold_in_topics(db, entry_ids, model_path=current_tenant().topic_model_path)
+    except Exception as e:
+        logger.error(f"Error assigning topics: {e}", exc_info=True)
+    try:
+        score_sentiment(db, entry_ids)
+    except Exception as e:
+        logger.error(f"Error scoring sentiment: {e}", exc_info=True)
+
 def init_app():
-    """Initialize application directories and database"""
+    """Initialize application directories and the signed-in user's database"""
     try:
+        # 每个用户的建表和迁移在本进程内只做一次
+        tenant = current_tenant()
+        if tenant.initialized:
+            return True
+        
         # Initialize directories first
         if not init_directories():
             logger.error("Failed to initialize directories")
@@ -181,100 +289,142 @@ def init_app():
             
         # 使用 Config 实例的属性
         config.DATA_DIR.mkdir(exist_ok=True)
-        config.UPLOAD_DIR.mkdir(exist_ok=True)
+        tenant.upload_dir.mkdir(parents=True, exist_ok=True)
         
         # Initialize database and create tables first
         db = init_db()
         if db:
             # Create tables if they don't exist
-            db.executescript('''
-                CREATE TABLE IF NOT EXISTS entries (
-                    id TEXT PRIMARY KEY,
-                    date TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    content TEXT,
-                    attachments TEXT,
-                    mood TEXT,
-                    weather TEXT,
-                    location TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                
-                CREATE TABLE IF NOT EXISTS tags (
-                    id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL UNIQUE
-                );
-                
-                CREATE TABLE IF NOT EXISTS entry_tags (
-                    entry_id TEXT,
-                    tag_id TEXT,
-                    PRIMARY KEY (entry_id, tag_id),
-                    FOREIGN KEY (entry_id) REFERENCES entries(id) ON DELETE CASCADE,
-                    FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE
-                );
-                
-                CREATE TABLE IF NOT EXISTS topics (
-                    id TEXT PRIMARY KEY,
-                    entry_id TEXT,
-                    topic TEXT,
-                    keywords TEXT,
-                    sentiment REAL,
-                    FOREIGN KEY (entry_id) REFERENCES entries(id) ON DELETE CASCADE
-                );
-            ''')
+            create_tables(db)
             
             # Now check if we need to generate mock data
             cursor = db.execute("SELECT COUNT(*) FROM entries")
             count = cursor.fetchone()[0]
-            if count == 0:
+            if count == 0 and config.TENANCY_CONFIG['demo_data']:
                 # No data exists, generate mock data
                 from mock_data import generate_mock_data
-                generate_mock_data()
+                db.close()
+                # 模拟数据会重建数据库文件，先关闭池中的连接
+                tenant.close_idle()
+                generate_mock_data(tenant.db_path, tenant.topic_model_path)
                 logger.info("Generated mock data")
+                db = init_db()
+            
+            migrate_db(db)
+            resume_pending(db, tenant)
+            resume_saves(db, tenant)
             db.close()
+            tenant.initialized = True
         
         return True
     except Exception as e:
         logger.error(f"Initialization error: {e}", exc_info=True)
         return False
 
-def check_password():
-    """Returns `True` if the user had the correct password."""
-    
-    def password_entered():
-        """Checks whether a password entered by the user is correct."""
-        if st.session_state["password"] == st.secrets["password"]:
-            st.session_state["password_correct"] = True
-            del st.session_state["password"]  # Don't store password
-        else:
-            st.session_state["password_correct"] = False
+def migrate_db(db):
+    """Apply schema additions and backfill derived columns"""
+    ensure_schema(db)
+    migrate_schema(db)
+    update_vector_index(db)
+    enrich_entries(db)
 
-    if "password_correct" not in st.session_state:
-        st.session_state["password_correct"] = False
+def check_login():
+    """Returns `True` if a user is signed in; otherwise shows the sign-in form."""
+    if st.session_state.get("user"):
+        return True
 
-    if not st.session_state["password_correct"]:
-        st.markdown("""
-            <style>
-                .stTextInput > div > div > input {
-                    width: 300px;
-                }
-                div[data-testid="stVerticalBlock"] > div:has(div.stTextInput) {
-                    display: flex;
-                    justify-content: center;
-                    margin-top: 100px;
-                }
-            </style>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("<h1 style='text-align: center;'>日记本</h1>", unsafe_allow_html=True)
-        st.text_input(
-            "请输入访问密钥",
-            type="password",
-            on_change=password_entered,
-            key="password"
-        )
+    st.markdown("""
+        <style>
+            .stTextInput > div > div > input {
+                width: 300px;
+            }
+            div[data-testid="stVerticalBlock"] > div:has(div.stTextInput) {
+                display: flex;
+                justify-content: center;
+                margin-top: 100px;
+            }
+        </style>
+    """, unsafe_allow_html=True)
+    
+    st.markdown(f"<h1 style='text-align: center;'>{t('login.title')}</h1>", unsafe_allow_html=True)
+    if not has_users():
+        show_first_admin_form()
         return False
-    return True
+
+    tabs = [t('login.sign_in')]
+    if config.TENANCY_CONFIG['allow_signup']:
+        tabs.append(t('login.sign_up'))
+    tab_containers = st.tabs(tabs)
+    
+    with tab_containers[0]:
+        with st.form("sign_in"):
+            username = st.text_input(t('login.username'))
+            password = st.text_input(t('login.password'), type="password")
+            if st.form_submit_button(t('login.sign_in')):
+                user = authenticate(username, password)
+                if user:
+                    st.session_state["user"] = user
+                    st.rerun()
+                st.error(t('login.invalid'))
+    
+    if len(tab_containers) > 1:
+        with tab_containers[1]:
+            with st.form("sign_up"):
+                username = st.text_input(t('login.username'), help=t('login.username_help'))
+                password = st.text_input(t('login.password'), type="password")
+                confirm = st.text_input(t('login.confirm_password'), type="password")
+                if st.form_submit_button(t('login.sign_up')):
+                    if password != confirm:
+                        st.error(t('login.password_mismatch'))
+                    else:
+                        try:
+                            st.session_state["user"] = create_user(username, password)
+                            st.rerun()
+                        except AccountError as e:
+                            st.error(t(str(e), min_length=config.TENANCY_CONFIG['min_password_length']))
+    return False
+
+def legacy_password():
+    """The single-user site password from secrets.toml, or None if there is none"""
+    try:
+        return st.secrets.get("password")
+    except FileNotFoundError:
+        return None
+
+def show_first_admin_form():
+    """Create the admin account on a fresh install
+
+    The admin account takes over the single-user diary, so the form is only
+    offered to someone who knows the old site password; without one the
+    account has to be created from the command line.
+    """
+    site_password = legacy_password()
+    if not site_password:
+        st.info(t('login.setup_cli'))
+        return
+    st.info(t('login.setup_help'))
+    with st.form("first_admin"):
+        old_password = st.text_input(t('login.site_password'), type="password")
+        username = st.text_input(t('login.username'), help=t('login.username_help'))
+        password = st.text_input(t('login.password'), type="password")
+        confirm = st.text_input(t('login.confirm_password'), type="password")
+        if st.form_submit_button(t('login.setup')):
+            if not hmac.compare_digest(old_password.encode(), str(site_password).encode()):
+                st.error(t('login.invalid_site_password'))
+            elif password != confirm:
+                st.error(t('login.password_mismatch'))
+            else:
+                try:
+                    st.session_state["user"] = create_first_admin(username, password)
+                    st.rerun()
+                except AccountError as e:
+                    st.error(t(str(e), min_length=config.TENANCY_CONFIG['min_password_length']))
+
+def sign_out():
+    """Forget the signed-in user and their per-session state"""
+    for key in list(st.session_state.keys()):
+        if key != I18nManager.SESSION_KEY:
+            del st.session_state[key]
 
 def main():
     # First, set page config before any other Streamlit commands
@@ -284,12 +434,12 @@ def main():
         menu_items={
             'Get Help': None,
             'Report a bug': None,
-            'About': '日记本 v1.0'
+            'About': t('app.about')
         }
     )
     
-    # Add password check before showing content
-    if not check_password():
+    # Sign in before showing content
+    if not check_login():
         return
     
     # Then add custom CSS and fonts
@@ -314,36 +464,82 @@ def main():
     with st.container():
         col1, col2 = st.columns([6, 1])
         with col2:
-            current_lang = st.selectbox(
+            # 选择结果直接写入本会话的 session_state，下一次运行即生效
+            st.selectbox(
                 t('app.language'),
-                ['中文', 'English'],
-                index=0 if I18nManager.get_current_lang() == 'zh' else 1,
-                key='lang_selector'
+                I18nManager.get_languages(),
+                index=I18nManager.get_languages().index(I18nManager.get_current_lang()),
+                format_func=lambda lang: LANGUAGE_NAMES.get(lang, lang),
+                key=I18nManager.SESSION_KEY
             )
-            # 根据选择更新语言
-            new_lang = 'zh' if current_lang == '中文' else 'en'
-            if new_lang != I18nManager.get_current_lang():
-                I18nManager.set_language(new_lang)
-                st.rerun()  # 重新加载页面以应用新语言
     
     # Initialize app first
     if not init_app():
         st.error(t('error.init_failed'))
         return
+    start_maintenance()
         
     # Continue with normal flow
-    page = st.sidebar.radio(t('nav.title'), [
+    user = st.session_state['user']
+    st.sidebar.caption(t('login.signed_in_as', username=user['username']))
+    st.sidebar.button(t('login.sign_out'), on_click=sign_out)
+    show_timezone_setting()
+    
+    pages = [
         t('nav.timeline'),
         t('nav.new_entry'),
         t('nav.web_clipper')
-    ])
+    ]
+    if user['is_admin']:
+        pages.append(t('nav.admin'))
+    page = st.sidebar.radio(t('nav.title'), pages)
     
+    # 测试模式下记录每个页面的内存分配峰值
     if page == t('nav.timeline'):
-        show_timeline()
+        with track_page('timeline'):
+            show_timeline()
     elif page == t('nav.new_entry'):
-        show_editor()
+        with track_page('editor'):
+            show_editor()
+    elif page == t('nav.admin'):
+        with track_page('admin'):
+            show_admin()
     else:
-        show_clipper()
+        with track_page('clipper'):
+            show_clipper()
+
+def show_timezone_setting():
+    """Sidebar selector for the timezone that writing times are counted in"""
+    if 'timezone' not in st.session_state:
+        db = init_db()
+        if not db:
+            st.sidebar.error(t('error.db_connect'))
+            return
+        try:
+            st.session_state['timezone'] = get_timezone(db)
+        finally:
+            db.close()
+    st.sidebar.selectbox(t('app.timezone'), timezones(), key='timezone', on_change=change_timezone)
+
+def change_timezone():
+    """Store the selected timezone and recompute the entries' local times"""
+    db = init_db()
+    if not db:
+        st.sidebar.error(t('error.db_connect'))
+        # 下次运行时重新读取已保存的时区
+        st.session_state.pop('timezone', None)
+        return
+    try:
+        with st.spinner(t('app.timezone_updating')):
+            set_timezone(db, st.session_state['timezone'])
+    except Exception as e:
+        logger.error(f"Error changing timezone: {e}", exc_info=True)
+        st.sidebar.error(t('error.timezone_failed'))
+        # 先回滚，否则读回的是未提交的新时区
+        db.rollback()
+        st.session_state['timezone'] = get_timezone(db)
+    finally:
+        db.close()
 
 def show_timeline():
     st.title(t('timeline.title'))
@@ -395,10 +591,26 @@ def show_timeline():
                 max_value=max_date
             )
         elif filter_type == t('timeline.tags'):
-            tags = get_all_tags()
-            selected_tags = st.multiselect(t('timeline.select_tags'), tags)
+            tag_search = st.text_input(t('timeline.tag_search'), key='timeline_tag_search')
+            selected_tags = st.multiselect(
+                t('timeline.select_tags'),
+                get_tag_suggestions(tag_search, st.session_state.get('timeline_selected_tags', [])),
+                key='timeline_selected_tags'
+            )
+            tag_mode = st.radio(
+                t('timeline.tag_mode'),
+                [MODE_ANY, MODE_ALL],
+                format_func=lambda mode: t(f'timeline.tag_mode_{mode}'),
+                horizontal=True
+            )
+            excluded_tags = st.multiselect(
+                t('timeline.exclude_tags'),
+                get_tag_suggestions(tag_search, st.session_state.get('timeline_excluded_tags', [])),
+                key='timeline_excluded_tags'
+            )
         elif filter_type == t('timeline.search'):
             search_query = st.text_input(t('timeline.search_placeholder'))
+            semantic_search = st.toggle(t('timeline.semantic_search'), help=t('timeline.semantic_search_help'))
     
     # 主要内容区域
     tab1, tab2, tab3 = st.tabs([
@@ -483,6 +695,9 @@ def show_insights():
         with col3:
             # 写作时间分布
             show_writing_time_distribution(start_date, end_date)
+        
+        # 写作日历、连续写作和那年今日
+        show_writing_calendar(start_date, end_date)
             
         # 3. 主题分析
         st.markdown(f"### {t('insights.topic_analysis')}")
@@ -511,82 +726,43 @@ def show_mood_trends(start_date, end_date):
             return
             
         # Query data
-        query = """
-            SELECT date, mood, COUNT(*) as count
-            FROM entries
-            WHERE date BETWEEN ? AND ?
-                AND mood IS NOT NULL
-            GROUP BY date, mood
-            ORDER BY date
+        granularity = choose_granularity(start_date, end_date)
+        # 按整数 id 分组，只对分组结果取心情名称
+        query = f"""
+            SELECT g.bucket, m.name, g.count
+            FROM (
+                SELECT {bucket_expression(granularity)} as bucket, mood_id, COUNT(*) as count
+                FROM entries
+                WHERE date BETWEEN ? AND ?
+                    AND mood_id IS NOT NULL
+                GROUP BY bucket, mood_id
+            ) g
+            JOIN moods m ON m.id = g.mood_id
+            ORDER BY g.bucket
         """
-        cursor = db.execute(query, (start_date, end_date))
-        data = cursor.fetchall()
+        data = cached('mood_trends', (start_date, end_date, granularity),
+                      lambda: db.execute(query, (start_date, end_date)).fetchall())
         
         if not data:
             st.info(t('insights.no_mood_data'))
             return
             
-        # Use pyecharts
-        from pyecharts import options as opts
-        from pyecharts.charts import Line
-        from streamlit_echarts import st_pyecharts
-        
-        # Prepare data
-        dates = sorted(list(set(row[0] for row in data)))
-        moods = sorted(list(set(row[1] for row in data)))
-        
-        # Create line chart
-        line = Line()
-        line.add_xaxis(dates)
-        
-        # Color mapping
-        colors = ['#FF9800', '#4CAF50', '#9E9E9E', '#F44336', '#673AB7', '#2196F3']
-        
-        for idx, mood in enumerate(moods):
-            y_data = []
-            for date in dates:
-                count = 0
-                for row in data:
-                    if row[0] == date and row[1] == mood:
-                        count = row[2]
-                        break
-                y_data.append(count)
-            
-            line.add_yaxis(
-                series_name=mood,
-                y_axis=y_data,
-                symbol_size=8,
-                itemstyle_opts=opts.ItemStyleOpts(color=colors[idx % len(colors)]),
-                label_opts=opts.LabelOpts(is_show=False),
+        def build():
+            buckets = bucket_keys(start_date, end_date, granularity)
+            moods = sorted(set(row[1] for row in data))
+            colors = CHART_CONFIG['mood_colors']
+            return time_series(
+                t('charts.mood_trends'),
+                f"{t('charts.range', start=start_date, end=end_date)} · {t(f'insights.granularity_{granularity}')}",
+                [bucket_label(key, granularity) for key in buckets],
+                [series('line', mood, fill_series(buckets, ((row[0], row[2]) for row in data if row[1] == mood)),
+                        color=colors[idx % len(colors)], symbolSize=8)
+                 for idx, mood in enumerate(moods)],
+                t('insights.date'),
+                t('charts.times'),
             )
         
-        line.set_global_opts(
-            title_opts=opts.TitleOpts(
-                title="情绪变化趋势",
-                subtitle=f"从 {start_date} 到 {end_date}",
-                title_textstyle_opts=opts.TextStyleOpts(font_family="Microsoft YaHei"),
-            ),
-            xaxis_opts=opts.AxisOpts(
-                type_="category",
-                name="日期",
-                name_location="end",
-                axislabel_opts=opts.LabelOpts(rotate=45),
-            ),
-            yaxis_opts=opts.AxisOpts(
-                type_="value",
-                name="次数",
-                name_location="end",
-            ),
-            legend_opts=opts.LegendOpts(
-                pos_top="5%",
-                pos_left="center",
-                orient="horizontal",
-            ),
-            tooltip_opts=opts.TooltipOpts(trigger="axis"),
-        )
-        
-        # Display chart
-        st_pyecharts(line)
+        show_chart(chart_spec('mood_trends', (start_date, end_date, granularity), build))
         
     except Exception as e:
         logger.error(f"Error showing mood trends: {e}")
@@ -603,59 +779,30 @@ def show_writing_frequency(start_date, end_date):
             st.error(t('error.db_connect'))
             return
             
-        query = """
-            SELECT date, COUNT(*) as entry_count
-            FROM entries
-            WHERE date BETWEEN ? AND ?
-            GROUP BY date
-            ORDER BY date
-        """
-        cursor = db.execute(query, (start_date, end_date))
-        data = cursor.fetchall()
+        granularity = choose_granularity(start_date, end_date)
+        buckets = bucket_keys(start_date, end_date, granularity)
+        counts = cached('writing_frequency', (start_date, end_date, granularity),
+                        lambda: get_activity(db).bucket_totals(start_date, end_date, buckets))
         
-        if not data:
+        if not any(counts):
             st.info(t('insights.no_entries'))
             return
             
-        from pyecharts import options as opts
-        from pyecharts.charts import Bar
-        from streamlit_echarts import st_pyecharts
-        
-        dates, counts = zip(*data)
-        
-        bar = Bar()
-        bar.add_xaxis(dates)
-        bar.add_yaxis(
-            "日记数量",
-            counts,
-            itemstyle_opts=opts.ItemStyleOpts(color='#1976D2'),
-            label_opts=opts.LabelOpts(is_show=False),
-        )
-        
-        bar.set_global_opts(
-            title_opts=opts.TitleOpts(
-                title="写作频率统计",
-                subtitle=f"从 {start_date} 到 {end_date}",
-                title_textstyle_opts=opts.TextStyleOpts(font_family="Microsoft YaHei"),
-            ),
-            xaxis_opts=opts.AxisOpts(
-                type_="category",
-                name="日期",
-                name_location="end",
-                axislabel_opts=opts.LabelOpts(rotate=45),
-            ),
-            yaxis_opts=opts.AxisOpts(
-                type_="value",
-                name="日记数量",
-                name_location="end",
-                min_=0,
-                max_=max(counts) + 1,
-                interval=1,
-            ),
-            tooltip_opts=opts.TooltipOpts(trigger="axis"),
-        )
+        def build():
+            y_axis = {'min': 0, 'max': max(counts) + 1}
+            if granularity == DAY:
+                y_axis['interval'] = 1
+            return time_series(
+                t('charts.writing_frequency'),
+                f"{t('charts.range', start=start_date, end=end_date)} · {t(f'insights.granularity_{granularity}')}",
+                [bucket_label(key, granularity) for key in buckets],
+                [series('bar', t('insights.entry_count'), counts, color='#1976D2')],
+                t('insights.date'),
+                t('insights.entry_count'),
+                **y_axis,
+            )
         
-        st_pyecharts(bar)
+        show_chart(chart_spec('writing_frequency', (start_date, end_date, granularity), build))
         
     except Exception as e:
         logger.error(f"Error showing writing frequency: {e}")
@@ -664,61 +811,234 @@ def show_writing_frequency(start_date, end_date):
         if 'db' in locals() and db is not None:
             db.close()
 
+def get_activity(db):
+    """Return the per-day writing calendar, synced with the entries table"""
+    calendar = get_activity_calendar(current_tenant().db_path)
+    calendar.refresh(db)
+    return calendar
+
+def writing_calendar_summary(db, start_date, end_date, calendar_start, today):
+    """Streaks, heatmap data and on-this-day entries for the writing calendar"""
+    calendar = get_activity(db)
+    dates = calendar.on_this_day(today)
+    on_this_day = []
+    if dates:
+        placeholders = ','.join('?' for _ in dates)
+        cursor = db.execute(f"""
+            SELECT date, title, preview
+            FROM entries
+            WHERE date IN ({placeholders})
+            ORDER BY date DESC
+        """, [day.isoformat() for day in dates])
+        on_this_day = cursor.fetchall()
+    return {
+        'streaks': calendar.streaks(start_date, end_date),
+        'active_days': calendar.active_days(start_date, end_date),
+        'heatmap': calendar.heatmap(calendar_start, end_date),
+        'on_this_day': on_this_day,
+    }
+
+def show_writing_calendar(start_date, end_date):
+    """显示写作日历热力图、连续写作天数和那年今日"""
+    try:
+        db = init_db()
+        if not db:
+            st.error(t('error.db_connect'))
+            return
+        
+        # 日历图最多显示一年，时间段更长时显示最后一年
+        calendar_start = max(start_date, end_date - timedelta(days=365))
+        today = datetime.now().date()
+        summary = cached('writing_calendar', (start_date, end_date, today),
+                         lambda: writing_calendar_summary(db, start_date, end_date, calendar_start, today))
+        current_streak, longest_streak = summary['streaks']
+        data = summary['heatmap']
+        
+        st.markdown(f"#### {t('insights.writing_calendar')}")
+        col1, col2, col3 = st.columns(3)
+        col1.metric(t('insights.current_streak'), t('insights.days', count=current_streak))
+        col2.metric(t('insights.longest_streak'), t('insights.days', count=longest_streak))
+        col3.metric(t('insights.active_days'), t('insights.days', count=summary['active_days']))
+        
+        spec = chart_spec('writing_calendar', (calendar_start, end_date), lambda: calendar_heatmap(
+            t('charts.writing_calendar'),
+            t('charts.range', start=calendar_start, end=end_date),
+            t('insights.entry_count'),
+            data,
+            calendar_start,
+            end_date,
+            I18nManager.get_current_lang(),
+        ))
+        show_chart(spec, height="260px")
+        
+        # 那年今日
+        st.markdown(f"#### {t('insights.on_this_day')}")
+        if not summary['on_this_day']:
+            st.info(t('insights.no_on_this_day'))
+            return
+        for entry_date, title, preview in summary['on_this_day']:
+            years = today.year - int(entry_date[:4])
+            with st.expander(f"{t('insights.years_ago', years=years)} · {entry_date}: {title}"):
+                st.write(preview or '')
+        
+    except Exception as e:
+        logger.error(f"Error showing writing calendar: {e}")
+        st.error(t('error.analysis_failed'))
+    finally:
+        if 'db' in locals() and db is not None:
+            db.close()
+
 def show_analysis():
     """Display detailed analysis of journal entries"""
     st.subheader(t('analysis.title'))
     
     st.markdown(f"### {t('analysis.topic_evolution')}")
     st.markdown(f"### {t('analysis.writing_patterns')}")
+    
+    st.markdown(f"### {t('analysis.correlations')}")
+    show_mood_correlations()
+
+def show_mood_correlations():
+    """Heatmap of mood against weather, location, weekday or hour of day"""
+    db = init_db()
+    if not db:
+        st.error(t('error.db_connect'))
+        return
+    try:
+        min_date, max_date = db.execute("SELECT MIN(date), MAX(date) FROM entries").fetchone()
+        min_date = datetime.strptime(min_date, '%Y-%m-%d').date() if min_date else datetime.now().date()
+        max_date = datetime.strptime(max_date, '%Y-%m-%d').date() if max_date else datetime.now().date()
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            start_date = st.date_input(t('insights.period_start'), value=min_date,
+                                       min_value=min_date, max_value=max_date, key='analysis_start_date')
+        with col2:
+            end_date = st.date_input(t('insights.period_end'), value=max_date,
+                                     min_value=min_date, max_value=max_date, key='analysis_end_date')
+        if start_date > end_date:
+            st.error(t('insights.date_range_error'))
+            return
+        
+        # 整数编码的日记列按数据版本缓存，换时间段时只重新计算列联表
+        encoded = cached('mood_codes', (), lambda: encode_entries(db))
+        tables = cached('mood_correlations', (start_date, end_date),
+                        lambda: mood_correlations(encoded, start_date, end_date))
+        if not tables:
+            st.info(t('analysis.correlation_no_mood'))
+            return
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            dimension = st.selectbox(
+                t('analysis.correlation_dimension'),
+                [name for name in ('weather', 'location', 'weekday', 'hour') if name in tables],
+                format_func=lambda name: t(f'analysis.dimension_{name}'),
+                key='correlation_dimension'
+            )
+        with col2:
+            measure = st.selectbox(
+                t('analysis.correlation_measure'),
+                ['lift', 'residuals', 'counts'],
+                format_func=lambda name: t(f'analysis.measure_{name}'),
+                key='correlation_measure'
+            )
+        
+        table = tables[dimension]
+        if not table['total']:
+            st.info(t('analysis.correlation_no_pairs'))
+            return
+        labels = table['labels']
+        if dimension == 'weekday':
+            weekdays = ZH_WEEKDAYS if I18nManager.get_current_lang() == 'zh' else EN_WEEKDAYS
+            labels = [weekdays[day] for day in labels]
+        elif dimension == 'hour':
+            labels = [f"{hour:02d}" for hour in labels]
+        
+        import plotly.graph_objects as go
+        
+        values = table[measure]
+        heatmap = {'colorscale': 'Blues'}
+        if measure == 'lift':
+            # 以 1（与独立时相同）为中点：高于 1 说明两者一起出现得更多
+            heatmap = {'colorscale': 'RdBu_r', 'zmid': 1}
+        elif measure == 'residuals':
+            heatmap = {'colorscale': 'RdBu_r', 'zmid': 0}
+        fig = go.Figure(data=[go.Heatmap(
+            z=values.tolist(),
+            x=labels,
+            y=table['moods'],
+            customdata=table['counts'].tolist(),
+            hovertemplate='%{y} / %{x}<br>%{z:.2f} (%{customdata})<extra></extra>',
+            hoverongaps=False,
+            **heatmap
+        )])
+        fig.update_layout(
+            xaxis_title=t(f'analysis.dimension_{dimension}'),
+            yaxis_title=t('editor.mood'),
+            xaxis_type='category',
+            height=max(300, 40 * len(table['moods']) + 150)
+        )
+        st.plotly_chart(fig)
+        st.caption(t('analysis.correlation_summary', total=table['total'], cramers_v=table['cramers_v'],
+                     min_expected=config.CORRELATION_CONFIG['min_expected']))
+        
+    except Exception as e:
+        logger.error(f"Error showing mood correlations: {e}")
+        st.error(t('error.analysis_failed'))
+    finally:
+        db.close()
 
 def show_editor():
     st.title(t('editor.title'))
     
+    # 本会话的草稿；编辑器为空时提供恢复上次未保存的草稿
+    draft_id = st.session_state.setdefault('draft_id', str(uuid.uuid4()))
+    offer_draft(draft_id)
+    
     # Basic editor
-    title = st.text_input(t('editor.entry_title'))
-    content = st.text_area(t('editor.content'), height=300)
+    title = st.text_input(t('editor.entry_title'), key='editor_title')
+    content = st.text_area(t('editor.content'), height=300, key='editor_content')
+    autosave_draft(title, content)
     
     # Add mood, weather, and location selectors
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        mood = st.selectbox(
-            "心情",
-            ['开心', '平静', '疲惫', '兴奋', '焦虑', '伤心'],
-            index=None,
-            placeholder="选择心情..."
-        )
-    with col2:
-        weather = st.selectbox(
-            "天气",
-            ['晴朗', '多云', '小雨', '阴天', '大晴天'],
-            index=None,
-            placeholder="选择天气..."
-        )
-    with col3:
-        location = st.selectbox(
-            "位置",
-            ['家里', '公司', '咖啡馆', '图书馆', '公园'],
-            index=None,
-            placeholder="选择位置..."
-        )
+    # 选项来自本用户的词表；选择"新增"后可以输入词表中还没有的值，保存时加入词表
+    choices = get_vocabulary_options()
+    values = {}
+    for column, kind in zip(st.columns(3), VOCABULARY_KINDS):
+        with column:
+            values[kind] = st.selectbox(
+                t(f'editor.{kind}'),
+                [*choices[kind], t('editor.new_option')],
+                index=None,
+                placeholder=t(f'editor.{kind}_placeholder')
+            )
+            if values[kind] == t('editor.new_option'):
+                values[kind] = st.text_input(
+                    t('editor.new_option_value'),
+                    max_chars=VOCABULARY_CONFIG['max_length'],
+                    key=f'editor_new_{kind}'
+                )
     
     # Tags input
-    # Get existing tags for autocomplete
-    existing_tags = get_all_tags()
+    # 按输入检索已有标签，只加载排名靠前的候选
+    tag_search = st.text_input(t('editor.tag_search'), key='editor_tag_search')
+    existing_tags = get_tag_suggestions(tag_search, st.session_state.get('editor_selected_tags', []))
     
     # Allow multiple tag selection with autocomplete
     selected_tags = st.multiselect(
-        "标签",
+        t('editor.tags'),
         options=existing_tags,
-        placeholder="选择或输入新标签...",
-        help="可以选择已有标签或输入新标签，多个标签用逗号分隔"
+        key='editor_selected_tags',
+        placeholder=t('editor.tags_placeholder'),
+        help=t('editor.tags_help')
     )
     
     # Additional free-form tags input
     new_tags = st.text_input(
-        "新标签",
-        placeholder="输入新标签，多个标签用逗号分隔",
-        help="输入新标签，用逗号分隔多个标签"
+        t('editor.new_tags'),
+        placeholder=t('editor.new_tags_placeholder'),
+        help=t('editor.new_tags_help')
     )
     
     # Attachments with preview
@@ -748,16 +1068,220 @@ def show_editor():
             all_tags.update(new_tag_list)
             
         # Save and show appropriate message
-        if save_entry(title, content, uploaded_files, list(all_tags), mood, weather, location):
+        if save_entry(title, content, uploaded_files, list(all_tags), values['mood'], values['weather'],
+                      values['location']):
+            # 日记已保存，删除草稿；同样的内容不再作为新草稿保存
+            get_draft_writer().discard(current_tenant(), draft_id)
+            st.session_state['draft_id'] = str(uuid.uuid4())
+            st.session_state['draft_staged'] = (title, content)
             st.success(t('editor.save_success'))
         else:
             st.error(t('editor.save_failed'))
+    
+    show_save_status()
+
+def autosave_draft(title, content):
+    """Hand the editor text to the draft writer when it changed since the last run"""
+    draft = (title, content)
+    if not (title or content) or st.session_state.get('draft_staged') == draft:
+        return
+    # 待写表满时不记为已提交，下次运行再交
+    if get_draft_writer().stage(current_tenant(), st.session_state['draft_id'], title, content):
+        st.session_state['draft_staged'] = draft
+
+def offer_draft(draft_id):
+    """Offer to restore the most recent unsaved draft while the editor is empty"""
+    if st.session_state.get('editor_title') or st.session_state.get('editor_content'):
+        return
+    try:
+        draft = latest_draft(current_tenant(), exclude=draft_id)
+    except sqlite3.Error as e:
+        logger.error(f"Error reading drafts: {e}")
+        return
+    if not draft:
+        return
+    
+    def restore():
+        # 在下一次运行创建输入框之前写入它们的值，继续编辑时更新同一份草稿
+        st.session_state['editor_title'] = draft['title'] or ''
+        st.session_state['editor_content'] = draft['content'] or ''
+        st.session_state['draft_id'] = draft['id']
+        st.session_state['draft_staged'] = (draft['title'], draft['content'])
+    
+    def discard():
+        get_draft_writer().discard(current_tenant(), draft['id'])
+    
+    st.info(t('editor.draft_found', title=draft['title'] or t('editor.draft_untitled'),
+              time=datetime.fromtimestamp(draft['updated_at']).strftime('%Y-%m-%d %H:%M')))
+    col1, col2, _ = st.columns([1, 1, 4])
+    with col1:
+        st.button(t('editor.draft_restore'), on_click=restore, key='editor_draft_restore')
+    with col2:
+        st.button(t('editor.draft_discard'), on_click=discard, key='editor_draft_discard')
+
+def show_save_status():
+    """Background processing state of the entries saved in this session"""
+    saved = st.session_state.get('saved_entries')
+    if not saved:
+        return
+    db = init_db()
+    if not db:
+        return
+    try:
+        status = entry_status(db, saved)
+    except Exception as e:
+        logger.error(f"Error reading save status: {e}")
+        return
+    finally:
+        db.close()
+    if not status:
+        return
+    
+    col1, col2 = st.columns([6, 1])
+    with col1:
+        st.markdown(f"#### {t('editor.status_title')}")
+    with col2:
+        # 点击只是触发一次重新运行，状态在重新运行时读取
+        st.button(t('editor.status_refresh'), key='editor_status_refresh')
+    
+    def label(state):
+        return t(f'editor.status_{state}') if state else '-'
+    
+    rows = []
+    for entry in status.values():
+        row = {t('editor.entry_title'): entry['title']}
+        for name, _ in SAVE_TASKS:
+            row[t(f'editor.task_{name}')] = label(entry['tasks'].get(name))
+        # 附件预览：已完成 / 需要处理的文档数
+        previews = entry['previews']
+        total = sum(count for state, count in previews.items() if state != STATUS_UNSUPPORTED)
+        row[t('editor.previews')] = f"{previews.get('done', 0)}/{total}" if total else '-'
+        rows.append(row)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+def show_admin():
+    """Show per-user storage statistics gathered from every user's database"""
+    st.title(t('admin.title'))
+    try:
+        with st.spinner(t('admin.scanning')):
+            stats = scan_shards()
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric(t('admin.users'), len(stats))
+        col2.metric(t('admin.entries'), sum(row['entries'] for row in stats))
+        total_bytes = sum(row['db_bytes'] + row['upload_bytes'] for row in stats)
+        col3.metric(t('admin.storage'), f"{total_bytes / 1024 / 1024:.1f} MB")
+        
+        st.dataframe([
+            {
+                t('admin.username'): row['username'],
+                t('admin.entries'): row['entries'],
+                t('admin.tags'): row['tags'],
+                t('admin.first_entry'): row['first_date'],
+                t('admin.last_entry'): row['last_date'],
+                t('admin.db_size'): f"{row['db_bytes'] / 1024:.0f} KB",
+                t('admin.uploads'): f"{row['upload_files']} / {row['upload_bytes'] / 1024:.0f} KB",
+            }
+            for row in stats
+        ], use_container_width=True)
+    except Exception as e:
+        logger.error(f"Error scanning user databases: {e}")
+        st.error(t('error.analysis_failed'))
+    
+    show_cache_stats()
+    show_maintenance_stats()
+
+def show_cache_stats():
+    """Show hit/miss counters and size of each shared cache layer"""
+    st.subheader(t('admin.cache'))
+    st.caption(t('admin.cache_caption'))
+    cache = get_cache()
+    if st.button(t('admin.cache_clear')):
+        cache.clear()
+    stats = cache.stats()
+    
+    col1, col2 = st.columns(2)
+    col1.metric(t('admin.cache_computes'), stats['computes'])
+    col2.metric(t('admin.cache_compute_time'), f"{stats['compute_seconds']:.2f} s")
+    st.dataframe([
+        {
+            t('admin.cache_layer'): name,
+            t('admin.cache_hits'): layer['hits'],
+            t('admin.cache_misses'): layer['misses'],
+            t('admin.cache_hit_rate'): f"{layer['hit_rate']:.0%}",
+            t('admin.cache_errors'): layer['errors'],
+            t('admin.cache_entries'): layer.get('entries'),
+            t('admin.cache_size'): f"{layer['bytes'] / 1024:.0f} KB" if 'bytes' in layer else '',
+        }
+        for name, layer in stats['layers'].items()
+    ], use_container_width=True)
+
+def show_maintenance_stats():
+    """Show when each maintenance task last ran and how long it took"""
+    st.subheader(t('admin.maintenance'))
+    st.caption(t('admin.maintenance_caption'))
+    scheduler = get_scheduler()
+    if st.button(t('admin.maintenance_run')):
+        scheduler.request_run()
+        st.info(t('admin.maintenance_requested'))
+    if scheduler.current:
+        task, username = scheduler.current
+        st.caption(t('admin.maintenance_running', task=task, username=username))
+    try:
+        stats = maintenance_stats()
+    except Exception as e:
+        logger.error(f"Error reading maintenance log: {e}")
+        st.error(t('error.analysis_failed'))
+        return
+    if not stats:
+        st.info(t('admin.maintenance_empty'))
+        return
+    st.dataframe([
+        {
+            t('admin.maintenance_task'): row['task'],
+            t('admin.maintenance_runs'): row['runs'],
+            t('admin.maintenance_last_run'): datetime.fromtimestamp(row['last_run']).strftime('%Y-%m-%d %H:%M'),
+            t('admin.maintenance_mean_time'): f"{row['mean_seconds'] * 1000:.0f} ms",
+            t('admin.maintenance_max_time'): f"{row['max_seconds'] * 1000:.0f} ms",
+            t('admin.cache_errors'): row['errors'],
+            t('admin.maintenance_last_error'): row['last_error'] or '',
+        }
+        for row in stats
+    ], use_container_width=True)
 
 def show_clipper():
     st.title(t('clipper.title'))
-    url = st.text_input(t('clipper.url_input'))
-    if url:
-        st.info(t('clipper.coming_soon'))
+    urls_text = st.text_area(t('clipper.url_input'), placeholder=t('clipper.url_placeholder'))
+    urls = list(dict.fromkeys(url.strip() for url in urls_text.splitlines() if url.strip()))
+    
+    if st.button(t('clipper.fetch'), disabled=not urls):
+        with st.spinner(t('clipper.fetching')):
+            tenant = current_tenant()
+            st.session_state['clip_results'] = clip_urls(
+                urls, upload_dir=tenant.upload_dir, data_dir=tenant.data_dir
+            )
+    
+    for idx, result in enumerate(st.session_state.get('clip_results', [])):
+        with st.expander(result['title'] or result['url'], expanded=True):
+            if result['error']:
+                st.error(t('clipper.fetch_failed', error=result['error']))
+                continue
+            st.caption(result['url'])
+            st.write(result['text'][:500] + "..." if len(result['text']) > 500 else result['text'])
+            if result['attachments']:
+                cols = st.columns(4)
+                for img_idx, path in enumerate(result['attachments']):
+                    with cols[img_idx % 4]:
+                        st.image(str(current_tenant().data_dir / path), use_column_width=True)
+            if st.button(t('clipper.save'), key=f"clip_save_{idx}"):
+                content = f"{result['text']}\n\n{t('clipper.source')}: {result['url']}"
+                if save_entry(result['title'] or result['url'], content, None,
+                              attachments=result['attachments']):
+                    st.success(t('editor.save_success'))
+                else:
+                    st.error(t('editor.save_failed'))
+    
+    show_save_status()
 
 def get_entries_by_date(selected_date):
     """Get entries for a specific date"""
@@ -791,10 +1315,11 @@ def get_entries_by_date(selected_date):
         
         # 执行原始查询
         cursor = db.execute('''
-            SELECT id, date, title, content, attachments
-            FROM entries
-            WHERE date = ?
-            ORDER BY date DESC
+            SELECT e.id, e.date, e.title, x.content, e.attachments
+            FROM entries e
+            JOIN entry_texts x ON x.entry_id = e.id
+            WHERE e.date = ?
+            ORDER BY e.date DESC
         ''', (date_str,))
         
         entries = [dict(zip(['id', 'date', 'title', 'content', 'attachments'], row))
@@ -811,6 +1336,59 @@ def get_entries_by_date(selected_date):
             db.close()
         return []
 
+def timeline_pages(conditions, params):
+    """Pages visited in the timeline as [(after, offset), ...], the last one is shown
+
+    The list lives in the session state and starts over when the filter changes.
+    """
+    signature = repr((conditions, params))
+    if st.session_state.get('timeline_filter') != signature:
+        st.session_state['timeline_filter'] = signature
+        st.session_state['timeline_pages'] = [(None, 0)]
+    return st.session_state['timeline_pages']
+
+def render_timeline_page(db, conditions, params, after):
+    """Render the cards of one timeline page, newest first, until the memory budget is used
+
+    Returns (items, shown, more), where shown holds (id, date, title) of the
+    rendered entries and more tells whether older entries remain.
+    """
+    lang = I18nManager.get_current_lang()
+    data_dir = current_tenant().data_dir
+    budget = MEMORY_CONFIG['timeline_max_bytes']
+    items = []
+    shown = []
+    rendered_bytes = 0
+    more = False
+    entries = iter_entries(db, conditions, params, after=after)
+    for entry in entries:
+        if rendered_bytes > budget:
+            more = True
+            break
+        entry_id, *fields = entry
+        item = render_card(entry_id, entry_version(fields), lang, *fields, data_dir=data_dir)
+        rendered_bytes += len(item['text']['headline']) + len(item['text']['text'])
+        items.append(item)
+        shown.append(entry[:3])
+    entries.close()
+    return items, shown, more
+
+def show_timeline_pager(pages, shown, offset, count, more):
+    """Position of the current page and buttons to page through older entries"""
+    def older():
+        last_id, last_date, _ = shown[-1]
+        pages.append(((last_date, last_id), offset + len(shown)))
+
+    def newer():
+        pages.pop()
+
+    st.info(t('timeline.page', first=offset + 1, last=offset + len(shown), count=count))
+    col1, col2, _ = st.columns([1, 1, 4])
+    with col1:
+        st.button(t('timeline.newer'), on_click=newer, disabled=len(pages) < 2, key='timeline_newer')
+    with col2:
+        st.button(t('timeline.older'), on_click=older, disabled=not more, key='timeline_older')
+
 def show_filtered_entries(filter_type, local_vars):
     """Display filtered entries in timeline format"""
     try:
@@ -819,228 +1397,65 @@ def show_filtered_entries(filter_type, local_vars):
             st.error(t('error.db_connect'))
             return
             
-        # 构建基础查询
-        query = """
-            SELECT e.date, e.title, e.content, e.mood, e.weather, e.location,
-                   GROUP_CONCAT(DISTINCT t.name) as tags,
-                   tp.keywords, tp.sentiment, e.attachments
-            FROM entries e
-            LEFT JOIN entry_tags et ON e.id = et.entry_id
-            LEFT JOIN tags t ON et.tag_id = t.id
-            LEFT JOIN topics tp ON e.id = tp.entry_id
-        """
-        
-        # 添加过滤条件
+        # 添加过滤条件（与 API 共用 entry_queries 中的查询）
         conditions = []
         params = []
         
         if filter_type == t('timeline.date_range'):
             if 'start_date' in local_vars and 'end_date' in local_vars:
-                conditions.append("e.date BETWEEN ? AND ?")
-                params.extend([local_vars['start_date'], local_vars['end_date']])
+                conditions, params = date_filter(local_vars['start_date'], local_vars['end_date'])
         elif filter_type == t('timeline.tags'):
-            if 'selected_tags' in local_vars and local_vars['selected_tags']:
-                placeholders = ','.join(['?' for _ in local_vars['selected_tags']])
-                conditions.append(f"t.name IN ({placeholders})")
-                params.extend(local_vars['selected_tags'])
+            conditions, params = tag_filter(
+                db,
+                local_vars.get('selected_tags') or [],
+                local_vars.get('excluded_tags') or [],
+                local_vars.get('tag_mode', MODE_ANY)
+            )
         elif filter_type == t('timeline.search'):
-            if 'search_query' in local_vars and local_vars['search_query']:
-                search_term = f"%{local_vars['search_query']}%"
-                conditions.append("""
-                    (e.title LIKE ? OR 
-                     e.content LIKE ? OR 
-                     e.mood LIKE ? OR 
-                     e.weather LIKE ? OR 
-                     e.location LIKE ? OR 
-                     t.name LIKE ?)
-                """)
-                params.extend([search_term] * 6)  # Add search term for each field
-                
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-            
-        query += " GROUP BY e.id ORDER BY e.date DESC"
-        
-        cursor = db.execute(query, params)
-        entries = cursor.fetchall()
+            if local_vars.get('search_query') and local_vars.get('semantic_search'):
+                conditions, params, _ = semantic_filter(
+                    db, current_tenant().vector_dir, local_vars['search_query'], SEMANTIC_SEARCH_LIMIT
+                )
+            elif 'search_query' in local_vars and local_vars['search_query']:
+                conditions, params = text_filter(local_vars['search_query'])
+        
+        # 每页渲染到预算为止，更早的日记从本页最后一篇的 (date, id) 往后翻页
+        pages = timeline_pages(conditions, params)
+        after, offset = pages[-1]
+        timeline_items, shown, more = render_timeline_page(db, conditions, params, after)
+        if not shown and offset:
+            # 翻到的页已经没有日记（日记被删除），回到第一页
+            del pages[1:]
+            after, offset = pages[-1]
+            timeline_items, shown, more = render_timeline_page(db, conditions, params, after)
+        count = count_entries(db, conditions, params) if more or offset else len(shown)
         
         # Show result count based on filter type
         if filter_type == t('timeline.search') and 'search_query' in local_vars and local_vars['search_query']:
-            if entries:
-                st.success(f"找到 {len(entries)} 条相关日记")
+            if count:
+                st.success(t('timeline.search_found', count=count))
             else:
-                st.info("未找到相关日记")
+                st.info(t('timeline.search_empty'))
                 return
-        elif filter_type == t('timeline.tags') and 'selected_tags' in local_vars and local_vars['selected_tags']:
-            if entries:
-                st.success(f"找到 {len(entries)} 条带有所选标签的日记")
+        elif filter_type == t('timeline.tags') and (local_vars.get('selected_tags') or local_vars.get('excluded_tags')):
+            if count:
+                st.success(t('timeline.tags_found', count=count))
             else:
-                st.info("未找到带有所选标签的日记")
+                st.info(t('timeline.tags_empty'))
                 return
-        elif not entries:
+        elif not count:
             st.info(t('timeline.no_entries'))
             return
-            
-        # 更新中文日期格式映射
-        zh_months = {
-            '1': '一月', '2': '二月', '3': '三月', '4': '四月',
-            '5': '五月', '6': '六月', '7': '七月', '8': '八月',
-            '9': '九月', '10': '十月', '11': '十一月', '12': '十二月'
-        }
-        
-        zh_weekdays = {
-            '0': '周日', '1': '周一', '2': '周二', '3': '周三',
-            '4': '周四', '5': '周五', '6': '周六'
-        }
-        
-        timeline_items = []
-        for entry in entries:
-            date, title, content, mood, weather, location, tags, keywords, sentiment, attachments = entry
-            date_parts = date.split('-')
-            
-            # 转换为中文日期格式
-            dt = datetime.strptime(date, '%Y-%m-%d')
-            weekday = dt.strftime('%w')  # 0 is Sunday, 6 is Saturday
-            chinese_date = f"{zh_months[str(int(date_parts[1]))]} {int(date_parts[2])}日 {zh_weekdays[weekday]}"
-            
-            # 根据是否是周末设置不���的背景颜色
-            is_weekend = weekday in ['0', '6']
-            background_color = '#fff5f5' if is_weekend else '#ffffff'  # 周末使用浅红色背景
-            border_color = '#ffebee' if is_weekend else '#e0e0e0'     # 周末使用红色边框
-            
-            # 在标题中添加中文日期，周末使用不同样式
-            title_html = f'''
-                <div style="
-                    font-size: 12px;
-                    font-weight: 500;
-                    color: {('#d32f2f' if is_weekend else '#1a237e')};
-                    margin-bottom: 4px;
-                    font-family: -apple-system, 'PingFang SC', 'Microsoft YaHei';
-                    text-shadow: none;
-                    white-space: nowrap;
-                    overflow: hidden;
-                    text-overflow: ellipsis;
-                ">{title}</div>
-                <div style="
-                    font-size: 11px;  # Slightly increased from 10px
-                    color: {('#e57373' if is_weekend else '#666')};
-                    margin: 6px 0;    # Added more vertical margin
-                    padding: 2px 0;   # Added padding
-                    border-bottom: 1px solid #eee;  # Added separator
-                    line-height: 1.4; # Added line height
-                ">{chinese_date}</div>
-            '''
-            
-            # 内容区域使用较大的字体，但保持其他元素小巧
-            content_html = f'''
-                <div style="
-                    color: #333;
-                    font-size: 14px;  # Increased back to 14px for better readability
-                    line-height: 1.5;  # Slightly increased for better readability
-                    margin: 6px 0;
-                    font-family: -apple-system, 'PingFang SC', 'Microsoft YaHei';
-                    text-shadow: none;
-                    display: -webkit-box;
-                    -webkit-line-clamp: 3;
-                    -webkit-box-orient: vertical;
-                    overflow: hidden;
-                    background-color: #fafafa;  # Light background to distinguish content
-                    padding: 8px;
-                    border-radius: 4px;
-                ">{content}</div>
-            '''
-            
-            # Keep meta info and tags small
-            meta_info = []
-            if mood:
-                meta_info.append(f'<span style="background-color: #ffcdd2; padding: 1px 4px; border-radius: 4px; font-size: 10px; margin-right: 4px;">{mood}</span>')
-            if weather:
-                meta_info.append(f'<span style="background-color: #b3e5fc; padding: 1px 4px; border-radius: 4px; font-size: 10px; margin-right: 4px;">{weather}</span>')
-            if location:
-                meta_info.append(f'<span style="background-color: #c8e6c9; padding: 1px 4px; border-radius: 4px; font-size: 10px; margin-right: 4px;">{location}</span>')
-            
-            meta_html = '<div style="margin: 4px 0;">' + ''.join(meta_info) + '</div>'
-            
-            # 标签使用更紧凑的样式
-            tags_html = ''
-            if tags:
-                tag_list = tags.split(',')
-                tags_html = ''.join([
-                    f'''<span style="
-                        display: inline-block;
-                        padding: 1px 6px;
-                        margin: 1px;
-                        border-radius: 8px;
-                        background-color: #e3f2fd;
-                        color: #1565c0;
-                        font-size: 10px;
-                    ">{tag.strip()}</span>'''
-                    for tag in tag_list
-                ])
-            
-            # Add attachments display
-            attachments_html = ''
-            if attachments:
-                try:
-                    attachment_list = json.loads(attachments)
-                    if attachment_list:
-                        attachments_html = '<div style="margin-top: 8px;">'
-                        for attachment in attachment_list:
-                            if any(attachment.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif']):
-                                # Convert file path to absolute path
-                                file_path = config.DATA_DIR / attachment
-                                if file_path.exists():
-                                    # Use base64 encoding to display the image
-                                    import base64
-                                    with open(file_path, "rb") as f:
-                                        img_data = base64.b64encode(f.read()).decode()
-                                        attachments_html += f'''
-                                            <img src="data:image/png;base64,{img_data}" 
-                                                 style="max-width: 100%; height: auto; margin: 4px 0; border-radius: 4px;"
-                                                 alt="Attachment">
-                                        '''
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse attachments JSON: {attachments}")
-                except Exception as e:
-                    logger.error(f"Error loading image: {e}")
-            
-            # Add attachments to the timeline item content
-            item = {
-                "start_date": {
-                    "year": date_parts[0],
-                    "month": date_parts[1],
-                    "day": date_parts[2]
-                },
-                "text": {
-                    "headline": title_html,
-                    "text": f'''
-                        <div style="
-                            background-color: {background_color};
-                            padding: 8px;
-                            border-radius: 6px;
-                            border: 1px solid {border_color};
-                            font-size: 12px;
-                            max-height: none;  # Remove height limit for images
-                            overflow: hidden;
-                        ">
-                            {meta_html}
-                            {content_html}
-                            {attachments_html}  # Add attachments here
-                            <div style="margin-top: 4px;">
-                                {tags_html}
-                            </div>
-                        </div>
-                    '''
-                }
-            }
-            timeline_items.append(item)
+        if len(shown) < count:
+            show_timeline_pager(pages, shown, offset, count, more)
         
         # Create timeline configuration before using it
         timeline_config = {
             "title": {
                 "text": {
                     "headline": f'<h1 style="color:#1a237e; font-size:20px;">{t("timeline.title")}</h1>',
-                    "text": f'<p style="color:#666; font-size:14px;">{t("timeline.subtitle")}</p>'
+                    # 卡片共享样式随标题页下发一次
+                    "text": f'{CARD_CSS}<p style="color:#666; font-size:14px;">{t("timeline.subtitle")}</p>'
                 }
             },
             "events": timeline_items
@@ -1113,6 +1528,9 @@ def show_filtered_entries(filter_type, local_vars):
         # Now use the timeline_config
         timeline(timeline_config, height=550)
         
+        show_full_entry(db, shown)
+        show_similar_entries(db, shown)
+        
     except Exception as e:
         logger.error(f"Error displaying timeline: {e}", exc_info=True)
         st.error(t('error.timeline_failed'))
@@ -1120,6 +1538,53 @@ def show_filtered_entries(filter_type, local_vars):
         if 'db' in locals() and db is not None:
             db.close()
 
+def show_full_entry(db, entries):
+    """Show the full text of one timeline entry; the cards only carry the preview"""
+    titles = {entry[0]: f"{entry[1]} · {entry[2]}" for entry in entries}
+    selected_id = st.selectbox(
+        t('timeline.read_full'),
+        list(titles),
+        index=None,
+        format_func=titles.get,
+        placeholder=t('timeline.read_full_placeholder'),
+        key='full_entry'
+    )
+    if not selected_id:
+        return
+    # 正文按需解压，只读取选中的这一篇
+    with st.expander(titles[selected_id], expanded=True):
+        st.write(load_body(db, selected_id) or '')
+
+def show_similar_entries(db, entries):
+    """显示与所选日记相似的日记"""
+    st.markdown(f"#### {t('timeline.similar_entries')}")
+    titles = {entry[0]: f"{entry[1]} · {entry[2]}" for entry in entries}
+    selected_id = st.selectbox(
+        t('timeline.similar_to'),
+        list(titles),
+        format_func=titles.get,
+        key='similar_entry'
+    )
+    if not selected_id:
+        return
+    
+    similar = get_vector_index(current_tenant().vector_dir).similar(db, selected_id, k=SIMILAR_ENTRIES_LIMIT)
+    if not similar:
+        st.info(t('timeline.no_similar'))
+        return
+    
+    scores = dict(similar)
+    placeholders = ','.join('?' for _ in similar)
+    cursor = db.execute(
+        f"SELECT id, date, title, preview FROM entries WHERE id IN ({placeholders})",
+        list(scores)
+    )
+    rows = sorted(cursor.fetchall(), key=lambda row: -scores[row[0]])
+    for entry_id, date, title, preview in rows:
+        with st.expander(f"{date}: {title}"):
+            st.write(preview or '')
+            st.caption(f"{t('timeline.similarity')}: {scores[entry_id]:.2f}")
+
 def show_mood_distribution(start_date, end_date):
     """显示心情分布统计"""
     try:
@@ -1129,58 +1594,30 @@ def show_mood_distribution(start_date, end_date):
             return
             
         query = """
-            SELECT mood, COUNT(*) as count
-            FROM entries
-            WHERE date BETWEEN ? AND ?
-                AND mood IS NOT NULL
-            GROUP BY mood
-            ORDER BY count DESC
+            SELECT m.name, g.count
+            FROM (
+                SELECT mood_id, COUNT(*) as count
+                FROM entries
+                WHERE date BETWEEN ? AND ?
+                    AND mood_id IS NOT NULL
+                GROUP BY mood_id
+            ) g
+            JOIN moods m ON m.id = g.mood_id
+            ORDER BY g.count DESC
         """
-        cursor = db.execute(query, (start_date, end_date))
-        data = cursor.fetchall()
+        data = cached('mood_distribution', (start_date, end_date),
+                      lambda: db.execute(query, (start_date, end_date)).fetchall())
         
         if not data:
             st.info(t('insights.no_mood_data'))
             return
             
-        from pyecharts import options as opts
-        from pyecharts.charts import Pie
-        from streamlit_echarts import st_pyecharts
-        
-        # 准备数据
-        moods, counts = zip(*data)
-        
-        # 创建饼图
-        c = (
-            Pie()
-            .add(
-                "",
-                [list(z) for z in zip(moods, counts)],
-                radius=["40%", "75%"],
-            )
-            .set_global_opts(
-                title_opts=opts.TitleOpts(
-                    title="心情分布",
-                    subtitle=f"从 {start_date} 到 {end_date}",
-                    title_textstyle_opts=opts.TextStyleOpts(font_family="Microsoft YaHei"),
-                ),
-                legend_opts=opts.LegendOpts(
-                    orient="vertical",
-                    pos_top="15%",
-                    pos_left="2%",
-                    textstyle_opts=opts.TextStyleOpts(font_family="Microsoft YaHei"),
-                ),
-            )
-            .set_series_opts(
-                label_opts=opts.LabelOpts(
-                    formatter="{b}: {c} ({d}%)",
-                    font_family="Microsoft YaHei",
-                )
-            )
-        )
-        
-        # 显示图表
-        st_pyecharts(c)
+        spec = chart_spec('mood_distribution', (start_date, end_date), lambda: pie(
+            t('insights.mood_distribution'),
+            t('charts.range', start=start_date, end=end_date),
+            data,
+        ))
+        show_chart(spec)
         
     except Exception as e:
         logger.error(f"Error showing mood distribution: {e}")
@@ -1189,6 +1626,41 @@ def show_mood_distribution(start_date, end_date):
         if 'db' in locals() and db is not None:
             db.close()
 
+def topic_words(db, start_date, end_date):
+    """统计时间段内主题关键词、正文和附件文本的词频，返回前 100 个 (词, 频次)
+
+    行逐批读取、文本按块分词，词表最多保留 wordcloud_max_terms 个词，内存占用只取决于
+    块大小和这个上限。词表被截断过时频次是近似值（见 keep_common）。
+    """
+    # 查询主题数据
+    query = """
+        SELECT keywords, x.content, attachment_text
+        FROM topics t
+        JOIN entries e ON t.entry_id = e.id
+        JOIN entry_texts x ON x.entry_id = e.id
+        WHERE e.date BETWEEN ? AND ?
+    """
+    cursor = db.execute(query, (start_date, end_date))
+    
+    import jieba
+    
+    def pieces():
+        # 处理关键词和内容
+        for keywords, content, attachment_text in iter_rows(cursor):
+            if keywords:
+                yield ' '.join(json.loads(keywords))
+            yield content
+            yield attachment_text
+    
+    # 使用jieba分词，块之间以空格分隔，分词结果与整体分词相同
+    word_freq = Counter()
+    for text in text_chunks(pieces()):
+        word_freq.update(word for word in jieba.cut(text) if len(word.strip()) > 1)  # 只统计长度大于1词
+        keep_common(word_freq, MEMORY_CONFIG['wordcloud_max_terms'])
+    
+    # 取前100个词
+    return word_freq.most_common(100)
+
 def show_topic_wordcloud(start_date, end_date):
     """显示主题词云"""
     try:
@@ -1197,66 +1669,20 @@ def show_topic_wordcloud(start_date, end_date):
             st.error(t('error.db_connect'))
             return
             
-        # 查询主题数据
-        query = """
-            SELECT keywords, content
-            FROM topics t
-            JOIN entries e ON t.entry_id = e.id
-            WHERE e.date BETWEEN ? AND ?
-        """
-        cursor = db.execute(query, (start_date, end_date))
-        data = cursor.fetchall()
+        # 分词是洞察页最慢的一步，结果放在共享缓存中
+        words_data = cached('topic_words', (start_date, end_date),
+                            lambda: topic_words(db, start_date, end_date))
         
-        if not data:
+        if not words_data:
             st.info(t('insights.no_topics'))
             return
             
-        # 使用jieba分词和pyecharts成词云
-        import jieba
-        from pyecharts import options as opts
-        from pyecharts.charts import WordCloud as PyeWordCloud
-        from streamlit_echarts import st_pyecharts
-        
-        # 处理关键词和内容
-        text = ''
-        for keywords, content in data:
-            if keywords:
-                text += ' ' + ' '.join(json.loads(keywords))
-            if content:
-                text += ' ' + content
-                
-        # 使用jieba分词
-        words = jieba.cut(text)
-        word_freq = {}
-        for word in words:
-            if len(word.strip()) > 1:  # 只统计长度大于1词
-                word_freq[word] = word_freq.get(word, 0) + 1
-                
-        # 转换为pyecharts需要的格式
-        words_data = [(word, freq) for word, freq in word_freq.items()]
-        words_data.sort(key=lambda x: x[1], reverse=True)
-        words_data = words_data[:100]  # 取前100个词
-        
-        # 创建词云图
-        c = (
-            PyeWordCloud()
-            .add(
-                "",
-                words_data,
-                word_size_range=[15, 80],
-                textstyle_opts=opts.TextStyleOpts(font_family="Microsoft YaHei"),
-            )
-            .set_global_opts(
-                title_opts=opts.TitleOpts(
-                    title="主题词云",
-                    subtitle="基于日记内容分析",
-                    title_textstyle_opts=opts.TextStyleOpts(font_family="Microsoft YaHei"),
-                ),
-            )
-        )
-        
-        # 显示词云
-        st_pyecharts(c)
+        spec = chart_spec('topic_wordcloud', (start_date, end_date), lambda: word_cloud(
+            t('insights.topic_wordcloud'),
+            t('charts.wordcloud_subtitle'),
+            words_data,
+        ))
+        show_chart(spec)
         
     except Exception as e:
         logger.error(f"Error showing topic wordcloud: {e}")
@@ -1273,14 +1699,17 @@ def show_word_count_stats(start_date, end_date):
             st.error(t('error.db_connect'))
             return
             
-        query = """
-            SELECT date, LENGTH(content) - LENGTH(REPLACE(content, ' ', '')) + 1 as word_count
+        granularity = choose_granularity(start_date, end_date)
+        query = f"""
+            SELECT {bucket_expression(granularity)} as bucket,
+                   AVG(word_count) as word_count
             FROM entries
             WHERE date BETWEEN ? AND ?
-            ORDER BY date
+            GROUP BY bucket
+            ORDER BY bucket
         """
-        cursor = db.execute(query, (start_date, end_date))
-        data = cursor.fetchall()
+        data = cached('word_count_stats', (start_date, end_date, granularity),
+                      lambda: db.execute(query, (start_date, end_date)).fetchall())
         
         if not data:
             st.info(t('insights.no_entries'))
@@ -1289,9 +1718,10 @@ def show_word_count_stats(start_date, end_date):
         # 使用 plotly 绘制字数统计图
         import plotly.graph_objects as go
         
-        dates, word_counts = zip(*data)
+        buckets = bucket_keys(start_date, end_date, granularity)
+        word_counts = fill_series(buckets, data)
         fig = go.Figure(data=[go.Bar(
-            x=dates,
+            x=[bucket_label(key, granularity) for key in buckets],
             y=word_counts,
             name=t('insights.word_count')
         )])
@@ -1320,39 +1750,48 @@ def show_writing_time_distribution(start_date, end_date):
             st.error(t('error.db_connect'))
             return
             
-        query = """
-            SELECT strftime('%H', created_at) as hour,
-                   COUNT(*) as entry_count
-            FROM entries
-            WHERE date BETWEEN ? AND ?
-            GROUP BY hour
-            ORDER BY hour
-        """
-        cursor = db.execute(query, (start_date, end_date))
-        data = cursor.fetchall()
+        # 本地时间列由 (date, local_hour, local_weekday, local_week) 索引覆盖，不必回表
+        def distribution():
+            return {
+                column: fill_series(range(size), db.execute(f"""
+                    SELECT {column}, COUNT(*)
+                    FROM entries
+                    WHERE date BETWEEN ? AND ?
+                        AND {column} IS NOT NULL
+                    GROUP BY {column}
+                """, (start_date, end_date)))
+                for column, size in (('local_hour', 24), ('local_weekday', 7))
+            }
+        data = cached('writing_time_local', (start_date, end_date), distribution)
         
-        if not data:
+        if not any(data['local_hour']):
             st.info(t('insights.no_entries'))
             return
             
         # 使用 plotly 绘制时间分布图
         import plotly.graph_objects as go
         
-        hours, counts = zip(*data)
-        fig = go.Figure(data=[go.Bar(
-            x=hours,
-            y=counts,
-            name=t('insights.writing_time')
-        )])
-        
-        fig.update_layout(
-            title=t('insights.writing_time_distribution'),
-            xaxis_title=t('insights.hour'),
-            yaxis_title=t('insights.entry_count'),
-            height=400
-        )
+        def figure(labels, counts, axis_title):
+            fig = go.Figure(data=[go.Bar(
+                x=labels,
+                y=counts,
+                name=t('insights.writing_time')
+            )])
+            fig.update_layout(
+                title=t('insights.writing_time_distribution'),
+                xaxis_title=axis_title,
+                yaxis_title=t('insights.entry_count'),
+                height=400
+            )
+            return fig
         
-        st.plotly_chart(fig)
+        weekdays = ZH_WEEKDAYS if I18nManager.get_current_lang() == 'zh' else EN_WEEKDAYS
+        hour_tab, weekday_tab = st.tabs([t('insights.hour'), t('insights.weekday')])
+        with hour_tab:
+            st.plotly_chart(figure([f"{hour:02d}" for hour in range(24)], data['local_hour'], t('insights.hour')))
+        with weekday_tab:
+            st.plotly_chart(figure(list(weekdays), data['local_weekday'], t('insights.weekday')))
+        st.caption(t('insights.timezone_note', timezone=st.session_state.get('timezone', '')))
         
     except Exception as e:
         logger.error(f"Error showing writing time distribution: {e}")
@@ -1361,19 +1800,36 @@ def show_writing_time_distribution(start_date, end_date):
         if 'db' in locals() and db is not None:
             db.close()
 
-def get_all_tags():
-    """获取所有标签"""
+def get_vocabulary_options():
+    """编辑器中心情、天气、地点的选项"""
     try:
         db = init_db()
         if not db:
-            return []
+            return {kind: [] for kind in VOCABULARY_KINDS}
+        return cached('vocabulary_options', (),
+                      lambda: {kind: vocabulary_options(db, kind) for kind in VOCABULARY_KINDS})
+    except sqlite3.Error as e:
+        logger.error(f"Error fetching vocabulary: {e}")
+        return {kind: [] for kind in VOCABULARY_KINDS}
+    finally:
+        if 'db' in locals() and db is not None:
+            db.close()
+
+def get_tag_suggestions(query='', selected=()):
+    """获取标签补全候选"""
+    try:
+        db = init_db()
+        if not db:
+            return list(selected)
             
-        cursor = db.execute('SELECT name FROM tags ORDER BY name')
-        return [row[0] for row in cursor.fetchall()]
+        # 已选中的标签在缓存之外合并，选择变化不会造成未命中
+        suggestions = cached('tag_suggestions', (query,),
+                             lambda: suggest_tags(db, current_tenant().db_path, query))
+        return list(dict.fromkeys([*selected, *suggestions]))
         
     except sqlite3.Error as e:
         logger.error(f"Error fetching tags: {e}")
-        return []
+        return list(selected)
     finally:
         if 'db' in locals() and db is not None:
             db.close()
@@ -1386,59 +1842,29 @@ def show_topic_trends(start_date, end_date):
             st.error(t('error.db_connect'))
             return
             
-        query = """
-            SELECT e.date, t.topic, COUNT(*) as count
+        granularity = choose_granularity(start_date, end_date)
+        query = f"""
+            SELECT {bucket_expression(granularity, 'e.date')} as bucket, t.topic, COUNT(*) as count
             FROM topics t
             JOIN entries e ON t.entry_id = e.id
             WHERE e.date BETWEEN ? AND ?
-            GROUP BY e.date, t.topic
-            ORDER BY e.date, count DESC
+            GROUP BY bucket, t.topic
+            ORDER BY bucket, count DESC
         """
-        cursor = db.execute(query, (start_date, end_date))
-        data = cursor.fetchall()
+        data = cached('topic_trends', (start_date, end_date, granularity),
+                      lambda: db.execute(query, (start_date, end_date)).fetchall())
         
         if not data:
             st.info(t('insights.no_topics'))
             return
             
-        from pyecharts import options as opts
-        from pyecharts.charts import ThemeRiver
-        from streamlit_echarts import st_pyecharts
-        
-        # 转换数据格式为主题河流图所需的格式
-        theme_data = []
-        for date, topic, count in data:
-            theme_data.append([date, count, topic])
-        
-        c = (
-            ThemeRiver()
-            .add(
-                series_name=[],
-                data=theme_data,
-                singleaxis_opts=opts.SingleAxisOpts(
-                    pos_top="50",
-                    pos_bottom="50",
-                    type_="time",
-                ),
-            )
-            .set_global_opts(
-                title_opts=opts.TitleOpts(
-                    title="主题变化趋势",
-                    subtitle=f"从 {start_date} 到 {end_date}",
-                ),
-                tooltip_opts=opts.TooltipOpts(
-                    trigger="axis",
-                    axis_pointer_type="line"
-                ),
-                legend_opts=opts.LegendOpts(
-                    pos_top="15%",
-                    orient="horizontal",
-                    textstyle_opts=opts.TextStyleOpts(font_family="Microsoft YaHei"),
-                ),
-            )
-        )
-        
-        st_pyecharts(c)
+        # 主题河流图的数据格式为 [日期, 篇数, 主题]
+        spec = chart_spec('topic_trends', (start_date, end_date, granularity), lambda: theme_river(
+            t('insights.topic_trends'),
+            f"{t('charts.range', start=start_date, end=end_date)} · {t(f'insights.granularity_{granularity}')}",
+            [(date, count, topic) for date, topic, count in data],
+        ))
+        show_chart(spec)
         
     except Exception as e:
         logger.error(f"Error showing topic trends: {e}")
@@ -1455,26 +1881,27 @@ def show_key_events_timeline(start_date, end_date):
             st.error(t('error.db_connect'))
             return
             
+        # CROSS JOIN 固定从 topics 出发，按情感索引倒序读取，凑够 10 条即停止
         query = """
-            SELECT e.date, e.title, e.content, t.sentiment
-            FROM entries e
-            LEFT JOIN topics t ON e.id = t.entry_id
-            WHERE e.date BETWEEN ? AND ?
-                AND t.sentiment IS NOT NULL
+            SELECT e.date, e.title, e.preview, t.sentiment
+            FROM topics t
+            CROSS JOIN entries e ON e.id = t.entry_id
+            WHERE t.sentiment IS NOT NULL
+                AND e.date BETWEEN ? AND ?
             ORDER BY t.sentiment DESC
             LIMIT 10
         """
-        cursor = db.execute(query, (start_date, end_date))
-        events = cursor.fetchall()
+        events = cached('key_events', (start_date, end_date),
+                        lambda: db.execute(query, (start_date, end_date)).fetchall())
         
         if not events:
             st.info(t('insights.no_key_events'))
             return
             
         st.markdown(f"### {t('insights.key_events')}")
-        for date, title, content, sentiment in events:
+        for date, title, preview, sentiment in events:
             with st.expander(f"{date}: {title}"):
-                st.write(content[:200] + "..." if len(content) > 200 else content)
+                st.write(preview or '')
                 st.caption(f"{t('insights.sentiment')}: {sentiment:.2f}")
                 
     except Exception as e:
@@ -1493,86 +1920,49 @@ def show_growth_indicators(start_date, end_date):
             return
             
         # 获取写作量数据
-        writing_query = """
-            SELECT date, LENGTH(content) as length,
+        granularity = choose_granularity(start_date, end_date)
+        writing_query = f"""
+            SELECT {bucket_expression(granularity)} as bucket,
+                   CAST(AVG(char_count) AS INTEGER) as length,
                    COUNT(*) as entry_count
             FROM entries
             WHERE date BETWEEN ? AND ?
-            GROUP BY date
-            ORDER BY date
+            GROUP BY bucket
+            ORDER BY bucket
         """
-        cursor = db.execute(writing_query, (start_date, end_date))
-        writing_data = cursor.fetchall()
+        writing_data = cached('growth_indicators', (start_date, end_date, granularity),
+                              lambda: db.execute(writing_query, (start_date, end_date)).fetchall())
         
         if writing_data:
-            from pyecharts import options as opts
-            from pyecharts.charts import Line, Grid
-            from streamlit_echarts import st_pyecharts
-            
-            dates = [row[0] for row in writing_data]
             lengths = [row[1] for row in writing_data]
             counts = [row[2] for row in writing_data]
             
             # 创建写作量趋势图
-            line = (
-                Line()
-                .add_xaxis(dates)
-                .add_yaxis(
-                    "字数",
-                    lengths,
-                    symbol_size=8,
-                    color="#1976D2",
-                    is_smooth=True,
-                )
-                .add_yaxis(
-                    "日记数",
-                    counts,
-                    symbol_size=8,
-                    color="#4CAF50",
-                    is_smooth=True,
-                )
-                .set_global_opts(
-                    title_opts=opts.TitleOpts(
-                        title="写作成长趋势",
-                        subtitle=f"从 {start_date} 到 {end_date}",
-                        title_textstyle_opts=opts.TextStyleOpts(font_family="Microsoft YaHei"),
-                    ),
-                    xaxis_opts=opts.AxisOpts(
-                        type_="category",
-                        name="日期",
-                        name_location="end",
-                        axislabel_opts=opts.LabelOpts(rotate=45),
-                    ),
-                    yaxis_opts=opts.AxisOpts(
-                        type_="value",
-                        name="数量",
-                        name_location="end",
-                        splitline_opts=opts.SplitLineOpts(is_show=True),
-                    ),
-                    legend_opts=opts.LegendOpts(
-                        pos_top="5%",
-                        pos_left="center",
-                        orient="horizontal",
-                    ),
-                    tooltip_opts=opts.TooltipOpts(trigger="axis"),
-                )
-            )
-            
-            st_pyecharts(line)
+            spec = chart_spec('growth_indicators', (start_date, end_date, granularity), lambda: time_series(
+                t('charts.writing_growth'),
+                f"{t('charts.range', start=start_date, end=end_date)} · {t(f'insights.granularity_{granularity}')}",
+                [bucket_label(row[0], granularity) for row in writing_data],
+                [series('line', t('charts.characters'), lengths, color="#1976D2", symbolSize=8, smooth=True),
+                 series('line', t('charts.entries'), counts, color="#4CAF50", symbolSize=8, smooth=True)],
+                t('insights.date'),
+                t('insights.count'),
+                splitLine={'show': True},
+            ))
+            show_chart(spec)
             
             # 显示统计指标
             col1, col2 = st.columns(2)
             with col1:
                 avg_length = sum(lengths) / len(lengths)
                 st.metric(
-                    "平均字数",
+                    t('insights.avg_length'),
                     f"{int(avg_length)}",
                     delta=f"{int(lengths[-1] - avg_length)}"
                 )
             with col2:
                 avg_count = sum(counts) / len(counts)
                 st.metric(
-                    "平均日记数",
+                    t('charts.avg_entries'),
                     f"{avg_count:.1f}",
                     delta=f"{counts[-1] - avg_count:.1f}"
                 )
@@ -0,0 +1,441 @@
+"""附件文本提取：PDF 和 Word 附件的正文进入搜索和分析，首页生成预览图
+
+保存日记时只登记待处理的附件（attachment_extracts 表，状态为 pending），
+提取在后台进行，不增加上传耗时：后台线程计算文件的 SHA-256，查内容缓存，
+未命中时交给进程池解析。子进程用 SIGALRM 限制单个文件的耗时，解析结果
+（文本和预览图）按内容哈希存入 ATTACHMENT_CACHE_DIR，同样的文件不会被
+重复解析，即使它被不同的日记或用户上传。
+
+提取完成后，一篇日记所有附件的文本合并写入 entries.attachment_text，
+预览图路径写入 entries.attachment_previews（{附件路径: 预览图路径}）。
+进程重启后，resume_pending() 会重新提交仍为 pending 的附件。
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import threading
+import time
+import zipfile
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from xml.etree import ElementTree
+
+from config import Config
+from tenancy import commit_quietly
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CONFIG = Config.EXTRACTION_CONFIG
+
+# .doc（旧版二进制格式）没有纯 Python 的解析器，登记为 unsupported
+EXTRACTABLE_EXTENSIONS = ('.pdf', '.docx')
+DOCUMENT_EXTENSIONS = ('.pdf', '.docx', '.doc')
+
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_UNSUPPORTED = 'unsupported'
+
+PREVIEW_DIR = 'previews'    # 相对于用户的上传目录
+
+# 进程池因其他任务超时被回收时，受牵连的任务重新提交的次数上限
+RESUBMIT_LIMIT = 3
+
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def ensure_schema(db):
+    """添加附件文本列和提取状态表"""
+    columns = {row[1] for row in db.execute("PRAGMA table_info(entries)")}
+    for column in ('attachment_text', 'attachment_previews'):
+        if column not in columns:
+            db.execute(f"ALTER TABLE entries ADD COLUMN {column} TEXT")
+    db.executescript('''
+        CREATE TABLE IF NOT EXISTS attachment_extracts (
+            entry_id TEXT NOT NULL,
+            path TEXT NOT NULL,
+            status TEXT NOT NULL,
+            sha256 TEXT,
+            pages INTEGER,
+            text TEXT,
+            preview TEXT,
+            error TEXT,
+            extracted_at TIMESTAMP,
+            PRIMARY KEY (entry_id, path),
+            FOREIGN KEY (entry_id) REFERENCES entries(id) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS idx_attachment_extracts_pending
+            ON attachment_extracts(entry_id) WHERE status = 'pending';
+    ''')
+
+
+# ---------------------------------------------------------------------------
+# 子进程中运行的解析函数
+# ---------------------------------------------------------------------------
+
+def _on_timeout(signum, frame):
+    raise TimeoutError("extraction timed out")
+
+
+def _save_preview(image, preview_path, width):
+    image = image.convert('RGB')
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))))
+    image.save(preview_path, format='PNG', optimize=True)
+
+
+def _extract_pdf(path, preview_path, max_pages, max_chars, width):
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        texts = []
+        length = 0
+        preview = False
+        for index in range(min(len(pdf), max_pages)):
+            page = pdf[index]
+            try:
+                if index == 0:
+                    bitmap = page.render(scale=width / max(page.get_width(), 1))
+                    _save_preview(bitmap.to_pil(), preview_path, width)
+                    preview = True
+                textpage = page.get_textpage()
+                texts.append(textpage.get_text_bounded())
+                textpage.close()
+            finally:
+                page.close()
+            length += len(texts[-1])
+            if length >= max_chars:
+                break
+        return {'text': '\n'.join(texts)[:max_chars], 'pages': len(pdf), 'preview': preview}
+    finally:
+        pdf.close()
+
+
+def _extract_docx(path, preview_path, max_pages, max_chars, width):
+    """直接读取 OOXML：正文段落来自 word/document.xml，预览图用文档自带的缩略图"""
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read('word/document.xml'))
+        paragraphs = []
+        length = 0
+        for paragraph in root.iter(f'{_WORD_NS}p'):
+            text = ''.join(node.text or '' for node in paragraph.iter(f'{_WORD_NS}t'))
+            if text:
+                paragraphs.append(text)
+                length += len(text)
+                if length >= max_chars:
+                    break
+
+        pages = None
+        if 'docProps/app.xml' in archive.namelist():
+            app_props = ElementTree.fromstring(archive.read('docProps/app.xml'))
+            for node in app_props:
+                if node.tag.endswith('}Pages') and (node.text or '').isdigit():
+                    pages = int(node.text)
+
+        preview = False
+        thumbnails = [name for name in archive.namelist()
+                      if name.lower().startswith('docprops/thumbnail.')
+                      and name.lower().endswith(('.png', '.jpeg', '.jpg'))]
+        if thumbnails:
+            from io import BytesIO
+            from PIL import Image
+
+            with Image.open(BytesIO(archive.read(thumbnails[0]))) as image:
+                _save_preview(image, preview_path, width)
+            preview = True
+
+    return {'text': '\n'.join(paragraphs)[:max_chars], 'pages': pages, 'preview': preview}
+
+
+def report_pid(queue):
+    """进程池子进程的 initializer：报告自己的 pid，超时回收进程池时据此终止子进程"""
+    queue.put(os.getpid())
+
+
+def extract_file(path, preview_path, timeout, max_pages, max_chars, width):
+    """解析一个文件，返回 {'text', 'pages', 'preview'}；超时抛出 TimeoutError"""
+    if hasattr(signal, 'SIGALRM'):
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.alarm(timeout)
+    try:
+        extension = Path(path).suffix.lower()
+        if extension == '.pdf':
+            return _extract_pdf(path, preview_path, max_pages, max_chars, width)
+        if extension == '.docx':
+            return _extract_docx(path, preview_path, max_pages, max_chars, width)
+        raise ValueError(f"Unsupported attachment type: {extension}")
+    finally:
+        if hasattr(signal, 'SIGALRM'):
+            signal.alarm(0)
+
+
+# ---------------------------------------------------------------------------
+# 内容缓存
+# ---------------------------------------------------------------------------
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(sha256):
+    directory = Path(Config.ATTACHMENT_CACHE_DIR) / sha256[:2]
+    return directory / f"{sha256}.json", directory / f"{sha256}.png"
+
+
+def _read_cache(sha256):
+    result_path, _ = _cache_paths(sha256)
+    try:
+        return json.loads(result_path.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable attachment cache {result_path}: {e}")
+        return None
+
+
+def _write_cache(sha256, result):
+    result_path, _ = _cache_paths(sha256)
+    temp_path = result_path.with_suffix(f".{os.getpid()}.tmp")
+    temp_path.write_text(json.dumps(result, ensure_ascii=False), encoding='utf-8')
+    os.replace(temp_path, result_path)
+
+
+# ---------------------------------------------------------------------------
+# 后台提取
+# ---------------------------------------------------------------------------
+
+class AttachmentExtractor:
+    """后台线程负责哈希、查缓存和写库，解析交给进程池"""
+
+    def __init__(self, workers, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='attachment-text')
+        self._processes = None
+        self._pid_queues = {}   # 进程池 -> 子进程报告 pid 的队列
+        self._inflight = {}     # sha256 -> 解析中的 Future，相同内容只解析一次
+
+    def _pool(self):
+        with self._lock:
+            if self._processes is None:
+                # spawn：Streamlit 进程中有很多线程，fork 出的子进程可能继承被持有的锁
+                context = multiprocessing.get_context('spawn')
+                pids = context.SimpleQueue()
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context, initializer=report_pid, initargs=(pids,)
+                )
+                self._pid_queues[self._processes] = pids
+            return self._processes
+
+    def _recycle_pool(self, pool):
+        """换一个新的进程池，并结束旧池的子进程
+
+        卡在原生代码中的解析收不到 SIGALRM，只能终止子进程。旧池中排队或正在运行
+        的其他任务随之以 CancelledError / BrokenProcessPool 结束，由 _parse 重新提交
+        到新池。
+        """
+        with self._lock:
+            if self._processes is pool:
+                self._processes = None
+            pids = self._pid_queues.pop(pool, None)
+        pool.shutdown(wait=False, cancel_futures=True)
+        if pids is None:
+            return
+        reported = set()
+        while not pids.empty():
+            reported.add(pids.get())
+        pids.close()
+        # 只终止本进程中仍在运行、且由这个进程池启动的子进程
+        processes = [process for process in multiprocessing.active_children() if process.pid in reported]
+        for process in processes:
+            process.terminate()
+        logger.warning(f"Terminated {len(processes)} attachment worker(s) after a timeout")
+
+    def submit(self, tenant, entry_id, paths):
+        """提交一篇日记的附件，立即返回"""
+        for path in paths:
+            self._threads.submit(self._process, tenant, entry_id, path)
+
+    def _wait(self, future):
+        """等待解析结果；超时从任务开始运行时算起，排队的时间不算
+
+        子进程自己用 SIGALRM 限时，这里多留一些余量作为兜底。
+        """
+        deadline = None
+        while True:
+            remaining = 1 if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                return future.result(timeout=remaining)
+            except FutureTimeout:
+                if deadline is None:
+                    if future.running():
+                        deadline = time.monotonic() + self.timeout + 5
+                elif time.monotonic() >= deadline:
+                    raise
+
+    def _parse(self, source, sha256):
+        """解析文件并写入内容缓存；同一内容并发提交时共享同一次解析"""
+        _, preview_path = _cache_paths(sha256)
+        for _ in range(RESUBMIT_LIMIT + 1):
+            pool = None
+            with self._lock:
+                future = self._inflight.get(sha256)
+                owner = future is None
+                if owner:
+                    # 另一个线程可能刚刚解析完同样的内容
+                    cached = _read_cache(sha256)
+                    if cached is not None:
+                        return cached
+                    preview_path.parent.mkdir(parents=True, exist_ok=True)
+                    pool = self._pool()
+                    future = pool.submit(
+                        extract_file, str(source), str(preview_path), self.timeout,
+                        EXTRACTION_CONFIG['max_pages'], EXTRACTION_CONFIG['max_chars'],
+                        EXTRACTION_CONFIG['preview_width'],
+                    )
+                    self._inflight[sha256] = future
+            try:
+                result = self._wait(future)
+            except FutureTimeout:
+                if pool is not None:
+                    self._recycle_pool(pool)
+                raise TimeoutError("extraction timed out")
+            except (CancelledError, BrokenProcessPool):
+                # 进程池因为别的任务超时被回收，这个文件本身没有问题，提交到新池
+                continue
+            finally:
+                if owner:
+                    with self._lock:
+                        if self._inflight.get(sha256) is future:
+                            del self._inflight[sha256]
+            if owner:
+                _write_cache(sha256, result)
+            return result
+        raise RuntimeError("extraction interrupted repeatedly by worker restarts")
+
+    def _process(self, tenant, entry_id, path):
+        source = tenant.data_dir / path
+        sha256 = None
+        try:
+            sha256 = file_digest(source)
+            result = _read_cache(sha256)
+            if result is None:
+                result = self._parse(source, sha256)
+            preview = None
+            if result.get('preview'):
+                preview = self._copy_preview(tenant, sha256)
+            _store(tenant, entry_id, path, STATUS_DONE, sha256=sha256, pages=result.get('pages'),
+                   text=result.get('text') or '', preview=preview)
+        except Exception as e:
+            logger.error(f"Error extracting text from {path}: {e}")
+            try:
+                _store(tenant, entry_id, path, STATUS_FAILED, sha256=sha256, error=str(e)[:500])
+            except Exception as store_error:
+                logger.error(f"Error recording extraction failure for {path}: {store_error}")
+
+    @staticmethod
+    def _copy_preview(tenant, sha256):
+        """把缓存中的预览图复制到用户的上传目录，返回相对于数据目录的路径"""
+        _, cached = _cache_paths(sha256)
+        if not cached.exists():
+            return None
+        target = tenant.upload_dir / PREVIEW_DIR / f"{sha256}.png"
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(cached, target)
+        return str(target.relative_to(tenant.data_dir))
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            pool, self._processes = self._processes, None
+            self._pid_queues.pop(pool, None)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _store(tenant, entry_id, path, status, sha256=None, pages=None, text=None, preview=None,
+           error=None):
+    """记录一个附件的提取结果，并重建该日记的附件文本和预览图"""
+    db = tenant.connect()
+    try:
+        db.execute('''
+            UPDATE attachment_extracts
+            SET status = ?, sha256 = ?, pages = ?, text = ?, preview = ?, error = ?, extracted_at = ?
+            WHERE entry_id = ? AND path = ?
+        ''', (status, sha256, pages, text, preview, error, datetime.now().isoformat(timespec='seconds'),
+              entry_id, path))
+        rows = db.execute('''
+            SELECT path, text, preview FROM attachment_extracts
+            WHERE entry_id = ? AND status = ?
+            ORDER BY path
+        ''', (entry_id, STATUS_DONE)).fetchall()
+        texts = [row[1] for row in rows if row[1]]
+        previews = {row[0]: row[2] for row in rows if row[2]}
+        db.execute(
+            "UPDATE entries SET attachment_text = ?, attachment_previews = ? WHERE id = ?",
+            ('\n\n'.join(texts) or None, json.dumps(previews) if previews else None, entry_id)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_extractor():
+    """获取进程内共享的后台提取器"""
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            _extractor = AttachmentExtractor(EXTRACTION_CONFIG['workers'], EXTRACTION_CONFIG['timeout'])
+        return _extractor
+
+
+def queue_attachments(db, tenant, entry_id, paths):
+    """登记一篇日记中的文档附件并提交后台提取；调用方在保存日记后调用"""
+    documents = [path for path in paths if Path(path).suffix.lower() in DOCUMENT_EXTENSIONS]
+    if not documents:
+        return 0
+    db.executemany(
+        "INSERT OR IGNORE INTO attachment_extracts (entry_id, path, status) VALUES (?, ?, ?)",
+        [(entry_id, path,
+          STATUS_PENDING if Path(path).suffix.lower() in EXTRACTABLE_EXTENSIONS else STATUS_UNSUPPORTED)
+         for path in documents]
+    )
+    # 只登记了提取状态，结果写入日记时（_store）才改变数据版本
+    commit_quietly(db)
+    extractable = [path for path in documents if Path(path).suffix.lower() in EXTRACTABLE_EXTENSIONS]
+    if extractable:
+        get_extractor().submit(tenant, entry_id, extractable)
+    return len(extractable)
+
+
+def resume_pending(db, tenant):
+    """重新提交上次进程退出时仍未完成的附件"""
+    rows = db.execute(
+        "SELECT entry_id, path FROM attachment_extracts WHERE status = ?", (STATUS_PENDING,)
+    ).fetchall()
+    by_entry = {}
+    for entry_id, path in rows:
+        by_entry.setdefault(entry_id, []).append(path)
+    for entry_id, paths in by_entry.items():
+        get_extractor().submit(tenant, entry_id, paths)
+    if rows:
+        logger.info(f"Resumed text extraction for {len(rows)} attachments")
+    return len(rows)
@@ -0,0 +1,97 @@
+"""时间序列分桶：根据时间跨度自动选择按日/周/月/年聚合"""
+from datetime import date, datetime, timedelta
+
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+YEAR = 'year'
+GRANULARITIES = (DAY, WEEK, MONTH, YEAR)
+
+# 每条序列最多的数据点数
+DEFAULT_MAX_POINTS = 90
+
+# 每个桶都用起始日期（ISO 格式）作为键，周从周一开始
+_BUCKET_SQL = {
+    DAY: "date({column})",
+    WEEK: "date({column}, 'weekday 0', '-6 days')",
+    MONTH: "date({column}, 'start of month')",
+    YEAR: "date({column}, 'start of year')",
+}
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def choose_granularity(start_date, end_date, max_points=DEFAULT_MAX_POINTS):
+    """选择能让数据点数不超过 max_points 的最细粒度"""
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    days = (end_date - start_date).days + 1
+    if days <= max_points:
+        return DAY
+    if days / 7 <= max_points:
+        return WEEK
+    if _month_index(end_date) - _month_index(start_date) + 1 <= max_points:
+        return MONTH
+    return YEAR
+
+
+def bucket_expression(granularity, column='date'):
+    """返回把日期列映射到桶起始日期的 SQL 表达式"""
+    return _BUCKET_SQL[granularity].format(column=column)
+
+
+def bucket_start(day, granularity):
+    """返回某一天所在桶的起始日期"""
+    day = _as_date(day)
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == MONTH:
+        return day.replace(day=1)
+    if granularity == YEAR:
+        return day.replace(month=1, day=1)
+    return day
+
+
+def _next_bucket(day, granularity):
+    if granularity == DAY:
+        return day + timedelta(days=1)
+    if granularity == WEEK:
+        return day + timedelta(days=7)
+    if granularity == MONTH:
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return date(day.year + 1, 1, 1)
+
+
+def bucket_keys(start_date, end_date, granularity):
+    """按顺序返回区间内所有桶的键，用于补齐没有数据的桶"""
+    current = bucket_start(start_date, granularity)
+    end_date = _as_date(end_date)
+    keys = []
+    while current <= end_date:
+        keys.append(current.isoformat())
+        current = _next_bucket(current, granularity)
+    return keys
+
+
+def bucket_label(key, granularity):
+    """桶在坐标轴上的显示文本"""
+    if granularity == MONTH:
+        return key[:7]
+    if granularity == YEAR:
+        return key[:4]
+    return key
+
+
+def fill_series(keys, rows, default=0):
+    """把 (bucket, value) 行对齐到完整的桶序列上"""
+    values = dict(rows)
+    return [values.get(key, default) for key in keys]
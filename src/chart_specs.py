@@ -0,0 +1,166 @@
+"""洞察页图表的 ECharts 配置
+
+图表直接由聚合结果生成 ECharts 的 option 字典，不再经过 pyecharts：pyecharts
+每次运行都要构造整套 Opts 对象、为每个组件补上几十项默认值，再序列化两遍。
+这里只写出与 ECharts 默认值不同的项；字体、配色、标题、图例、提示框和坐标轴等
+共同的样式放在 TEMPLATES 中，各图表在模板上补充自己的部分。
+
+to_json() 把 option 序列化成紧凑的 JSON。app.py 把 JSON 按
+(图表, 时间段, 数据版本, 语言) 放进共享缓存，再次运行时只需解析后交给 st_echarts。
+"""
+import copy
+import json
+
+from config import Config
+
+CHART_CONFIG = Config.CHART_CONFIG
+
+FONT = {'fontFamily': CHART_CONFIG['font_family']}
+
+
+def _merge(base, override):
+    """把 override 逐层合并进 base 的副本；字典合并，其他值覆盖"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            merged[key] = _merge(base[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# 模板
+# ---------------------------------------------------------------------------
+
+_BASE = {
+    'color': CHART_CONFIG['palette'],
+    'title': {'textStyle': FONT},
+    'tooltip': {'trigger': 'item'},
+}
+
+TEMPLATES = {
+    'base': _BASE,
+    # 横轴为时间桶的折线图和柱状图
+    'time_series': _merge(_BASE, {
+        'legend': {'top': '5%', 'left': 'center', 'orient': 'horizontal'},
+        'tooltip': {'trigger': 'axis'},
+        'xAxis': {'type': 'category', 'nameLocation': 'end', 'axisLabel': {'rotate': 45}},
+        'yAxis': {'type': 'value', 'nameLocation': 'end'},
+    }),
+}
+
+
+def from_template(name, **options):
+    """以模板为底的 option，options 中的同名项逐层覆盖模板"""
+    return _merge(copy.deepcopy(TEMPLATES[name]), options)
+
+
+def to_json(options):
+    return json.dumps(options, ensure_ascii=False, separators=(',', ':'))
+
+
+# ---------------------------------------------------------------------------
+# 图表
+# ---------------------------------------------------------------------------
+
+def series(kind, name, data, color=None, **extra):
+    """一个系列；color 为空时使用模板的配色"""
+    item = {'type': kind, 'name': name, 'data': list(data), **extra}
+    if color:
+        item['itemStyle'] = {'color': color}
+    return item
+
+
+def time_series(title, subtitle, labels, series_list, x_name, y_name, **y_axis):
+    """横轴为时间桶的图表，series_list 中的数据与 labels 一一对应"""
+    return from_template(
+        'time_series',
+        title={'text': title, 'subtext': subtitle},
+        legend={'data': [item['name'] for item in series_list]},
+        xAxis={'name': x_name, 'data': list(labels)},
+        yAxis={'name': y_name, **y_axis},
+        series=series_list,
+    )
+
+
+def calendar_heatmap(title, subtitle, name, data, start, end, lang):
+    """写作日历；data 为 [[ISO 日期, 篇数], ...]"""
+    name_map = 'cn' if lang == 'zh' else 'en'
+    return from_template(
+        'base',
+        title={'text': title, 'subtext': subtitle},
+        tooltip={'formatter': '{c}'},
+        calendar={
+            'range': [start.isoformat(), end.isoformat()],
+            'cellSize': 20,
+            'dayLabel': {'nameMap': name_map},
+            'monthLabel': {'nameMap': name_map},
+        },
+        visualMap={
+            'type': 'continuous',
+            'min': 0,
+            'max': max((count for _, count in data), default=1),
+            'calculable': True,
+            'orient': 'horizontal',
+            'left': 'center',
+            'top': 'bottom',
+            'inRange': {'color': CHART_CONFIG['calendar_colors']},
+        },
+        series=[series('heatmap', name, data, coordinateSystem='calendar')],
+    )
+
+
+def pie(title, subtitle, data):
+    """环形图；data 为 [(名称, 数值), ...]"""
+    return from_template(
+        'base',
+        title={'text': title, 'subtext': subtitle},
+        legend={'orient': 'vertical', 'top': '15%', 'left': '2%', 'textStyle': FONT},
+        series=[series(
+            'pie', '', ({'name': name, 'value': value} for name, value in data),
+            radius=['40%', '75%'],
+            label={'formatter': '{b}: {c} ({d}%)', **FONT},
+        )],
+    )
+
+
+def word_cloud(title, subtitle, words):
+    """词云；words 为 [(词, 频次), ...]
+
+    pyecharts 给每个词随机取色，这里按配色依次取色，同样的数据得到同样的 JSON，
+    才能放进缓存。
+    """
+    palette = CHART_CONFIG['palette']
+    return from_template(
+        'base',
+        title={'text': title, 'subtext': subtitle},
+        series=[series(
+            'wordCloud', '',
+            ({'name': word, 'value': count, 'textStyle': {'color': palette[index % len(palette)]}}
+             for index, (word, count) in enumerate(words)),
+            shape='circle',
+            sizeRange=[15, 80],
+            rotationRange=[-90, 90],
+            rotationStep=45,
+            gridSize=20,
+            textStyle=FONT,
+        )],
+    )
+
+
+def theme_river(title, subtitle, data):
+    """主题河流图；data 为 [(日期, 篇数, 主题), ...]"""
+    return from_template(
+        'base',
+        title={'text': title, 'subtext': subtitle},
+        tooltip={'trigger': 'axis', 'axisPointer': {'type': 'line'}},
+        legend={
+            'data': list(dict.fromkeys(topic for _, _, topic in data)),
+            'top': '15%',
+            'orient': 'horizontal',
+            'textStyle': FONT,
+        },
+        singleAxis={'type': 'time', 'top': 50, 'bottom': 50},
+        series=[series('themeRiver', '', ([day, count, topic] for day, count, topic in data))],
+    )
@@ -0,0 +1,415 @@
+"""网页剪藏：异步抓取、正文提取和响应缓存"""
+import asyncio
+import hashlib
+import ipaddress
+import json
+import logging
+import mimetypes
+import re
+import time
+import uuid
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CLIPPER_CONFIG = Config.CLIPPER_CONFIG
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif'}
+
+USER_AGENT = 'Mozilla/5.0 (compatible; DiaryClipper/1.0)'
+
+
+class ClipError(Exception):
+    """抓取被拒绝：地址不允许访问或响应过大"""
+
+
+# ---------------------------------------------------------------------------
+# 响应缓存
+# ---------------------------------------------------------------------------
+
+class ResponseCache:
+    """磁盘上的 HTTP 响应缓存
+
+    元数据按 URL 存放，正文按 (URL, ETag) 存放。再次抓取时带上
+    If-None-Match / If-Modified-Since，服务器返回 304 时直接使用缓存的正文。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _digest(*parts):
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def _meta_path(self, url):
+        return self.cache_dir / f"{self._digest(url)}.json"
+
+    def _body_path(self, url, etag):
+        return self.cache_dir / f"{self._digest(url, etag or '')}.body"
+
+    def get(self, url):
+        """返回 (meta, body)，没有缓存时返回 (None, None)"""
+        meta_path = self._meta_path(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            body = self._body_path(url, meta.get('etag')).read_bytes()
+            return meta, body
+        except (OSError, ValueError):
+            return None, None
+
+    def put(self, url, response, body):
+        """保存一次成功的响应"""
+        etag = response.headers.get('etag')
+        meta = {
+            'url': url,
+            'final_url': str(response.url),
+            'etag': etag,
+            'last_modified': response.headers.get('last-modified'),
+            'content_type': response.headers.get('content-type', ''),
+            'fetched_at': time.time(),
+        }
+        body_path = self._body_path(url, etag)
+        tmp_path = body_path.with_suffix('.tmp')
+        tmp_path.write_bytes(body)
+        tmp_path.replace(body_path)
+        self._meta_path(url).write_text(json.dumps(meta), encoding='utf-8')
+        return meta
+
+    def validators(self, meta):
+        """条件请求头"""
+        headers = {}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+
+# ---------------------------------------------------------------------------
+# 正文提取
+# ---------------------------------------------------------------------------
+
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'form',
+             'nav', 'footer', 'header', 'aside', 'button', 'select'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+             'meta', 'param', 'source', 'track', 'wbr'}
+BLOCK_TAGS = {'p', 'pre', 'blockquote', 'li', 'h1', 'h2', 'h3', 'h4', 'td'}
+
+POSITIVE_RE = re.compile(r'article|body|content|entry|main|page|post|text|story', re.I)
+NEGATIVE_RE = re.compile(r'comment|footer|sidebar|widget|nav|menu|share|related|promo|ad-|banner|sponsor', re.I)
+PUNCTUATION_RE = re.compile(r'[,，。；;！!？?、]')
+
+
+class _Node:
+    __slots__ = ('tag', 'attrs', 'children', 'parent', 'text')
+
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = dict(attrs or ())
+        self.children = []
+        self.parent = parent
+        self.text = []
+
+    def inner_text(self):
+        parts = list(self.text)
+        for child in self.children:
+            parts.append(child.inner_text())
+        return ' '.join(part for part in parts if part)
+
+    def link_text_length(self):
+        if self.tag == 'a':
+            return len(self.inner_text())
+        return sum(child.link_text_length() for child in self.children)
+
+    def iter(self):
+        yield self
+        for child in self.children:
+            yield from child.iter()
+
+
+class _TreeBuilder(HTMLParser):
+    """把 HTML 解析成轻量的节点树，丢弃脚本、导航等非正文节点"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node('root')
+        self.current = self.root
+        self.skip_depth = 0
+        self.title = ''
+        self.meta = {}
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta':
+            attrs = dict(attrs)
+            key = attrs.get('property') or attrs.get('name')
+            if key and attrs.get('content'):
+                self.meta[key.lower()] = attrs['content']
+            return
+        if tag == 'title':
+            self._in_title = True
+        if self.skip_depth or tag in SKIP_TAGS:
+            if tag not in VOID_TAGS:
+                self.skip_depth += 1
+            return
+        node = _Node(tag, attrs, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        if self.skip_depth:
+            if tag not in VOID_TAGS:
+                self.skip_depth -= 1
+            return
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self.skip_depth:
+            return
+        text = ' '.join(data.split())
+        if text:
+            self.current.text.append(text)
+
+
+def _class_weight(node):
+    names = f"{node.attrs.get('class', '')} {node.attrs.get('id', '')}"
+    weight = 0
+    if POSITIVE_RE.search(names):
+        weight += 25
+    if NEGATIVE_RE.search(names):
+        weight -= 25
+    return weight
+
+
+def extract_content(html, base_url=''):
+    """从网页中提取标题、正文段落和图片地址
+
+    采用 readability 的打分思路：每个文本段落给父节点加分、给祖父节点加一半分，
+    再按 class/id 和链接密度修正，得分最高的节点即为正文容器。
+    """
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    root = builder.root
+
+    scores = {}
+    for node in root.iter():
+        if node.tag not in BLOCK_TAGS or node.parent is None:
+            continue
+        text = node.inner_text()
+        if len(text) < 25:
+            continue
+        score = 1 + len(PUNCTUATION_RE.findall(text)) + min(len(text) // 100, 3)
+        parent = node.parent
+        scores[parent] = scores.get(parent, _class_weight(parent)) + score
+        grandparent = parent.parent
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, _class_weight(grandparent)) + score / 2
+
+    best = root
+    best_score = 0
+    for node, score in scores.items():
+        text_length = len(node.inner_text()) or 1
+        score *= 1 - node.link_text_length() / text_length
+        if score > best_score:
+            best, best_score = node, score
+
+    paragraphs = []
+    images = []
+    for node in best.iter():
+        if node.tag in BLOCK_TAGS:
+            text = node.inner_text()
+            if text and (not paragraphs or paragraphs[-1] != text):
+                paragraphs.append(text)
+        elif node.tag == 'img':
+            src = node.attrs.get('data-src') or node.attrs.get('src')
+            if src and not src.startswith('data:'):
+                images.append(urljoin(base_url, src))
+
+    if not paragraphs:
+        fallback = best.inner_text()
+        if fallback:
+            paragraphs.append(fallback)
+
+    title = (builder.meta.get('og:title') or builder.title or '').strip()
+    return {
+        'title': ' '.join(title.split()),
+        'text': '\n\n'.join(paragraphs),
+        'images': list(dict.fromkeys(images)),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 抓取
+# ---------------------------------------------------------------------------
+
+def _charset(content_type):
+    match = re.search(r'charset=([\w-]+)', content_type or '', re.I)
+    return match.group(1) if match else None
+
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_host(url):
+    """拒绝解析到内网、本机、链路本地等非公网地址的主机（如 localhost、169.254.169.254）
+
+    重定向后的每一次请求都会再检查一次。
+    """
+    parsed = urlparse(str(url))
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ClipError(f"Unsupported URL: {url}")
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, port)
+    except OSError as e:
+        raise ClipError(f"Cannot resolve {parsed.hostname}: {e}")
+    for info in infos:
+        if not _is_public(info[4][0].split('%')[0]):
+            raise ClipError(f"Refusing to fetch non-public address {info[4][0]} ({parsed.hostname})")
+
+
+class Clipper:
+    """并发抓取网页
+
+    所有请求共用一个连接池；每个主机有独立的并发上限，避免同时向一个站点
+    发起过多请求。响应以流的方式读取，超过 max_bytes 即中止；默认不访问非公网地址。
+    """
+
+    def __init__(self, upload_dir=None, data_dir=None, cache_dir=None, settings=None):
+        self.settings = {**CLIPPER_CONFIG, **(settings or {})}
+        self.upload_dir = Path(upload_dir or Config.UPLOAD_DIR)
+        self.data_dir = Path(data_dir or Config.DATA_DIR)
+        self.cache = ResponseCache(cache_dir or Config.CLIP_CACHE_DIR)
+        self._host_limits = {}
+        self._client = None
+
+    async def _check_request(self, request):
+        if not self.settings['allow_private_hosts']:
+            await check_host(request.url)
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.settings['max_connections'],
+                max_keepalive_connections=self.settings['max_keepalive_connections'],
+            ),
+            timeout=httpx.Timeout(
+                self.settings['timeout'],
+                connect=self.settings['connect_timeout'],
+            ),
+            headers={'User-Agent': USER_AGENT},
+            follow_redirects=True,
+            event_hooks={'request': [self._check_request]},
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.settings['per_host_limit'])
+        return limit
+
+    async def fetch(self, url):
+        """抓取一个地址，优先使用条件请求命中缓存，返回 (正文, content_type, 最终地址)"""
+        meta, body = self.cache.get(url)
+        async with self._host_limit(url):
+            async with self._client.stream('GET', url, headers=self.cache.validators(meta)) as response:
+                if response.status_code == 304 and body is not None:
+                    logger.debug(f"Cache hit for {url}")
+                    return body, meta['content_type'], meta['final_url']
+                response.raise_for_status()
+                content = await self._read_limited(url, response)
+        meta = self.cache.put(url, response, content)
+        return content, meta['content_type'], meta['final_url']
+
+    async def _read_limited(self, url, response):
+        """读取响应正文，超过 max_bytes 时中止"""
+        max_bytes = self.settings['max_bytes']
+        declared = response.headers.get('content-length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise ClipError(f"Response from {url} is larger than {max_bytes} bytes")
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                raise ClipError(f"Response from {url} is larger than {max_bytes} bytes")
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _image_extension(self, url, content_type):
+        extension = Path(urlparse(url).path).suffix.lower()
+        if extension in IMAGE_EXTENSIONS:
+            return extension
+        guessed = mimetypes.guess_extension(content_type.split(';')[0].strip()) if content_type else None
+        if guessed == '.jpe':
+            guessed = '.jpg'
+        return guessed if guessed in IMAGE_EXTENSIONS else None
+
+    async def download_image(self, url):
+        """下载一张图片到上传目录，返回相对数据目录的路径"""
+        try:
+            body, content_type, final_url = await self.fetch(url)
+        except (httpx.HTTPError, ClipError) as e:
+            logger.warning(f"Failed to download image {url}: {e}")
+            return None
+        extension = self._image_extension(final_url, content_type)
+        if extension is None or not body:
+            return None
+        file_path = self.upload_dir / f"{uuid.uuid4()}{extension}"
+        file_path.write_bytes(body)
+        return str(file_path.relative_to(self.data_dir))
+
+    async def clip(self, url):
+        """剪藏一个网页：抓取、提取正文，并并行下载正文中的图片"""
+        try:
+            body, content_type, final_url = await self.fetch(url)
+            html = body.decode(_charset(content_type) or 'utf-8', errors='replace')
+            article = extract_content(html, final_url)
+            image_urls = article['images'][:self.settings['max_images']]
+            paths = await asyncio.gather(*(self.download_image(image) for image in image_urls))
+            article['attachments'] = [path for path in paths if path]
+            article['url'] = url
+            article['error'] = None
+            return article
+        except Exception as e:
+            logger.error(f"Error clipping {url}: {e}")
+            return {'url': url, 'title': '', 'text': '', 'images': [], 'attachments': [], 'error': str(e)}
+
+    async def clip_many(self, urls):
+        """并发剪藏多个网页，结果顺序与输入一致"""
+        return await asyncio.gather(*(self.clip(url) for url in urls))
+
+
+def clip_urls(urls, **kwargs):
+    """同步入口：在新的事件循环中并发剪藏多个网页"""
+    async def run():
+        async with Clipper(**kwargs) as clipper:
+            return await clipper.clip_many(urls)
+    return asyncio.run(run())
@@ -12,13 +12,185 @@ class Config:
     DATA_DIR = ROOT_DIR / "data"
     UPLOAD_DIR = DATA_DIR / "uploads"
     DB_PATH = DATA_DIR / "diary.db"
+    CLIP_CACHE_DIR = DATA_DIR / "clip_cache"
+    VECTOR_DIR = DATA_DIR / "vectors"
+    TOPIC_MODEL_PATH = DATA_DIR / "topic_model.npz"
+    
+    # 多用户：账户库和每个用户的数据目录
+    ACCOUNTS_DB_PATH = DATA_DIR / "accounts.db"
+    USERS_DIR = DATA_DIR / "users"
+    
+    # 多个进程共用的计算结果缓存
+    CACHE_DB_PATH = DATA_DIR / "cache.db"
+    
+    # 附件文本和预览图，按文件内容哈希缓存
+    ATTACHMENT_CACHE_DIR = DATA_DIR / "attachment_cache"
+    
+    # 定期维护：运行记录和多副本之间的锁
+    MAINTENANCE_DB_PATH = DATA_DIR / "maintenance.db"
+    MAINTENANCE_LOCK_PATH = DATA_DIR / "maintenance.lock"
     
     # Application configuration
     APP_CONFIG = {
         'allowed_extensions': {'.jpg', '.jpeg', '.png', '.gif', '.pdf', '.doc', '.docx'}
     }
     
+    # Web clipper configuration
+    CLIPPER_CONFIG = {
+        'timeout': 15,
+        'connect_timeout': 5,
+        'max_connections': 20,
+        'max_keepalive_connections': 10,
+        'per_host_limit': 4,
+        'max_images': 10,
+        'max_bytes': 10 * 1024 * 1024,   # 单个响应的大小上限
+        'allow_private_hosts': False,    # 是否允许抓取内网、本机和链路本地地址
+    }
+    
+    # Topic model configuration
+    TOPIC_MODEL_CONFIG = {
+        'n_topics': 8,
+        'max_features': 5000,
+        'min_df': 2,
+        'max_df': 0.5,
+        'iterations': 200,
+        'keywords': 5,
+        'workers': 4,
+    }
+    
+    # Multi-user configuration
+    TENANCY_CONFIG = {
+        'max_open_tenants': 64,
+        'max_idle_connections': 4,
+        'scan_workers': 8,
+        'min_password_length': 8,
+        'allow_signup': False,   # 登录页是否开放注册；第一个管理员不经过注册创建
+        'demo_data': True,
+    }
+    
+    # Read-only JSON API configuration
+    API_CONFIG = {
+        'host': '127.0.0.1',
+        'port': 8502,
+        'page_size': 50,
+        'max_page_size': 200,
+        'auth_cache_ttl': 300,
+        'gzip_min_size': 500,
+        'p99_target_ms': 100,
+    }
+    
+    # Computation cache configuration
+    CACHE_CONFIG = {
+        'layers': ('memory', 'sqlite'),
+        'memory_max_entries': 1024,
+        'memory_max_bytes': 64 * 1024 * 1024,
+        'sqlite_max_bytes': 256 * 1024 * 1024,
+        'ttl': 7 * 24 * 3600,
+    }
+    
+    # Attachment text extraction configuration
+    EXTRACTION_CONFIG = {
+        'workers': 2,
+        'timeout': 60,
+        'max_pages': 200,
+        'max_chars': 500000,
+        'preview_width': 320,
+    }
+    
+    # Entry body storage configuration
+    STORAGE_CONFIG = {
+        'compress_bodies': True,
+        'preview_chars': 200,
+        'level': 9,
+        'dictionary_size': 16 * 1024,
+        'training_samples': 5000,
+        'min_training_samples': 200,
+        'retrain_growth': 4,
+    }
+    
+    # Database maintenance configuration (intervals in seconds)
+    MAINTENANCE_CONFIG = {
+        'enabled': True,
+        'check_interval': 60,
+        'idle_seconds': 300,
+        'intervals': {
+            'storage': 6 * 3600,
+            'orphans': 24 * 3600,
+            'integrity': 7 * 24 * 3600,
+            'analyze': 24 * 3600,
+            'optimize': 6 * 3600,
+            'vacuum': 6 * 3600,
+            'checkpoint': 6 * 3600,
+            'drafts': 24 * 3600,
+        },
+        'analysis_limit': 1000,
+        'min_free_pages': 256,
+        'orphan_grace': 24 * 3600,
+    }
+    
+    # Memory budgets for large result sets
+    MEMORY_CONFIG = {
+        'fetch_size': 500,
+        'text_chunk_chars': 200000,
+        'wordcloud_max_terms': 100000,
+        'timeline_max_bytes': 2 * 1024 * 1024,
+        'page_budget_mb': 64,
+        'profile': os.environ.get('DIARY_MEMORY_PROFILE') == '1',
+    }
+
+    # 保存后的派生工作：后台线程数、失败任务的最多尝试次数、编辑器中显示状态的最近保存篇数
+    SAVE_CONFIG = {
+        'workers': 1,
+        'max_attempts': 3,
+        'retry_delay': 2.0,     # 第一次重试前等待的秒数，之后每次加倍
+        'claim_timeout': 600,   # 认领后超过这么多秒仍未结束的任务视为进程已退出
+        'status_entries': 5,
+    }
+
+    # 编辑器草稿：同一会话的草稿至多每 debounce_seconds 秒写入一次，写入线程每
+    # flush_interval 秒检查一次，待写草稿最多 max_pending 份，超过 retention_days 天的草稿由维护任务删除
+    DRAFTS_CONFIG = {
+        'debounce_seconds': 5,
+        'flush_interval': 1,
+        'max_pending': 1000,
+        'retention_days': 30,
+    }
+
+    # 心情、天气、地点的词表：新用户的初始选项，用户在编辑器中可以添加新值
+    VOCABULARY_CONFIG = {
+        'defaults': {
+            'mood': ['开心', '平静', '疲惫', '兴奋', '焦虑', '伤心'],
+            'weather': ['晴朗', '多云', '小雨', '阴天', '大晴天'],
+            'location': ['家里', '公司', '咖啡馆', '图书馆', '公园'],
+        },
+        'max_length': 20,
+    }
+
+    # 心情关联分析：期望频数低于 min_expected 的格子不计算提升度和残差；
+    # target_ms 是换时间段后重新计算列联表的耗时目标（benchmarks/correlation_panel.py）
+    CORRELATION_CONFIG = {
+        'min_expected': 5,
+        'target_ms': 500,
+    }
+
+    # 洞察页图表的共同样式：字体、默认配色、心情趋势各条线的颜色、写作日历的色阶
+    CHART_CONFIG = {
+        'font_family': 'Microsoft YaHei',
+        'palette': ['#5470c6', '#91cc75', '#fac858', '#ee6666', '#73c0de',
+                    '#3ba272', '#fc8452', '#9a60b4', '#ea7ccc'],
+        'mood_colors': ['#FF9800', '#4CAF50', '#9E9E9E', '#F44336', '#673AB7', '#2196F3'],
+        'calendar_colors': ['#ebedf0', '#9be9a8', '#40c463', '#30a14e', '#216e39'],
+    }
+
+    # 写作时间按用户时区统计：用户没有设置时区时使用 default_timezone
+    LOCAL_TIME_CONFIG = {
+        'default_timezone': 'Asia/Shanghai',
+    }
+    
     def __init__(self):
         # Create necessary directories if they don't exist
         self.DATA_DIR.mkdir(exist_ok=True, mode=0o755)
-        self.UPLOAD_DIR.mkdir(exist_ok=True, mode=0o755)
\ No newline at end of file
+        self.UPLOAD_DIR.mkdir(exist_ok=True, mode=0o755)
+        self.CLIP_CACHE_DIR.mkdir(exist_ok=True, mode=0o755)
+        self.VECTOR_DIR.mkdir(exist_ok=True, mode=0o755)
+        self.USERS_DIR.mkdir(exist_ok=True, mode=0o755)
\ No newline at end of file
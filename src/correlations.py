@@ -0,0 +1,157 @@
+"""心情与天气、地点、星期、时段的关联分析
+
+日记扫描一遍，按日期排序后编码成紧凑的整数列（EncodedEntries）：心情、天气、
+地点直接用词表 id，日期为 1970-01-01 起的天数，星期由天数算出，
+小时为按用户时区换算的 local_hour，缺失值为 -1。编码结果按数据版本缓存，
+每篇日记只占 18 字节；换时间段时只需在有序的天数列上二分出区间，
+每个维度的列联表用一次 np.bincount 得到（下标为 心情 * 类别数 + 类别），
+再在列联表上计算提升度（lift）、标准化残差和 Cramér's V。
+"""
+from array import array
+from datetime import date
+
+import numpy as np
+
+from config import Config
+from vocabulary import KINDS, names
+
+CORRELATION_CONFIG = Config.CORRELATION_CONFIG
+
+BATCH_SIZE = 10000
+
+EPOCH = date(1970, 1, 1)
+# julianday('1970-01-01')
+EPOCH_JULIAN_DAY = 2440587.5
+
+DIMENSIONS = ('weather', 'location', 'weekday', 'hour')
+
+# 星期和小时的类别固定，按自然顺序排列
+FIXED_CATEGORIES = {'weekday': list(range(7)), 'hour': list(range(24))}
+
+
+class EncodedEntries:
+    """按日期排序的整数编码列，可以直接放进共享缓存"""
+
+    def __init__(self, days, columns, categories):
+        self.days = days                # int32，1970-01-01 起的天数，升序
+        self.columns = columns          # {列名: 整数数组}
+        self.categories = categories    # {词表: 以 id 为下标的名称列表}
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def nbytes(self):
+        return self.days.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def between(self, start_date, end_date):
+        """start_date 到 end_date（含）之间的日记所在的切片"""
+        start = np.searchsorted(self.days, (start_date - EPOCH).days, side='left')
+        end = np.searchsorted(self.days, (end_date - EPOCH).days, side='right')
+        return slice(start, end)
+
+
+def encode_entries(db):
+    """扫描所有日记，返回按日期排序的 EncodedEntries"""
+    cursor = db.execute(f'''
+        SELECT CAST(julianday(date) - {EPOCH_JULIAN_DAY} AS INTEGER),
+               local_hour,
+               mood_id, weather_id, location_id
+        FROM entries
+    ''')
+    days, hours = array('i'), array('b')
+    buffers = {name: array('i') for name in KINDS}
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        day_values, hour_values, *id_values = zip(*rows)
+        days.extend(day_values)
+        hours.extend([-1 if value is None else value for value in hour_values])
+        for name, values in zip(KINDS, id_values):
+            buffers[name].extend([-1 if value is None else value for value in values])
+
+    # 按表的存储顺序读取比沿日期索引回表快得多，读完再按日期排序
+    days = np.frombuffer(days, dtype=np.int32)
+    order = np.argsort(days, kind='stable')
+    days = days[order]
+    columns = {name: np.frombuffer(buffer, dtype=np.int32)[order] for name, buffer in buffers.items()}
+    # 1970-01-01 是星期四，星期一为 0
+    columns['weekday'] = ((days + 3) % 7).astype(np.int8)
+    columns['hour'] = np.frombuffer(hours, dtype=np.int8)[order]
+    categories = {}
+    for name in KINDS:
+        by_id = names(db, name)
+        categories[name] = [by_id.get(index) for index in range(max(by_id, default=-1) + 1)]
+    return EncodedEntries(days, columns, categories)
+
+
+def contingency(rows, cols, n_rows, n_cols):
+    """两列整数编码的列联表，任一列缺失的日记不计入"""
+    mask = (rows >= 0) & (cols >= 0)
+    flat = rows[mask].astype(np.int64) * n_cols + cols[mask]
+    return np.bincount(flat, minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+
+
+def association(counts, min_expected=None):
+    """提升度、标准化残差和 Cramér's V；期望频数太小的格子为 NaN"""
+    min_expected = CORRELATION_CONFIG['min_expected'] if min_expected is None else min_expected
+    counts = counts.astype(np.float64)
+    total = counts.sum()
+    if not total:
+        empty = np.full(counts.shape, np.nan)
+        return empty, empty.copy(), 0.0
+    expected = np.outer(counts.sum(axis=1), counts.sum(axis=0)) / total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = counts / expected
+        residuals = (counts - expected) / np.sqrt(expected)
+        chi2 = np.where(expected > 0, (counts - expected) ** 2 / expected, 0.0).sum()
+    sparse = expected < min_expected
+    lift[sparse] = np.nan
+    residuals[sparse] = np.nan
+    k = min(np.count_nonzero(counts.sum(axis=1)), np.count_nonzero(counts.sum(axis=0)))
+    cramers_v = float(np.sqrt(chi2 / (total * (k - 1)))) if k > 1 else 0.0
+    return lift, residuals, cramers_v
+
+
+def _by_frequency(codes, size):
+    """出现过的类别按次数从多到少排列"""
+    totals = np.bincount(codes[codes >= 0], minlength=size)
+    return [index for index in np.argsort(-totals, kind='stable') if totals[index] > 0]
+
+
+def mood_correlations(encoded, start_date, end_date):
+    """时间段内心情与各维度的关联
+
+    返回 {维度: {'moods', 'labels', 'counts', 'lift', 'residuals', 'cramers_v', 'total'}}，
+    心情按时间段内的篇数排序，各维度一致；没有带心情的日记时返回 {}。
+    """
+    window = encoded.between(start_date, end_date)
+    moods = encoded.columns['mood'][window]
+    mood_names = encoded.categories['mood']
+    rows = _by_frequency(moods, len(mood_names))
+    if not rows:
+        return {}
+    result = {}
+    for dimension in DIMENSIONS:
+        values = encoded.columns[dimension][window]
+        if dimension in FIXED_CATEGORIES:
+            labels = FIXED_CATEGORIES[dimension]
+            cols = list(range(len(labels)))
+        else:
+            labels = encoded.categories[dimension]
+            cols = _by_frequency(values, len(labels))
+            if not cols:
+                continue
+        counts = contingency(moods, values, len(mood_names), len(labels))[np.ix_(rows, cols)]
+        lift, residuals, cramers_v = association(counts)
+        result[dimension] = {
+            'moods': [mood_names[index] for index in rows],
+            'labels': [labels[index] for index in cols],
+            'counts': counts,
+            'lift': lift,
+            'residuals': residuals,
+            'cramers_v': cramers_v,
+            'total': int(counts.sum()),
+        }
+    return result
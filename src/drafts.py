@@ -0,0 +1,166 @@
+"""编辑器草稿的自动保存
+
+编辑器每次运行把标题和正文交给 stage()，只更新内存中的待写表：同一草稿
+在写入之前的多次修改合并为一次（只保留最新的内容）。进程内唯一的写入线程
+每隔 flush_interval 秒检查一次，把距离上次写入已超过 debounce_seconds 的
+草稿按用户分组，每个用户一个事务批量写入。待写的草稿数超过 max_pending 时
+stage() 返回 False，内容仍留在会话中，下次运行时再交。
+
+草稿写入每个用户目录下单独的 drafts.db：不和 diary.db 争写锁，diary.db 的
+数据版本（Tenant.data_version()）保持不变，打字时共享缓存中的分析结果不会失效。
+"""
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DRAFTS_CONFIG = Config.DRAFTS_CONFIG
+
+_DELETE = object()      # 待写表中的删除标记
+
+
+def _connect(tenant):
+    db = sqlite3.connect(str(tenant.drafts_path), timeout=10)
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS drafts (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            content TEXT,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    return db
+
+
+def latest_draft(tenant, exclude=None):
+    """最近修改的一份草稿 {'id', 'title', 'content', 'updated_at'}，没有时返回 None"""
+    if not tenant.drafts_path.exists():
+        return None
+    with closing(_connect(tenant)) as db:
+        row = db.execute(
+            "SELECT id, title, content, updated_at FROM drafts WHERE id != ? ORDER BY updated_at DESC LIMIT 1",
+            (exclude or '',)
+        ).fetchone()
+    return dict(zip(('id', 'title', 'content', 'updated_at'), row)) if row else None
+
+
+def prune_drafts(tenant, max_age=None):
+    """删除超过保留期的草稿，返回删除的份数"""
+    if not tenant.drafts_path.exists():
+        return 0
+    max_age = max_age if max_age is not None else DRAFTS_CONFIG['retention_days'] * 24 * 3600
+    with closing(_connect(tenant)) as db:
+        removed = db.execute("DELETE FROM drafts WHERE updated_at < ?", (time.time() - max_age,)).rowcount
+        db.commit()
+    return removed
+
+
+class DraftWriter:
+    """合并、限频并批量写入草稿的后台线程"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = {}      # (drafts 路径, 草稿 id) -> (tenant, 标题, 正文, 修改时间) 或删除标记
+        self._written = {}      # (drafts 路径, 草稿 id) -> 上次写入的 monotonic 时间
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='draft-writer', daemon=True)
+                self._thread.start()
+
+    def stage(self, tenant, draft_id, title, content):
+        """登记草稿的最新内容；待写表已满时返回 False"""
+        key = (str(tenant.drafts_path), draft_id)
+        with self._lock:
+            if key not in self._pending and len(self._pending) >= DRAFTS_CONFIG['max_pending']:
+                return False
+            self._pending[key] = (tenant, title, content, time.time())
+        self.start()
+        return True
+
+    def discard(self, tenant, draft_id):
+        """删除草稿（日记保存后调用），不受限频约束，下一次检查时写入"""
+        with self._lock:
+            self._pending[(str(tenant.drafts_path), draft_id)] = (tenant, _DELETE)
+        self.start()
+        self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _loop(self):
+        while True:
+            self._wake.wait(DRAFTS_CONFIG['flush_interval'])
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Draft flush failed: {e}", exc_info=True)
+
+    def flush(self, force=False):
+        """写入到期的草稿，返回写入的份数；force 时忽略限频"""
+        now = time.monotonic()
+        debounce = DRAFTS_CONFIG['debounce_seconds']
+        with self._lock:
+            due = {
+                key: value for key, value in self._pending.items()
+                if force or value[1] is _DELETE or now - self._written.get(key, float('-inf')) >= debounce
+            }
+            for key in due:
+                del self._pending[key]
+            # 只需要记住限频窗口内写过的草稿
+            self._written = {key: at for key, at in self._written.items() if now - at < debounce}
+
+        by_tenant = {}
+        for key, value in due.items():
+            by_tenant.setdefault(key[0], []).append((key, value))
+        written = 0
+        for drafts in by_tenant.values():
+            tenant = drafts[0][1][0]
+            try:
+                with closing(_connect(tenant)) as db:
+                    db.executemany('''
+                        INSERT INTO drafts (id, title, content, updated_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET
+                            title = excluded.title, content = excluded.content, updated_at = excluded.updated_at
+                    ''', [(key[1], *value[1:]) for key, value in drafts if value[1] is not _DELETE])
+                    db.executemany("DELETE FROM drafts WHERE id = ?",
+                                   [(key[1],) for key, value in drafts if value[1] is _DELETE])
+                    db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing drafts to {tenant.drafts_path}: {e}")
+                # 放回待写表，除非这段时间里又有了更新的内容
+                with self._lock:
+                    for key, value in drafts:
+                        self._pending.setdefault(key, value)
+                continue
+            with self._lock:
+                for key, _ in drafts:
+                    self._written[key] = now
+            written += len(drafts)
+        return written
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_draft_writer():
+    """获取进程内共享的草稿写入线程"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DraftWriter()
+            # 正常退出时写入还在限频窗口内的草稿
+            atexit.register(_writer.flush, True)
+        return _writer
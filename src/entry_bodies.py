@@ -0,0 +1,259 @@
+"""日记正文的压缩存储
+
+时间线和分析查询大多只需要元数据，而 entries.content 会随整行一起读出。
+STORAGE_CONFIG['compress_bodies'] 开启时，正文移到 entry_bodies 表，用 zstd
+加字典压缩：字典从本用户的日记中抽样训练，短小的日记文本单独压缩时没有足够的
+上下文，有了字典压缩率才明显提高。entries 行只保留元数据和 preview（正文开头
+preview_chars 个字符），行更小，同样的页缓存能容纳更多日记。
+
+需要全文的地方读取 entry_texts 视图。视图调用 register_functions() 注册到连接上
+的 entry_body() 函数：正文未压缩时直接返回 entries.content，所以关闭压缩或迁移
+进行到一半时读取方式都不变。
+"""
+import functools
+import logging
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+STORAGE_CONFIG = Config.STORAGE_CONFIG
+
+MIGRATE_BATCH_SIZE = 500
+
+
+def make_preview(content):
+    """正文开头的预览，截断时以省略号结尾"""
+    content = content or ''
+    length = STORAGE_CONFIG['preview_chars']
+    return content if len(content) <= length else content[:length] + "..."
+
+
+def ensure_schema(db):
+    """添加 preview 列、正文表、字典表和 entry_texts 视图"""
+    register_functions(db)
+    columns = {row[1] for row in db.execute("PRAGMA table_info(entries)")}
+    if 'preview' not in columns:
+        db.execute("ALTER TABLE entries ADD COLUMN preview TEXT")
+    db.executescript('''
+        CREATE TABLE IF NOT EXISTS body_dictionaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data BLOB NOT NULL,
+            samples INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS entry_bodies (
+            entry_id TEXT PRIMARY KEY,
+            dict_id INTEGER REFERENCES body_dictionaries(id),
+            body BLOB NOT NULL,
+            FOREIGN KEY (entry_id) REFERENCES entries(id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        CREATE VIEW IF NOT EXISTS entry_texts AS
+            SELECT e.id AS entry_id, entry_body(e.content, b.body, b.dict_id) AS content
+            FROM entries e
+            LEFT JOIN entry_bodies b ON b.entry_id = e.id;
+    ''')
+
+
+# ---------------------------------------------------------------------------
+# 压缩和解压
+# ---------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=16)
+def _dictionary(data):
+    """解析并预处理字典；按字典内容缓存，字典行写入后不再修改"""
+    import zstandard
+
+    dictionary = zstandard.ZstdCompressionDict(data)
+    dictionary.precompute_compress(level=STORAGE_CONFIG['level'])
+    return dictionary
+
+
+def compress(text, dictionary=None):
+    """压缩一篇正文；dictionary 为字典表中的 data，None 表示不用字典"""
+    import zstandard
+
+    # 压缩器不是线程安全的，每次新建；字典的预处理已经缓存
+    compressor = zstandard.ZstdCompressor(
+        level=STORAGE_CONFIG['level'],
+        dict_data=_dictionary(dictionary) if dictionary else None,
+        write_dict_id=False,
+    )
+    return compressor.compress((text or '').encode('utf-8'))
+
+
+def register_functions(db):
+    """在连接上注册 entry_body(content, body, dict_id)，entry_texts 视图依赖它"""
+    decompressors = {}
+
+    def entry_body(content, body, dict_id):
+        if content is not None or body is None:
+            return content
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            import zstandard
+
+            dictionary = None
+            if dict_id is not None:
+                dictionary = _dictionary(db.execute(
+                    "SELECT data FROM body_dictionaries WHERE id = ?", (dict_id,)
+                ).fetchone()[0])
+            decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressor.decompress(body).decode('utf-8')
+
+    # 不标记为 deterministic：结果取决于字典表的内容
+    db.create_function('entry_body', 3, entry_body)
+
+
+def _latest_dictionary(db):
+    row = db.execute(
+        "SELECT id, data, samples FROM body_dictionaries ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    return row or (None, None, 0)
+
+
+def train_dictionary(db):
+    """从正文中随机抽样训练字典并写入字典表，返回 (id, data)；样本不足或训练失败时返回 None"""
+    import zstandard
+
+    samples = [content.encode('utf-8') for (content,) in db.execute('''
+        SELECT content FROM entry_texts
+        WHERE entry_id IN (SELECT id FROM entries ORDER BY random() LIMIT ?) AND content != ''
+    ''', (STORAGE_CONFIG['training_samples'],))]
+    if len(samples) < STORAGE_CONFIG['min_training_samples']:
+        return None
+    try:
+        dictionary = zstandard.train_dictionary(
+            STORAGE_CONFIG['dictionary_size'], samples, level=STORAGE_CONFIG['level']
+        )
+    except zstandard.ZstdError as e:
+        logger.warning(f"Could not train a body dictionary from {len(samples)} samples: {e}")
+        return None
+    data = dictionary.as_bytes()
+    cursor = db.execute(
+        "INSERT INTO body_dictionaries (data, samples) VALUES (?, ?)", (data, len(samples))
+    )
+    logger.info(f"Trained a {len(data)}-byte body dictionary from {len(samples)} entries")
+    return cursor.lastrowid, data
+
+
+def _current_dictionary(db):
+    """当前使用的字典；还没有字典，或字典训练时的样本远少于现有日记时重新训练"""
+    dict_id, data, samples = _latest_dictionary(db)
+    if dict_id is None or samples < STORAGE_CONFIG['training_samples']:
+        count = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if dict_id is None or count >= samples * STORAGE_CONFIG['retrain_growth']:
+            trained = train_dictionary(db)
+            if trained is not None:
+                dict_id, data = trained
+    return dict_id, data
+
+
+# ---------------------------------------------------------------------------
+# 读写
+# ---------------------------------------------------------------------------
+
+def store_body(db, entry_id, content):
+    """写入一篇日记的正文和预览；日记行须已存在，由调用方提交"""
+    preview = make_preview(content)
+    if not STORAGE_CONFIG['compress_bodies']:
+        db.execute("UPDATE entries SET content = ?, preview = ? WHERE id = ?",
+                   (content, preview, entry_id))
+        db.execute("DELETE FROM entry_bodies WHERE entry_id = ?", (entry_id,))
+        return
+    dict_id, data, _ = _latest_dictionary(db)
+    db.execute("UPDATE entries SET content = NULL, preview = ? WHERE id = ?", (preview, entry_id))
+    db.execute(
+        "INSERT OR REPLACE INTO entry_bodies (entry_id, dict_id, body) VALUES (?, ?, ?)",
+        (entry_id, dict_id, compress(content, data))
+    )
+
+
+def load_body(db, entry_id):
+    """读取一篇日记的全文，不存在时返回 None"""
+    row = db.execute("SELECT content FROM entry_texts WHERE entry_id = ?", (entry_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _fill_previews(db):
+    while True:
+        rows = db.execute('''
+            SELECT x.entry_id, x.content
+            FROM entries e
+            JOIN entry_texts x ON x.entry_id = e.id
+            WHERE e.preview IS NULL
+            LIMIT ?
+        ''', (MIGRATE_BATCH_SIZE,)).fetchall()
+        if not rows:
+            return
+        db.executemany("UPDATE entries SET preview = ? WHERE id = ?",
+                       [(make_preview(content), entry_id) for entry_id, content in rows])
+        db.commit()
+
+
+def _compress_all(db):
+    """压缩仍存在 entries 中的正文，并用当前字典重新压缩用旧字典（或无字典）压缩的正文"""
+    dict_id, data = _current_dictionary(db)
+    db.commit()
+    moved = 0
+    while True:
+        rows = db.execute('''
+            SELECT e.id, e.content FROM entries e WHERE e.content IS NOT NULL
+            UNION ALL
+            SELECT x.entry_id, x.content
+            FROM entry_bodies b
+            JOIN entry_texts x ON x.entry_id = b.entry_id
+            WHERE b.dict_id IS NOT ?
+            LIMIT ?
+        ''', (dict_id, MIGRATE_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        db.executemany(
+            "INSERT OR REPLACE INTO entry_bodies (entry_id, dict_id, body) VALUES (?, ?, ?)",
+            [(entry_id, dict_id, compress(content, data)) for entry_id, content in rows]
+        )
+        db.executemany("UPDATE entries SET content = NULL WHERE id = ?",
+                       [(entry_id,) for entry_id, _ in rows])
+        db.commit()
+        moved += len(rows)
+    db.execute('''
+        DELETE FROM body_dictionaries
+        WHERE id IS NOT ? AND id NOT IN (SELECT dict_id FROM entry_bodies WHERE dict_id IS NOT NULL)
+    ''', (dict_id,))
+    db.commit()
+    return moved
+
+
+def _decompress_all(db):
+    """关闭压缩后把正文移回 entries"""
+    moved = 0
+    while True:
+        rows = db.execute('''
+            SELECT x.entry_id, x.content
+            FROM entry_bodies b
+            JOIN entry_texts x ON x.entry_id = b.entry_id
+            LIMIT ?
+        ''', (MIGRATE_BATCH_SIZE,)).fetchall()
+        if not rows:
+            break
+        db.executemany("UPDATE entries SET content = ? WHERE id = ?",
+                       [(content, entry_id) for entry_id, content in rows])
+        db.executemany("DELETE FROM entry_bodies WHERE entry_id = ?",
+                       [(entry_id,) for entry_id, _ in rows])
+        db.commit()
+        moved += len(rows)
+    db.execute("DELETE FROM body_dictionaries")
+    db.commit()
+    return moved
+
+
+def migrate(db):
+    """按 STORAGE_CONFIG 迁移已有日记的正文，返回移动的篇数；须在 ensure_schema 之后调用
+
+    由维护任务或命令行（schema.py migrate）调用，腾出的页由随后的 VACUUM 归还。
+    """
+    _fill_previews(db)
+    moved = _compress_all(db) if STORAGE_CONFIG['compress_bodies'] else _decompress_all(db)
+    if moved:
+        logger.info(f"Moved {moved} entry bodies")
+    return moved
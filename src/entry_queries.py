@@ -0,0 +1,121 @@
+"""日记查询：时间线页面和 HTTP API 共用的过滤条件与分页查询
+
+列表查询只读取正文预览（entries.preview），全文用 load_body() 按需读取；
+心情、天气和地点从词表中取名称。
+"""
+import json
+
+from memory_budget import iter_rows
+from tag_query import MODE_ALL, MODE_ANY, build_tag_filter
+from vector_index import get_vector_index
+
+ENTRY_COLUMNS = ('id', 'date', 'title', 'preview', 'mood', 'weather', 'location', 'tags', 'attachments',
+                 'previews')
+
+# 过滤条件可能引用 e、t、b、m、w、l 这些别名，计数查询使用同样的连接
+ENTRY_FROM = """
+    FROM entries e
+    LEFT JOIN entry_tags et ON e.id = et.entry_id
+    LEFT JOIN tags t ON et.tag_id = t.id
+    LEFT JOIN entry_bodies b ON b.entry_id = e.id
+    LEFT JOIN moods m ON m.id = e.mood_id
+    LEFT JOIN weathers w ON w.id = e.weather_id
+    LEFT JOIN locations l ON l.id = e.location_id
+"""
+
+ENTRY_SELECT = """
+    SELECT e.id, e.date, e.title, e.preview, m.name, w.name, l.name,
+           GROUP_CONCAT(DISTINCT t.name) as tags,
+           e.attachments,
+           e.attachment_previews
+""" + ENTRY_FROM
+
+
+def date_filter(start_date, end_date):
+    return ["e.date BETWEEN ? AND ?"], [str(start_date), str(end_date)]
+
+
+def tag_filter(db, selected=(), excluded=(), mode=MODE_ANY):
+    """按标签过滤：mode 为 MODE_ALL 时要求包含全部选中标签"""
+    if not selected and not excluded:
+        return [], []
+    return build_tag_filter(
+        db,
+        all_of=selected if mode == MODE_ALL else (),
+        any_of=selected if mode == MODE_ANY else (),
+        none_of=excluded
+    )
+
+
+def text_filter(query):
+    """在标题、正文、附件文本、心情、天气、地点和标签中做子串匹配"""
+    search_term = f"%{query}%"
+    condition = """
+        (e.title LIKE ? OR
+         entry_body(e.content, b.body, b.dict_id) LIKE ? OR
+         e.attachment_text LIKE ? OR
+         m.name LIKE ? OR
+         w.name LIKE ? OR
+         l.name LIKE ? OR
+         t.name LIKE ?)
+    """
+    return [condition], [search_term] * 7
+
+
+def semantic_filter(db, vector_dir, query, limit):
+    """语义搜索，返回 (条件, 参数, {entry_id: score})"""
+    matches = get_vector_index(vector_dir).search(db, query, k=limit)
+    placeholders = ','.join('?' for _ in matches) or 'NULL'
+    return [f"e.id IN ({placeholders})"], [entry_id for entry_id, _ in matches], dict(matches)
+
+
+def _entry_query(conditions, params, limit, after):
+    conditions = list(conditions)
+    params = list(params)
+    if after is not None:
+        conditions.append("(e.date < ? OR (e.date = ? AND e.id < ?))")
+        params.extend([after[0], after[0], after[1]])
+    query = ENTRY_SELECT
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " GROUP BY e.id ORDER BY e.date DESC, e.id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+
+def fetch_entries(db, conditions=(), params=(), limit=None, after=None):
+    """按日期倒序查询日记
+
+    after 为上一页最后一条的 (date, id)，用于键集分页。
+    """
+    return db.execute(*_entry_query(conditions, params, limit, after)).fetchall()
+
+
+def iter_entries(db, conditions=(), params=(), limit=None, after=None):
+    """与 fetch_entries 相同，但用 fetchmany 分批产出行，不一次读入整个结果集"""
+    return iter_rows(db.execute(*_entry_query(conditions, params, limit, after)))
+
+
+def count_entries(db, conditions=(), params=()):
+    """符合条件的日记篇数"""
+    if not conditions:
+        return db.execute("SELECT COUNT(*) FROM entries e").fetchone()[0]
+    query = "SELECT COUNT(DISTINCT e.id)" + ENTRY_FROM + " WHERE " + " AND ".join(conditions)
+    return db.execute(query, list(params)).fetchone()[0]
+
+
+def entry_dict(row):
+    """把 fetch_entries 的一行转换为可序列化的字典"""
+    entry = dict(zip(ENTRY_COLUMNS, row))
+    entry['tags'] = [tag for tag in (entry['tags'] or '').split(',') if tag]
+    try:
+        entry['attachments'] = json.loads(entry['attachments'] or '[]')
+    except json.JSONDecodeError:
+        entry['attachments'] = []
+    try:
+        entry['previews'] = json.loads(entry['previews'] or '{}')
+    except json.JSONDecodeError:
+        entry['previews'] = {}
+    return entry
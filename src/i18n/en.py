@@ -2,8 +2,10 @@
 TRANSLATIONS = {
     # Navigation
     'nav.timeline': 'Timeline',
+    'nav.title': 'Navigation',
     'nav.new_entry': 'New Entry',
     'nav.web_clipper': 'Web Clipper',
+    'nav.admin': 'Admin',
     
     # Timeline page
     'timeline.title': 'Journal Review',
@@ -17,7 +19,29 @@ TRANSLATIONS = {
     'timeline.start_date': 'Start Date',
     'timeline.end_date': 'End Date',
     'timeline.select_tags': 'Select Tags',
+    'timeline.tag_search': 'Search tags',
+    'timeline.tag_mode': 'Match',
+    'timeline.tag_mode_any': 'Any tag',
+    'timeline.tag_mode_all': 'All tags',
+    'timeline.exclude_tags': 'Exclude Tags',
     'timeline.search_placeholder': 'Search journal content',
+    'timeline.semantic_search': 'Semantic search',
+    'timeline.semantic_search_help': 'Find entries by meaning rather than exact words',
+    'timeline.read_full': 'Read full entry',
+    'timeline.read_full_placeholder': 'Choose an entry',
+    'timeline.similar_entries': 'Similar Entries',
+    'timeline.similar_to': 'Find entries similar to',
+    'timeline.no_similar': 'No similar entries found',
+    'timeline.similarity': 'Similarity',
+    'timeline.subtitle': 'Moments of everyday life',
+    'timeline.page': '{count} entries match; showing {first}–{last}',
+    'timeline.newer': 'Newer entries',
+    'timeline.older': 'Older entries',
+    'timeline.no_entries': 'No entries yet',
+    'timeline.search_found': 'Found {count} matching entries',
+    'timeline.search_empty': 'No matching entries found',
+    'timeline.tags_found': 'Found {count} entries with the selected tags',
+    'timeline.tags_empty': 'No entries with the selected tags',
     
     # Tabs
     'tabs.timeline': 'Timeline',
@@ -26,6 +50,19 @@ TRANSLATIONS = {
     
     # Insights page
     'insights.title': 'Journal Insights',
+    'insights.period_start': 'Start Date',
+    'insights.period_end': 'End Date',
+    'insights.mood_analysis': 'Mood Analysis',
+    'insights.writing_habits': 'Writing Habits',
+    'insights.topic_analysis': 'Topic Analysis',
+    'insights.personal_growth': 'Personal Growth',
+    'insights.no_mood_data': 'No mood data available',
+    'insights.no_entries': 'No entries in the selected period',
+    'insights.writing_frequency': 'Writing Frequency',
+    'insights.word_count': 'Word Count',
+    'insights.writing_time': 'Writing Time',
+    'insights.topic_trends': 'Topic Trends',
+    'insights.growth_indicators': 'Growth Indicators',
     'insights.mood_trends': 'Mood Trends',
     'insights.common_topics': 'Common Topics',
     'insights.key_events': 'Key Events Timeline',
@@ -35,6 +72,8 @@ TRANSLATIONS = {
     'insights.topic_wordcloud': 'Topic Word Cloud',
     'insights.date': 'Date',
     'insights.hour': 'Hour',
+    'insights.weekday': 'Weekday',
+    'insights.timezone_note': 'Counted in the {timezone} timezone, which you can change in the sidebar',
     'insights.entry_count': 'Entry Count',
     'insights.word_count_stats': 'Word Count Statistics',
     'insights.sentiment': 'Sentiment Score',
@@ -44,21 +83,89 @@ TRANSLATIONS = {
     'insights.characters': 'characters',
     'insights.mood_growth': 'Emotional Growth',
     'insights.count': 'Count',
+    'insights.granularity_day': 'Daily',
+    'insights.granularity_week': 'Weekly',
+    'insights.granularity_month': 'Monthly',
+    'insights.granularity_year': 'Yearly',
+    'insights.writing_calendar': 'Writing Calendar',
+    'insights.current_streak': 'Current Streak',
+    'insights.longest_streak': 'Longest Streak',
+    'insights.active_days': 'Days Written',
+    'insights.days': '{count} days',
+    'insights.on_this_day': 'On This Day',
+    'insights.no_on_this_day': 'No entries on this day in previous years',
+    'insights.years_ago': '{years} years ago',
+    'charts.writing_calendar': 'Writing Calendar',
     'insights.writing_time_distribution': 'Writing Time Distribution',
     
+    # Charts
+    'charts.range': 'From {start} to {end}',
+    'charts.mood_trends': 'Mood Trends',
+    'charts.writing_frequency': 'Writing Frequency',
+    'charts.writing_growth': 'Writing Growth Trend',
+    'charts.wordcloud_subtitle': 'Based on journal content',
+    'charts.times': 'Times',
+    'charts.characters': 'Characters',
+    'charts.entries': 'Entries',
+    'charts.avg_entries': 'Average Entries',
+    
     # Analysis page
     'analysis.title': 'Deep Analysis',
     'analysis.topic_evolution': 'Topic Evolution',
     'analysis.writing_patterns': 'Writing Patterns',
+    'analysis.correlations': 'Mood Correlations',
+    'analysis.correlation_dimension': 'Compare with',
+    'analysis.correlation_measure': 'Measure',
+    'analysis.dimension_weather': 'Weather',
+    'analysis.dimension_location': 'Location',
+    'analysis.dimension_weekday': 'Weekday',
+    'analysis.dimension_hour': 'Hour of day',
+    'analysis.measure_lift': 'Lift',
+    'analysis.measure_residuals': 'Standardized residual',
+    'analysis.measure_counts': 'Entries',
+    'analysis.correlation_no_mood': 'No entries with a mood in this period',
+    'analysis.correlation_no_pairs': 'No entries in this period record both a mood and this dimension',
+    'analysis.correlation_summary': '{total} entries, Cramér\'s V = {cramers_v:.3f}; cells expecting fewer than {min_expected} entries have no lift or residual',
     
     # Editor page
     'editor.title': 'New Entry',
     'editor.entry_title': 'Title',
     'editor.content': 'Content',
+    'editor.tag_search': 'Search tags',
     'editor.add_images': 'Add Images',
     'editor.save': 'Save',
     'editor.title_required': 'Please enter a title',
     'editor.save_success': 'Entry saved successfully!',
+    'editor.draft_found': 'You have an unsaved draft "{title}" ({time})',
+    'editor.draft_untitled': 'Untitled',
+    'editor.draft_restore': 'Restore draft',
+    'editor.draft_discard': 'Discard',
+    'editor.status_title': 'Recently Saved',
+    'editor.status_refresh': 'Refresh',
+    'editor.status_pending': 'Processing',
+    'editor.status_running': 'Processing',
+    'editor.status_done': 'Done',
+    'editor.status_failed': 'Failed',
+    'editor.task_index': 'Search index',
+    'editor.task_topics': 'Topics',
+    'editor.task_sentiment': 'Sentiment',
+    'editor.task_attachments': 'Attachment text',
+    'editor.previews': 'Attachment previews',
+    'editor.save_failed': 'Failed to save entry, please try again',
+    'editor.mood': 'Mood',
+    'editor.mood_placeholder': 'Choose a mood...',
+    'editor.weather': 'Weather',
+    'editor.weather_placeholder': 'Choose the weather...',
+    'editor.location': 'Location',
+    'editor.new_option': 'Add new...',
+    'editor.new_option_value': 'New value',
+    'editor.location_placeholder': 'Choose a location...',
+    'editor.tags': 'Tags',
+    'editor.tags_placeholder': 'Choose or enter tags...',
+    'editor.tags_help': 'Pick existing tags or enter new ones, separated by commas',
+    'editor.new_tags': 'New Tags',
+    'editor.new_tags_placeholder': 'Enter new tags, separated by commas',
+    'editor.new_tags_help': 'Enter new tags, separated by commas',
     
     # Error messages
     'error.db_init': 'Database initialization failed',
@@ -66,6 +173,8 @@ TRANSLATIONS = {
     'error.file_type': 'Unsupported file type',
     'error.permission': 'Permission error, please check settings',
     'error.analysis_failed': 'Analysis failed, please try again later',
+    'error.timeline_failed': 'Failed to load the timeline',
+    'error.timezone_failed': 'Failed to change the timezone',
     
     # Common
     'common.loading': 'Loading...',
@@ -76,6 +185,70 @@ TRANSLATIONS = {
     # App General
     'app.title': 'Personal Journal',
     'app.language': 'Language',
+    'app.timezone': 'Timezone',
+    'app.timezone_updating': 'Recomputing writing times for the new timezone...',
+    'app.about': 'Journal v1.0',
+    
+    # Login
+    'login.title': 'Journal',
+    'login.password': 'Password',
+    'login.username': 'Username',
+    'login.username_help': '3-32 lowercase letters, digits, underscores or hyphens',
+    'login.confirm_password': 'Confirm password',
+    'login.sign_in': 'Sign in',
+    'login.sign_up': 'Sign up',
+    'login.sign_out': 'Sign out',
+    'login.signed_in_as': 'Signed in as {username}',
+    'login.invalid': 'Incorrect username or password',
+    'login.password_mismatch': 'Passwords do not match',
+    'login.setup': 'Create admin',
+    'login.setup_help': 'There are no accounts yet. Enter the old site password to create the admin account; the existing diary moves into it.',
+    'login.setup_cli': 'There are no accounts yet. Run python src/tenancy.py create-admin <username> on the server to create the admin.',
+    'login.site_password': 'Old site password',
+    'login.invalid_site_password': 'Incorrect site password',
+    
+    # Accounts
+    'account.invalid_username': 'Usernames must be 3-32 lowercase letters, digits, underscores or hyphens',
+    'account.weak_password': 'Passwords need at least {min_length} characters',
+    'account.exists': 'That username is already taken',
+    'account.already_set_up': 'The admin account already exists',
+    
+    # Admin
+    'admin.title': 'User Statistics',
+    'admin.scanning': 'Scanning user databases...',
+    'admin.users': 'Users',
+    'admin.entries': 'Entries',
+    'admin.storage': 'Storage',
+    'admin.username': 'User',
+    'admin.tags': 'Tags',
+    'admin.first_entry': 'First entry',
+    'admin.last_entry': 'Latest entry',
+    'admin.db_size': 'Database size',
+    'admin.uploads': 'Attachments',
+    'admin.cache': 'Computation cache',
+    'admin.cache_caption': 'Hit counts are for this process; entries and size of shared layers cover all replicas',
+    'admin.cache_layer': 'Layer',
+    'admin.cache_hits': 'Hits',
+    'admin.cache_misses': 'Misses',
+    'admin.cache_hit_rate': 'Hit rate',
+    'admin.cache_errors': 'Errors',
+    'admin.cache_entries': 'Entries',
+    'admin.cache_size': 'Size',
+    'admin.cache_computes': 'Recomputed',
+    'admin.cache_compute_time': 'Compute time',
+    'admin.cache_clear': 'Clear cache',
+    'admin.maintenance': 'Database maintenance',
+    'admin.maintenance_caption': 'Runs automatically when idle; the log is shared by all replicas (last 30 days)',
+    'admin.maintenance_run': 'Run maintenance now',
+    'admin.maintenance_requested': 'Maintenance requested; it will run in the background',
+    'admin.maintenance_running': 'Running {task} for {username}',
+    'admin.maintenance_empty': 'No maintenance has run yet',
+    'admin.maintenance_task': 'Task',
+    'admin.maintenance_runs': 'Runs',
+    'admin.maintenance_last_run': 'Last run',
+    'admin.maintenance_mean_time': 'Mean time',
+    'admin.maintenance_max_time': 'Longest',
+    'admin.maintenance_last_error': 'Last error',
     
     # Error Messages
     'error.init_failed': 'Failed to initialize application. Please check permissions and try again.',
@@ -83,7 +256,12 @@ TRANSLATIONS = {
     # Web Clipper
     'clipper.title': 'Web Clipper',
     'clipper.url_input': 'Enter URL',
-    'clipper.coming_soon': 'Web clipping feature coming soon!',
+    'clipper.url_placeholder': 'One URL per line',
+    'clipper.fetch': 'Clip',
+    'clipper.fetching': 'Fetching pages...',
+    'clipper.fetch_failed': 'Failed to fetch: {error}',
+    'clipper.save': 'Save as Entry',
+    'clipper.source': 'Source',
     
     # Editor Additional
     'editor.preview': 'Preview',
@@ -1,46 +1,93 @@
 """语言管理器"""
-from typing import Dict, Optional
+import sys
+from typing import Dict, Optional, Tuple
 from . import zh, en  # Changed from src.i18n
 
+
+def _compile(packs: Dict[str, Dict[str, str]]) -> Tuple[Dict[str, int], Dict[str, Tuple[str, ...]]]:
+    """把语言包编译为 key -> 下标 的索引表和每种语言的文本元组"""
+    keys = sorted({key for translations in packs.values() for key in translations})
+    key_index = {sys.intern(key): idx for idx, key in enumerate(keys)}
+    tables = {
+        lang: tuple(translations.get(key, key) for key in keys)
+        for lang, translations in packs.items()
+    }
+    return key_index, tables
+
+
 class I18nManager:
+    """翻译查找
+
+    语言包在导入时编译成只读的元组表，查找过程不加锁也不修改共享状态；
+    当前语言保存在各自会话的 st.session_state 中，不同用户互不影响。
+    """
     _instance = None
-    _current_lang = 'zh'  # Default to Chinese
-    _translations: Dict[str, Dict[str, str]] = {
+    DEFAULT_LANG = 'zh'  # Default to Chinese
+    SESSION_KEY = 'lang'
+    _packs: Dict[str, Dict[str, str]] = {
         'zh': zh.TRANSLATIONS,
         'en': en.TRANSLATIONS  # 添加英文翻译
     }
-    
+    _key_index, _tables = _compile(_packs)
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
-    
+
+    @staticmethod
+    def _session_state():
+        """返回当前会话的 session_state，不在 Streamlit 脚本中运行时返回 None"""
+        try:
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+            ctx = get_script_run_ctx()
+        except ImportError:
+            return None
+        if ctx is None:
+            return None
+        import streamlit as st
+        return st.session_state
+
     @classmethod
     def get_text(cls, key: str, lang: Optional[str] = None) -> str:
         """获取指定语言的文本"""
-        use_lang = lang or cls._current_lang
-        try:
-            return cls._translations[use_lang][key]
-        except KeyError:
+        idx = cls._key_index.get(key)
+        if idx is None:
             return key  # 如果找不到翻译，返回原key
-            
+        table = cls._tables.get(lang or cls.get_current_lang())
+        if table is None:
+            return key
+        return table[idx]
+
     @classmethod
     def set_language(cls, lang: str):
-        """设置当前语言"""
-        if lang in cls._translations:
-            cls._current_lang = lang
-            
+        """设置当前会话的语言"""
+        state = cls._session_state()
+        if lang in cls._tables and state is not None:
+            state[cls.SESSION_KEY] = lang
+
     @classmethod
     def add_language(cls, lang: str, translations: Dict[str, str]):
-        """添加新的语言支持"""
-        cls._translations[lang] = translations
-    
+        """添加新的语言支持（应在启动时调用），并重新编译查找表"""
+        packs = {**cls._packs, lang: translations}
+        cls._key_index, cls._tables = _compile(packs)
+        cls._packs = packs
+
+    @classmethod
+    def get_languages(cls):
+        """获取支持的语言列表"""
+        return list(cls._tables)
+
     @classmethod
     def get_current_lang(cls) -> str:
-        """获取当前语言"""
-        return cls._current_lang
+        """获取当前会话的语言"""
+        state = cls._session_state()
+        if state is None:
+            return cls.DEFAULT_LANG
+        return state.get(cls.SESSION_KEY, cls.DEFAULT_LANG)
 
 # 创建便捷函数
-def t(key: str) -> str:
-    """获取当前语言的文本"""
-    return I18nManager.get_text(key) 
\ No newline at end of file
+def t(key: str, **kwargs) -> str:
+    """获取当前语言的文本，可选地填充 {占位符}"""
+    text = I18nManager.get_text(key)
+    return text.format(**kwargs) if kwargs else text
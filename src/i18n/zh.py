@@ -2,8 +2,10 @@
 TRANSLATIONS = {
     # 导航
     'nav.timeline': '时间线',
+    'nav.title': '导航',
     'nav.new_entry': '新建日记',
     'nav.web_clipper': '网页剪藏',
+    'nav.admin': '管理',
     
     # 时间线页面
     'timeline.title': '日记回顾',
@@ -17,7 +19,29 @@ TRANSLATIONS = {
     'timeline.start_date': '开始日期',
     'timeline.end_date': '结束日期',
     'timeline.select_tags': '选择标签',
+    'timeline.tag_search': '搜索标签（支持拼音首字母）',
+    'timeline.tag_mode': '匹配方式',
+    'timeline.tag_mode_any': '任一标签',
+    'timeline.tag_mode_all': '全部标签',
+    'timeline.exclude_tags': '排除标签',
     'timeline.search_placeholder': '搜索日记内容',
+    'timeline.semantic_search': '语义搜索',
+    'timeline.semantic_search_help': '按内容相似度查找，而不是逐字匹配',
+    'timeline.read_full': '阅读全文',
+    'timeline.read_full_placeholder': '选择一篇日记',
+    'timeline.similar_entries': '相似日记',
+    'timeline.similar_to': '查找与这篇相似的日记',
+    'timeline.no_similar': '暂无相似日记',
+    'timeline.similarity': '相似度',
+    'timeline.subtitle': '记录生活的点点滴滴',
+    'timeline.page': '共 {count} 篇，当前显示第 {first}–{last} 篇',
+    'timeline.newer': '较新的日记',
+    'timeline.older': '更早的日记',
+    'timeline.no_entries': '暂无日记',
+    'timeline.search_found': '找到 {count} 条相关日记',
+    'timeline.search_empty': '未找到相关日记',
+    'timeline.tags_found': '找到 {count} 条带有所选标签的日记',
+    'timeline.tags_empty': '未找到带有所选标签的日记',
     
     # 标签页
     'tabs.timeline': '时间线',
@@ -48,6 +72,8 @@ TRANSLATIONS = {
     'insights.topic_wordcloud': '主题词云',
     'insights.date': '日期',
     'insights.hour': '小时',
+    'insights.weekday': '星期',
+    'insights.timezone_note': '按 {timezone} 时区统计，可在侧边栏修改',
     'insights.entry_count': '日记数量',
     'insights.word_count_stats': '字数统计分析',
     'insights.writing_time_distribution': '写作时间分布',
@@ -59,19 +85,87 @@ TRANSLATIONS = {
     'insights.mood_growth': '情感成长',
     'insights.count': '数量',
     
+    # 图表
+    'charts.range': '从 {start} 到 {end}',
+    'charts.mood_trends': '情绪变化趋势',
+    'charts.writing_frequency': '写作频率统计',
+    'charts.writing_growth': '写作成长趋势',
+    'charts.wordcloud_subtitle': '基于日记内容分析',
+    'charts.times': '次数',
+    'charts.characters': '字数',
+    'charts.entries': '日记数',
+    'charts.avg_entries': '平均日记数',
+    'insights.granularity_day': '按日',
+    'insights.granularity_week': '按周',
+    'insights.granularity_month': '按月',
+    'insights.granularity_year': '按年',
+    'insights.writing_calendar': '写作日历',
+    'insights.current_streak': '当前连续写作',
+    'insights.longest_streak': '最长连续写作',
+    'insights.active_days': '写作天数',
+    'insights.days': '{count} 天',
+    'insights.on_this_day': '那年今日',
+    'insights.no_on_this_day': '往年的今天还没有日记',
+    'insights.years_ago': '{years} 年前',
+    'charts.writing_calendar': '写作日历',
+    
     # 分析页面
     'analysis.title': '深度分析',
     'analysis.topic_evolution': '主题演变分析',
     'analysis.writing_patterns': '写作模式分析',
+    'analysis.correlations': '心情关联分析',
+    'analysis.correlation_dimension': '对比维度',
+    'analysis.correlation_measure': '指标',
+    'analysis.dimension_weather': '天气',
+    'analysis.dimension_location': '地点',
+    'analysis.dimension_weekday': '星期',
+    'analysis.dimension_hour': '写作时段',
+    'analysis.measure_lift': '提升度',
+    'analysis.measure_residuals': '标准化残差',
+    'analysis.measure_counts': '篇数',
+    'analysis.correlation_no_mood': '这段时间内没有记录心情的日记',
+    'analysis.correlation_no_pairs': '这段时间内没有同时记录心情和该维度的日记',
+    'analysis.correlation_summary': '共 {total} 篇日记，Cramér\'s V = {cramers_v:.3f}；期望篇数少于 {min_expected} 的格子不计算提升度和残差',
     
     # 编辑器页面
     'editor.title': '新建日记',
     'editor.entry_title': '标题',
     'editor.content': '内容',
+    'editor.tag_search': '搜索标签',
     'editor.add_images': '添加图片',
     'editor.save': '保存',
     'editor.title_required': '请输入标题',
     'editor.save_success': '保存成功！',
+    'editor.draft_found': '有一份未保存的草稿「{title}」（{time}）',
+    'editor.draft_untitled': '无标题',
+    'editor.draft_restore': '恢复草稿',
+    'editor.draft_discard': '丢弃',
+    'editor.status_title': '最近保存',
+    'editor.status_refresh': '刷新状态',
+    'editor.status_pending': '处理中',
+    'editor.status_running': '处理中',
+    'editor.status_done': '完成',
+    'editor.status_failed': '失败',
+    'editor.task_index': '搜索索引',
+    'editor.task_topics': '主题',
+    'editor.task_sentiment': '情感分析',
+    'editor.task_attachments': '附件文本',
+    'editor.previews': '附件预览',
+    'editor.save_failed': '保存失败，请重试',
+    'editor.mood': '心情',
+    'editor.mood_placeholder': '选择心情...',
+    'editor.weather': '天气',
+    'editor.weather_placeholder': '选择天气...',
+    'editor.location': '位置',
+    'editor.new_option': '新增...',
+    'editor.new_option_value': '新的值',
+    'editor.location_placeholder': '选择位置...',
+    'editor.tags': '标签',
+    'editor.tags_placeholder': '选择或输入新标签...',
+    'editor.tags_help': '可以选择已有标签或输入新标签，多个标签用逗号分隔',
+    'editor.new_tags': '新标签',
+    'editor.new_tags_placeholder': '输入新标签，多个标签用逗号分隔',
+    'editor.new_tags_help': '输入新标签，用逗号分隔多个标签',
     
     # 错误信息
     'error.db_init': '数据库初始化失败',
@@ -79,6 +173,8 @@ TRANSLATIONS = {
     'error.file_type': '不支持的文件类型',
     'error.permission': '权限错误，请检查设置',
     'error.analysis_failed': '分析失败，请稍后重试',
+    'error.timeline_failed': '时间线加载失败',
+    'error.timezone_failed': '时区修改失败',
     
     # 其他
     'common.loading': '加载中...',
@@ -89,6 +185,70 @@ TRANSLATIONS = {
     # 应用通用
     'app.title': '个人日记',
     'app.language': '语言',
+    'app.timezone': '时区',
+    'app.timezone_updating': '正在按新时区重新计算写作时间...',
+    'app.about': '日记本 v1.0',
+    
+    # 登录
+    'login.title': '日记本',
+    'login.password': '密码',
+    'login.username': '用户名',
+    'login.username_help': '3-32 位小写字母、数字、下划线或连字符',
+    'login.confirm_password': '确认密码',
+    'login.sign_in': '登录',
+    'login.sign_up': '注册',
+    'login.sign_out': '退出登录',
+    'login.signed_in_as': '当前用户：{username}',
+    'login.invalid': '用户名或密码错误',
+    'login.password_mismatch': '两次输入的密码不一致',
+    'login.setup': '创建管理员',
+    'login.setup_help': '还没有任何账户。输入原来的站点密码，创建管理员账户；现有的日记将移入该账户。',
+    'login.setup_cli': '还没有任何账户。请在服务器上运行 python src/tenancy.py create-admin <用户名> 创建管理员。',
+    'login.site_password': '原站点密码',
+    'login.invalid_site_password': '原站点密码错误',
+    
+    # 账户
+    'account.invalid_username': '用户名只能包含 3-32 位小写字母、数字、下划线或连字符',
+    'account.weak_password': '密码至少需要 {min_length} 位',
+    'account.exists': '用户名已被占用',
+    'account.already_set_up': '管理员已经创建',
+    
+    # 管理
+    'admin.title': '用户统计',
+    'admin.scanning': '正在统计各用户数据...',
+    'admin.users': '用户数',
+    'admin.entries': '日记数',
+    'admin.storage': '占用空间',
+    'admin.username': '用户',
+    'admin.tags': '标签数',
+    'admin.first_entry': '最早日记',
+    'admin.last_entry': '最近日记',
+    'admin.db_size': '数据库大小',
+    'admin.uploads': '附件',
+    'admin.cache': '计算缓存',
+    'admin.cache_caption': '本进程的命中统计；共享层的条目数和大小为所有副本共用',
+    'admin.cache_layer': '缓存层',
+    'admin.cache_hits': '命中',
+    'admin.cache_misses': '未命中',
+    'admin.cache_hit_rate': '命中率',
+    'admin.cache_errors': '错误',
+    'admin.cache_entries': '条目数',
+    'admin.cache_size': '大小',
+    'admin.cache_computes': '重新计算',
+    'admin.cache_compute_time': '计算耗时',
+    'admin.cache_clear': '清空缓存',
+    'admin.maintenance': '数据库维护',
+    'admin.maintenance_caption': '空闲时自动运行，所有副本共用一份记录（最近 30 天）',
+    'admin.maintenance_run': '立即维护',
+    'admin.maintenance_requested': '已请求维护，将在后台运行',
+    'admin.maintenance_running': '正在为 {username} 运行 {task}',
+    'admin.maintenance_empty': '还没有运行过维护任务',
+    'admin.maintenance_task': '任务',
+    'admin.maintenance_runs': '次数',
+    'admin.maintenance_last_run': '上次运行',
+    'admin.maintenance_mean_time': '平均耗时',
+    'admin.maintenance_max_time': '最长耗时',
+    'admin.maintenance_last_error': '最近错误',
     
     # 错误信息
     'error.init_failed': '应用初始化失败。请检查权限并重试。',
@@ -96,7 +256,12 @@ TRANSLATIONS = {
     # 网页剪藏
     'clipper.title': '网页剪藏',
     'clipper.url_input': '输入网址',
-    'clipper.coming_soon': '网页剪藏功能即将推出！',
+    'clipper.url_placeholder': '每行一个网址',
+    'clipper.fetch': '剪藏',
+    'clipper.fetching': '正在抓取网页...',
+    'clipper.fetch_failed': '抓取失败：{error}',
+    'clipper.save': '保存为日记',
+    'clipper.source': '来源',
     
     # 编辑器补充
     'editor.preview': '预览',
@@ -0,0 +1,206 @@
+"""按用户时区换算的写作时间：本地小时、星期和 ISO 周
+
+created_at 是 SQLite 的 CURRENT_TIMESTAMP，即 UTC 时间。直接对它取
+strftime('%H') 得到的是 UTC 小时（国内用户差 8 小时），而且每一行都要计算，
+用不上索引。这里按用户的时区把 created_at 换算成本地时间，存入 entries 的
+local_hour、local_weekday（星期一为 0）和 local_week（ISO 年 * 100 + 周）三列，
+(date, local_hour, local_weekday, local_week) 索引覆盖按时间段的分布统计。
+
+时区保存在用户自己的数据库中（user_settings 表）。修改时区时在同一个事务中重算
+所有日记的三列，时区设置和已存的本地时间始终一致。
+"""
+import functools
+import logging
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TIME_CONFIG = Config.LOCAL_TIME_CONFIG
+
+BATCH_SIZE = 5000
+
+# 待算的日记多于这个数时，先删除本地时间索引，算完再重建
+REBUILD_THRESHOLD = 10000
+
+LOCAL_COLUMNS = ('local_hour', 'local_weekday', 'local_week')
+
+
+def ensure_schema(db):
+    """创建设置表，添加本地时间列和索引"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS user_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    columns = {row[1] for row in db.execute("PRAGMA table_info(entries)")}
+    for column in LOCAL_COLUMNS:
+        if column not in columns:
+            db.execute(f"ALTER TABLE entries ADD COLUMN {column} INTEGER")
+    # 不用 executescript：它会先提交，而 set_timezone() 重建索引时仍在事务中
+    db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_entries_date_local_time
+            ON entries(date, local_hour, local_weekday, local_week)
+    ''')
+    db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_entries_local_time_pending
+            ON entries(id) WHERE local_hour IS NULL AND created_at IS NOT NULL
+    ''')
+
+
+# ---------------------------------------------------------------------------
+# 时区设置
+# ---------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=1)
+def timezones():
+    """可选的时区名称，按字母顺序"""
+    return tuple(sorted(available_timezones()))
+
+
+def get_timezone(db):
+    """用户设置的时区名称，没有设置时为 LOCAL_TIME_CONFIG['default_timezone']"""
+    row = db.execute("SELECT value FROM user_settings WHERE key = 'timezone'").fetchone()
+    return row[0] if row else LOCAL_TIME_CONFIG['default_timezone']
+
+
+def set_timezone(db, name):
+    """修改时区并重算所有日记的本地时间列，在一个事务中提交；返回重算的篇数"""
+    try:
+        zone = ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+    if name == get_timezone(db):
+        return 0
+    db.execute(
+        "INSERT INTO user_settings (key, value) VALUES ('timezone', ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (name,)
+    )
+    total = _fill(db, zone, pending_only=False)
+    db.commit()
+    logger.info(f"Timezone set to {name}, recomputed local time of {total} entries")
+    return total
+
+
+# ---------------------------------------------------------------------------
+# 换算
+# ---------------------------------------------------------------------------
+
+def local_parts(created_at, zone):
+    """把 UTC 时间字符串换算成 (本地小时, 星期, ISO 周)，无法解析时返回 None"""
+    try:
+        moment = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    local = moment.astimezone(zone)
+    year, week, _ = local.isocalendar()
+    return local.hour, local.weekday(), year * 100 + week
+
+
+def hour_parts(prefix, zone):
+    """UTC 小时 'YYYY-MM-DD HH' 内所有时间共同的换算结果
+
+    时区偏移不是整小时、或者这一小时内切换了夏令时的时候，同一小时内的时间换算
+    结果可能不同，返回 None。
+    """
+    try:
+        moment = datetime.fromisoformat(f"{prefix}:00:00").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    offset = moment.astimezone(zone).utcoffset()
+    if offset != (moment + timedelta(seconds=3599)).astimezone(zone).utcoffset() or offset.total_seconds() % 3600:
+        return None
+    return local_parts(f"{prefix}:00:00", zone)
+
+
+def _update(db, rows, zone):
+    updates = []
+    for rowid, created_at in rows:
+        parts = local_parts(created_at, zone)
+        if parts is not None:
+            updates.append((*parts, rowid))
+    db.executemany(
+        f"UPDATE entries SET {', '.join(f'{column} = ?' for column in LOCAL_COLUMNS)} WHERE rowid = ?",
+        updates
+    )
+    return len(updates)
+
+
+def _fill(db, zone, pending_only=True, batch_size=BATCH_SIZE):
+    pending = "local_hour IS NULL AND" if pending_only else ""
+    count = db.execute(f"SELECT COUNT(*) FROM entries WHERE {pending} created_at IS NOT NULL").fetchone()[0]
+    if not count:
+        return 0
+    # 大批量改写时逐行维护索引比改写完再重建慢得多，先删除索引
+    rebuild = count > REBUILD_THRESHOLD
+    if rebuild:
+        db.execute("DROP INDEX IF EXISTS idx_entries_date_local_time")
+        db.execute("DROP INDEX IF EXISTS idx_entries_local_time_pending")
+
+    # CURRENT_TIMESTAMP 格式（'YYYY-MM-DD HH:MM:SS'）的时间按 UTC 小时换算，
+    # 每个小时只算一次，再用一条 UPDATE 写入
+    prefixes = [row[0] for row in db.execute(
+        f"SELECT DISTINCT substr(created_at, 1, 13) FROM entries WHERE {pending} length(created_at) = 19"
+    )]
+    db.execute("CREATE TEMP TABLE local_time_map (prefix TEXT PRIMARY KEY, hour, weekday, week)")
+    try:
+        db.executemany("INSERT INTO temp.local_time_map VALUES (?, ?, ?, ?)", [
+            (prefix, *parts) for prefix, parts in ((prefix, hour_parts(prefix, zone)) for prefix in prefixes)
+            if parts is not None
+        ])
+        total = db.execute(f'''
+            UPDATE entries SET ({', '.join(LOCAL_COLUMNS)}) = (
+                SELECT hour, weekday, week FROM temp.local_time_map m
+                WHERE m.prefix = substr(entries.created_at, 1, 13)
+            )
+            WHERE {pending} length(created_at) = 19
+                AND substr(created_at, 1, 13) IN (SELECT prefix FROM temp.local_time_map)
+        ''').rowcount
+
+        # 其余的行（其他格式、非整小时的时区）逐行换算，按 id 翻页；
+        # 无法解析的行仍留在待算索引中，不会被反复读到
+        after, params = "", ()
+        while True:
+            rows = db.execute(f'''
+                SELECT rowid, id, created_at FROM entries
+                WHERE {pending} created_at IS NOT NULL {after}
+                    AND NOT (length(created_at) = 19
+                             AND substr(created_at, 1, 13) IN (SELECT prefix FROM temp.local_time_map))
+                ORDER BY id
+                LIMIT ?
+            ''', (*params, batch_size)).fetchall()
+            if not rows:
+                break
+            total += _update(db, [(rowid, created_at) for rowid, _, created_at in rows], zone)
+            after, params = "AND id > ?", (rows[-1][1],)
+    finally:
+        db.execute("DROP TABLE temp.local_time_map")
+    if rebuild:
+        ensure_schema(db)
+    return total
+
+
+def stamp_entries(db, entry_ids):
+    """计算指定日记的本地时间列（保存日记时调用），由调用方提交"""
+    if not entry_ids:
+        return 0
+    placeholders = ','.join('?' for _ in entry_ids)
+    rows = db.execute(
+        f"SELECT rowid, created_at FROM entries WHERE id IN ({placeholders})", list(entry_ids)
+    ).fetchall()
+    return _update(db, rows, ZoneInfo(get_timezone(db)))
+
+
+def backfill(db):
+    """为还没有本地时间的日记补算，返回处理的篇数"""
+    total = _fill(db, ZoneInfo(get_timezone(db)))
+    db.commit()
+    if total:
+        logger.info(f"Backfilled local time for {total} entries")
+    return total
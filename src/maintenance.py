@@ -0,0 +1,355 @@
+"""数据库定期维护：存储迁移、optimize、ANALYZE、增量 VACUUM、WAL 检查点、完整性检查、孤立附件和过期草稿清理
+
+应用进程中的后台线程每隔 check_interval 秒检查一次，只在本进程空闲
+（idle_seconds 内没有用户请求）时工作，有请求进来就在两个任务之间让出，
+下次接着做。多个副本共用一个数据目录时，通过文件锁保证同一时间只有一个
+副本在维护。每个 (任务, 用户) 的上次运行时间和耗时记录在 MAINTENANCE_DB_PATH，
+所有副本据此判断任务是否到期，管理页面从这里读取统计。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:     # Windows：没有 flock，只能保证本进程内不重复
+    fcntl = None
+
+from config import Config
+from drafts import prune_drafts
+from tenancy import Tenant, get_tenant, list_users
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_CONFIG = Config.MAINTENANCE_CONFIG
+
+# 维护记录保留的时长
+LOG_RETENTION = 30 * 24 * 3600
+
+
+class MaintenanceError(RuntimeError):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# 任务：每个任务接收一个自动提交模式的连接和用户，返回一行说明
+# ---------------------------------------------------------------------------
+
+def _table_exists(db, name):
+    return db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def clean_orphan_uploads(db, tenant):
+    """删除上传目录中没有被任何日记引用、且超过宽限期的文件
+
+    上传的文件先于日记写入磁盘，宽限期内的文件可能属于正在保存的日记，不删除。
+    """
+    referenced = set()
+    for (attachments,) in db.execute("SELECT attachments FROM entries WHERE attachments IS NOT NULL"):
+        try:
+            referenced.update(json.loads(attachments) or [])
+        except json.JSONDecodeError:
+            # 无法确定引用关系时宁可不删
+            raise MaintenanceError(f"Unreadable attachments JSON: {attachments[:100]}")
+    if _table_exists(db, 'attachment_extracts'):
+        referenced.update(
+            row[0] for row in db.execute("SELECT preview FROM attachment_extracts WHERE preview IS NOT NULL")
+        )
+
+    cutoff = time.time() - MAINTENANCE_CONFIG['orphan_grace']
+    removed = freed = 0
+    for directory, _, filenames in os.walk(tenant.upload_dir):
+        for filename in filenames:
+            path = Path(directory) / filename
+            if filename == '.gitkeep' or path.relative_to(tenant.data_dir).as_posix() in referenced:
+                continue
+            stat = path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            path.unlink()
+            removed += 1
+            freed += stat.st_size
+    return f"removed {removed} files ({freed / 1024:.0f} KB)"
+
+
+def check_integrity(db, tenant):
+    rows = [row[0] for row in db.execute("PRAGMA quick_check")]
+    if rows != ['ok']:
+        raise MaintenanceError("; ".join(rows[:5]))
+    return 'ok'
+
+
+def analyze(db, tenant):
+    # analysis_limit 限制每个索引的采样行数，大库上 ANALYZE 也能很快结束
+    db.execute(f"PRAGMA analysis_limit = {int(MAINTENANCE_CONFIG['analysis_limit'])}")
+    db.execute("ANALYZE")
+    return None
+
+
+def optimize(db, tenant):
+    db.execute("PRAGMA optimize")
+    return None
+
+
+def incremental_vacuum(db, tenant):
+    """归还空闲页；旧数据库先做一次完整 VACUUM 切换到增量模式"""
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("VACUUM")
+        return "switched to incremental auto_vacuum"
+    free = db.execute("PRAGMA freelist_count").fetchone()[0]
+    if free < MAINTENANCE_CONFIG['min_free_pages']:
+        return f"{free} free pages"
+    db.execute("PRAGMA incremental_vacuum").fetchall()
+    return f"released {free} pages"
+
+
+def checkpoint(db, tenant):
+    busy, wal_pages, checkpointed = db.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    if busy:
+        return f"busy, {checkpointed}/{wal_pages} pages"
+    return f"{checkpointed} pages"
+
+
+def migrate_storage(db, tenant):
+    """把旧的心情等文本列转为词表 id，压缩正文；腾出的页由随后的 vacuum 任务归还
+
+    迁移分批提交，需要事务，使用用户连接池中的连接（提交时更新数据版本）。
+    """
+    from schema import migrate_storage as migrate, prepare
+
+    pooled = get_tenant(tenant.username)
+    prepare(pooled)
+    connection = pooled.connect()
+    try:
+        moved = migrate(connection)
+        connection.commit()
+    finally:
+        connection.close()
+    return f"migrated {moved} rows"
+
+
+def clean_drafts(db, tenant):
+    """删除超过保留期的编辑器草稿（在单独的 drafts.db 中）"""
+    return f"removed {prune_drafts(tenant)} drafts"
+
+
+# 按顺序运行；检查点放在最后，把前面任务写入 WAL 的页也合并回去
+TASKS = (
+    ('storage', migrate_storage),
+    ('orphans', clean_orphan_uploads),
+    ('drafts', clean_drafts),
+    ('integrity', check_integrity),
+    ('analyze', analyze),
+    ('optimize', optimize),
+    ('vacuum', incremental_vacuum),
+    ('checkpoint', checkpoint),
+)
+
+
+# ---------------------------------------------------------------------------
+# 运行记录
+# ---------------------------------------------------------------------------
+
+def _log_db():
+    db = sqlite3.connect(str(Config.MAINTENANCE_DB_PATH), timeout=10)
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY,
+            task TEXT NOT NULL,
+            username TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            seconds REAL NOT NULL,
+            detail TEXT,
+            error TEXT
+        )
+    ''')
+    db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_maintenance_runs_task
+            ON maintenance_runs(task, username, started_at)
+    ''')
+    return db
+
+
+def _last_runs(db):
+    """{(task, username): 上次运行时间}"""
+    return {
+        (task, username): started_at
+        for task, username, started_at in db.execute(
+            "SELECT task, username, MAX(started_at) FROM maintenance_runs GROUP BY task, username"
+        )
+    }
+
+
+def maintenance_stats():
+    """按任务汇总最近的运行记录，供管理页面显示"""
+    db = _log_db()
+    try:
+        rows = db.execute('''
+            SELECT task, COUNT(*), MAX(started_at), AVG(seconds), MAX(seconds),
+                   SUM(error IS NOT NULL)
+            FROM maintenance_runs
+            GROUP BY task
+        ''').fetchall()
+        errors = dict(db.execute('''
+            SELECT task, error FROM maintenance_runs
+            WHERE id IN (SELECT MAX(id) FROM maintenance_runs WHERE error IS NOT NULL GROUP BY task)
+        ''').fetchall())
+    finally:
+        db.close()
+    order = {name: index for index, (name, _) in enumerate(TASKS)}
+    return [
+        {'task': task, 'runs': runs, 'last_run': last_run, 'mean_seconds': mean,
+         'max_seconds': longest, 'errors': failed, 'last_error': errors.get(task)}
+        for task, runs, last_run, mean, longest, failed in sorted(rows, key=lambda row: order.get(row[0], 99))
+    ]
+
+
+# ---------------------------------------------------------------------------
+# 调度
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def _file_lock(path):
+    """非阻塞地获取跨进程文件锁，产出是否拿到锁"""
+    with open(path, 'a') as handle:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class MaintenanceScheduler:
+    """后台维护线程；note_activity() 由每次请求调用，用来判断进程是否空闲"""
+
+    def __init__(self):
+        self._last_activity = time.monotonic()
+        self._wake = threading.Event()
+        self._force = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self.current = None     # 正在运行的 (任务, 用户)
+
+    def note_activity(self):
+        self._last_activity = time.monotonic()
+
+    def idle(self):
+        return time.monotonic() - self._last_activity >= MAINTENANCE_CONFIG['idle_seconds']
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='maintenance', daemon=True)
+                self._thread.start()
+
+    def request_run(self):
+        """不等空闲、忽略间隔，尽快运行一遍所有任务"""
+        self._force = True
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(MAINTENANCE_CONFIG['check_interval'])
+            self._wake.clear()
+            force, self._force = self._force, False
+            if not (force or self.idle()):
+                continue
+            try:
+                self.run_pass(force)
+            except Exception as e:
+                logger.error(f"Maintenance pass failed: {e}", exc_info=True)
+
+    def _due(self, last_runs, task, username, now):
+        last_run = last_runs.get((task, username))
+        return last_run is None or now - last_run >= MAINTENANCE_CONFIG['intervals'][task]
+
+    def run_pass(self, force=False):
+        """为所有用户运行到期的任务，返回运行的任务数
+
+        另一个副本正在维护时直接返回 0；非强制运行时，一有请求就停下。
+        """
+        with _file_lock(Config.MAINTENANCE_LOCK_PATH) as acquired:
+            if not acquired:
+                return 0
+            log = _log_db()
+            try:
+                log.execute("DELETE FROM maintenance_runs WHERE started_at < ?",
+                            (time.time() - LOG_RETENTION,))
+                log.commit()
+                last_runs = _last_runs(log)
+                count = 0
+                for username in list_users():
+                    tenant = Tenant(username)
+                    if not tenant.db_path.exists():
+                        continue
+                    now = time.time()
+                    due = [(name, task) for name, task in TASKS
+                           if force or self._due(last_runs, name, username, now)]
+                    if not due:
+                        continue
+                    db = sqlite3.connect(str(tenant.db_path), timeout=30, isolation_level=None)
+                    try:
+                        for name, task in due:
+                            if not force and not self.idle():
+                                return count
+                            self._run(log, db, tenant, name, task)
+                            count += 1
+                    finally:
+                        db.close()
+                if count:
+                    logger.info(f"Maintenance ran {count} tasks")
+                return count
+            finally:
+                self.current = None
+                log.close()
+
+    def _run(self, log, db, tenant, name, task):
+        self.current = (name, tenant.username)
+        started_at = time.time()
+        started = time.perf_counter()
+        detail = error = None
+        try:
+            detail = task(db, tenant)
+        except Exception as e:
+            error = str(e)[:500]
+            logger.error(f"Maintenance task {name} failed for {tenant.username}: {e}")
+        seconds = time.perf_counter() - started
+        log.execute('''
+            INSERT INTO maintenance_runs (task, username, started_at, seconds, detail, error)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (name, tenant.username, started_at, seconds, detail, error))
+        log.commit()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """获取进程内共享的维护调度器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = MaintenanceScheduler()
+        return _scheduler
+
+
+def start_maintenance():
+    """启动后台维护线程（重复调用无副作用）"""
+    if MAINTENANCE_CONFIG['enabled']:
+        get_scheduler().start()
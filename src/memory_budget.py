@@ -0,0 +1,125 @@
+"""大结果集的内存上限和按页面的内存分析
+
+查询结果用 fetchmany 分批读取（iter_rows），文本分块处理（text_chunks），
+页面各自按 MEMORY_CONFIG 中的预算截断结果，内存占用不随日记数量增长。
+
+测试模式（MEMORY_CONFIG['profile']，或环境变量 DIARY_MEMORY_PROFILE=1）下
+用 tracemalloc 记录每个页面一次运行中的 Python 分配峰值，超过 page_budget_mb
+时记录警告；benchmarks/memory_profile.py 用它在部署前发现内存回退。
+tracemalloc 统计的是整个进程，多个会话同时运行时峰值会互相叠加，测试模式
+应当在单个会话中使用。
+"""
+import heapq
+import logging
+import operator
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CONFIG = Config.MEMORY_CONFIG
+
+
+def iter_rows(cursor, size=None):
+    """逐批取出游标中的行"""
+    size = size or MEMORY_CONFIG['fetch_size']
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def text_chunks(pieces, max_chars=None):
+    """把文本片段用空格拼接成不超过 max_chars 的块（单个片段过长时单独成块）"""
+    max_chars = max_chars or MEMORY_CONFIG['text_chunk_chars']
+    chunk, length = [], 0
+    for piece in pieces:
+        if not piece:
+            continue
+        if chunk and length + len(piece) > max_chars:
+            yield ' '.join(chunk)
+            chunk, length = [], 0
+        chunk.append(piece)
+        length += len(piece) + 1
+    if chunk:
+        yield ' '.join(chunk)
+
+
+def keep_common(counter, max_terms):
+    """词表超过 max_terms 时只保留出现次数最多的 max_terms 个词，返回去掉的个数
+
+    被去掉的词之后再出现时从零计数，结果是近似的：分散在很多块中、每块只出现
+    几次的词可能被低估。
+    """
+    excess = len(counter) - max_terms
+    if excess <= 0:
+        return 0
+    for term, _ in heapq.nsmallest(excess, counter.items(), key=operator.itemgetter(1)):
+        del counter[term]
+    return excess
+
+
+def estimate_size(value):
+    """粗略估计对象占用的字节数：字符串和字节串按长度，NumPy 数组等按 nbytes，
+    元组、列表和字典递归累加"""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value) + 50
+    if isinstance(getattr(value, 'nbytes', None), int):
+        return value.nbytes + 100
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return 56 + 8 * len(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) + 16 for k, v in value.items())
+    return 32
+
+
+# ---------------------------------------------------------------------------
+# 测试模式：每个页面的分配峰值
+# ---------------------------------------------------------------------------
+
+_peaks = {}     # 页面 -> {'runs', 'last_mb', 'max_mb'}
+_peaks_lock = threading.Lock()
+
+
+def profiling_enabled():
+    return bool(MEMORY_CONFIG['profile'])
+
+
+@contextmanager
+def track_page(name):
+    """测试模式下记录页面一次运行的分配峰值（相对运行开始时的已分配量）"""
+    if not profiling_enabled():
+        yield
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        peak_mb = (peak - baseline) / 2**20
+        with _peaks_lock:
+            stats = _peaks.setdefault(name, {'runs': 0, 'last_mb': 0.0, 'max_mb': 0.0})
+            stats['runs'] += 1
+            stats['last_mb'] = peak_mb
+            stats['max_mb'] = max(stats['max_mb'], peak_mb)
+        if peak_mb > MEMORY_CONFIG['page_budget_mb']:
+            logger.warning(f"Page {name} allocated {peak_mb:.1f} MB at peak, "
+                           f"over the {MEMORY_CONFIG['page_budget_mb']} MB budget")
+
+
+def page_peaks():
+    """{页面: {'runs', 'last_mb', 'max_mb'}}"""
+    with _peaks_lock:
+        return {name: dict(stats) for name, stats in _peaks.items()}
+
+
+def reset_page_peaks():
+    with _peaks_lock:
+        _peaks.clear()
@@ -1,7 +1,6 @@
 """生成模拟数据"""
 import sqlite3
-import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import random
 import os
 from pathlib import Path
@@ -13,15 +12,14 @@ from config import Config
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def ensure_data_dir():
+def ensure_data_dir(db_path=None):
     """确保数据目录存在并有正确权限"""
     try:
         # 使用绝对路径
-        base_dir = Path(__file__).parent.parent
-        data_dir = base_dir / 'data'
-        data_dir.mkdir(exist_ok=True)
+        db_path = Path(db_path or Config.DB_PATH)
+        data_dir = db_path.parent
+        data_dir.mkdir(parents=True, exist_ok=True)
         
-        db_path = data_dir / 'diary.db'
         if not db_path.exists():
             # 创建空数据库文件
             db_path.touch()
@@ -34,19 +32,21 @@ def ensure_data_dir():
         logger.error(f"Failed to create/verify data directory: {e}", exc_info=True)
         return False
 
-def init_database():
+def init_database(db_path=None):
     """初始化数据库"""
     try:
-        base_dir = Path(__file__).parent.parent
-        db_path = base_dir / 'data/diary.db'
+        db_path = Path(db_path or Config.DB_PATH)
         
-        # 如果数据库文件已存在，先删除它以确保完全重新初始化
-        if db_path.exists():
-            db_path.unlink()
+        # 如果数据库文件已存在，先删除它（连同 WAL 文件）以确保完全重新初始化
+        for path in (db_path, Path(f"{db_path}-wal"), Path(f"{db_path}-shm")):
+            if path.exists():
+                path.unlink()
         
         logger.debug(f"Attempting to connect to database at: {db_path}")
         
         db = sqlite3.connect(str(db_path))
+        # 建表之前开启增量 VACUUM，维护任务不必先做一次完整 VACUUM
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
         db.execute("PRAGMA foreign_keys = ON")
         
         # 确保创建所有必要的列
@@ -94,24 +94,25 @@ def init_database():
         logger.error(f"Error initializing database: {e}", exc_info=True)
         return None
 
-def generate_mock_data():
+def generate_mock_data(db_path=None, model_path=None):
     """生成模拟数据"""
     try:
-        config = Config()
+        db_path = db_path or Config.DB_PATH
         logger.debug("Starting mock data generation...")
         
         # 1. 确保数据目录存在
-        if not ensure_data_dir():
+        if not ensure_data_dir(db_path):
             logger.error("Failed to create/verify data directory")
             return False
             
         # 2. 初始化数据库（创建表结构）
-        if not init_database():
+        db = init_database(db_path)
+        if not db:
             logger.error("Failed to initialize database")
             return False
+        db.close()
             
         # 3. 连接数据库
-        db_path = config.DB_PATH
         logger.debug(f"Connecting to database at: {db_path}")
         db = sqlite3.connect(str(db_path))
         
@@ -131,10 +132,15 @@ def generate_mock_data():
             DELETE FROM entries;
         ''')
         
-        # 模拟数据
-        moods = ['开心', '平静', '疲惫', '兴奋', '焦虑', '伤心']
-        weathers = ['晴朗', '多云', '小雨', '阴天', '大晴天']
-        locations = ['家里', '公司', '咖啡馆', '图书馆', '公园']
+        # 模拟数据：心情、天气、地点取自默认词表，日记中保存词表 id
+        from vocabulary import ensure_schema as ensure_vocabulary_schema, resolve
+        ensure_vocabulary_schema(db)
+        defaults = Config.VOCABULARY_CONFIG['defaults']
+        vocabulary_ids = {
+            kind: {name: resolve(db, kind, name) for name in names}
+            for kind, names in defaults.items()
+        }
+        moods, weathers, locations = defaults['mood'], defaults['weather'], defaults['location']
         
         # 模拟日记内容模板
         templates = [
@@ -215,7 +221,7 @@ def generate_mock_data():
                     # 插入日记时使用标准格式日期
                     db.execute('''
                         INSERT INTO entries (
-                            id, date, title, content, mood, weather, location,
+                            id, date, title, content, mood_id, weather_id, location_id,
                             created_at
                         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                     ''', (
@@ -223,37 +229,29 @@ def generate_mock_data():
                         date_str,
                         title,
                         content,
-                        mood,
-                        weather,
-                        location,
-                        current_date.strftime('%Y-%m-%d %H:%M:%S')
-                    ))
-                    
-                    # 生成主题分析
-                    sentiment = random.uniform(-1, 1)
-                    keywords = random.sample([
-                        '生活', '工作', '学习', '家庭', '健康', 
-                        '娱乐', '运动', '阅读', '写作', '思考'
-                    ], 3)
-                    
-                    db.execute('''
-                        INSERT INTO topics (
-                            id, entry_id, topic, keywords, sentiment
-                        ) VALUES (?, ?, ?, ?, ?)
-                    ''', (
-                        f"topic_{date_str}_{_}",
-                        f"entry_{date_str}_{_}",
-                        random.choice(['日常', '工作', '学习', '生活感悟']),
-                        json.dumps(keywords, ensure_ascii=False),
-                        sentiment
+                        vocabulary_ids['mood'][mood],
+                        vocabulary_ids['weather'][weather],
+                        vocabulary_ids['location'][location],
+                        # created_at 与 CURRENT_TIMESTAMP 一样存 UTC 时间
+                        current_date.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
                     ))
         
         # 提交更改
         db.commit()
         logger.info("Mock data generated successfully")
         
-        # 6. 验证数据生成
-        if not verify_mock_data():
+        # 6. 计算情感分数，训练主题模型为日记分配主题和关键词
+        from entry_bodies import ensure_schema as ensure_body_schema
+        from sentiment import score_entries
+        from topic_model import train
+        # 情感分析和主题模型通过 entry_texts 视图读取正文
+        ensure_body_schema(db)
+        db.commit()
+        score_entries(db)
+        train(db_path, model_path=model_path)
+        
+        # 7. 验证数据生成
+        if not verify_mock_data(db_path):
             logger.error("Data verification failed")
             return False
             
@@ -266,10 +264,10 @@ def generate_mock_data():
         if 'db' in locals():
             db.close()
 
-def verify_mock_data():
+def verify_mock_data(db_path=None):
     """验证模拟数据是否成功生成"""
     try:
-        db = sqlite3.connect('data/diary.db')
+        db = sqlite3.connect(str(db_path or Config.DB_PATH))
         cursor = db.cursor()
         
         # 检查entries表
@@ -293,8 +291,9 @@ def verify_mock_data():
         
         # 获取一条示例数据
         cursor.execute("""
-            SELECT e.date, e.title, e.content, e.mood, t.topic, t.sentiment 
+            SELECT e.date, e.title, e.content, m.name, t.topic, t.sentiment 
             FROM entries e 
+            LEFT JOIN moods m ON m.id = e.mood_id
             LEFT JOIN topics t ON e.id = t.entry_id 
             LIMIT 1
         """)
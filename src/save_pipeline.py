@@ -0,0 +1,296 @@
+"""保存日记后的派生工作：向量索引、主题、情感分析和附件文本提取
+
+保存时只在一个短事务里写入日记行、正文、标签，同时为每项派生工作登记一行
+entry_tasks（状态为 pending），提交后立即返回。后台线程随后逐项执行并把状态
+改为 done 或 failed。任务行和日记行在同一事务中提交，进程在两者之间退出也
+不会丢失工作：下次初始化时 resume_pending() 会重新提交仍为 pending 的任务。
+
+多个进程（副本）共用同一个数据库，执行前先用一条 UPDATE 把任务从 pending 改为
+running 并记下认领者，只有认领成功的进程执行。认领超过 claim_timeout 秒仍未
+结束的任务（进程中途退出）由 resume_pending() 放回 pending。
+
+任务失败时记录错误，按指数退避（retry_delay 秒起，每次加倍）在 not_before 之后
+重新提交，等待期间不占用执行线程；达到 max_attempts 次后标记为 failed。
+附件的预览图由附件提取器生成，状态从 attachment_extracts 表读取。
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from attachment_text import queue_attachments
+from config import Config
+from sentiment import score_entries
+from tenancy import commit_quietly
+from topic_model import fold_in
+from vector_index import get_vector_index
+
+logger = logging.getLogger(__name__)
+
+SAVE_CONFIG = Config.SAVE_CONFIG
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 认领任务时记下的进程标识
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+CLAIM_COLUMNS = ('not_before', 'claimed_by', 'claimed_at')
+
+
+def ensure_schema(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS entry_tasks (
+            entry_id TEXT NOT NULL,
+            task TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            queued_at TEXT NOT NULL,
+            finished_at TEXT,
+            not_before TEXT,
+            claimed_by TEXT,
+            claimed_at TEXT,
+            PRIMARY KEY (entry_id, task),
+            FOREIGN KEY (entry_id) REFERENCES entries(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    columns = {row[1] for row in db.execute("PRAGMA table_info(entry_tasks)")}
+    for column in CLAIM_COLUMNS:
+        if column not in columns:
+            db.execute(f"ALTER TABLE entry_tasks ADD COLUMN {column} TEXT")
+    db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_entry_tasks_status ON entry_tasks(status)
+    ''')
+
+
+# ---------------------------------------------------------------------------
+# 任务：每个任务接收连接、用户和日记 id
+# ---------------------------------------------------------------------------
+
+def index_vectors(db, tenant, entry_id):
+    # 同步会补上所有还没有进入索引的日记，不只是这一篇
+    get_vector_index(tenant.vector_dir).sync(db)
+
+
+def assign_topics(db, tenant, entry_id):
+    fold_in(db, [entry_id], model_path=tenant.topic_model_path)
+
+
+def score_sentiment(db, tenant, entry_id):
+    score_entries(db, [entry_id])
+
+
+def extract_attachments(db, tenant, entry_id):
+    """把文档附件交给附件提取器；提取本身在提取器的线程中进行"""
+    row = db.execute("SELECT attachments FROM entries WHERE id = ?", (entry_id,)).fetchone()
+    paths = json.loads(row[0] or '[]') if row else []
+    queue_attachments(db, tenant, entry_id, paths)
+
+
+# 按顺序执行
+TASKS = (
+    ('index', index_vectors),
+    ('topics', assign_topics),
+    ('sentiment', score_sentiment),
+    ('attachments', extract_attachments),
+)
+
+
+def queue_tasks(db, entry_id):
+    """在保存日记的事务中登记派生工作；由调用方提交"""
+    now = datetime.now().isoformat(timespec='seconds')
+    db.executemany(
+        "INSERT OR REPLACE INTO entry_tasks (entry_id, task, status, queued_at) VALUES (?, ?, ?, ?)",
+        [(entry_id, name, STATUS_PENDING, now) for name, _ in TASKS]
+    )
+
+
+# ---------------------------------------------------------------------------
+# 后台执行
+# ---------------------------------------------------------------------------
+
+class SaveWorker:
+    """在后台线程中执行日记的派生工作"""
+
+    def __init__(self, workers):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='save-pipeline')
+        self._lock = threading.Lock()
+        self._queued = set()    # 已提交、还没有执行完的 (数据库, 日记)，避免重复提交
+        self._timers = set()    # 等待重试的定时器
+
+    def submit(self, tenant, entry_id):
+        """提交一篇已保存日记的派生工作，立即返回"""
+        key = (str(tenant.db_path), entry_id)
+        with self._lock:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+        self._executor.submit(self._process, tenant, entry_id, key)
+
+    def schedule(self, tenant, entry_id, delay):
+        """delay 秒后再提交；定时器线程只负责提交，不占用执行线程"""
+        if delay <= 0:
+            self.submit(tenant, entry_id)
+            return
+
+        def fire():
+            with self._lock:
+                self._timers.discard(timer)
+            self.submit(tenant, entry_id)
+
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def _process(self, tenant, entry_id, key):
+        retry_in = None
+        try:
+            db = tenant.connect()
+            try:
+                # 执行期间日记可能被再次保存，任务重新变为 pending，直到没有可认领的任务
+                claimed = True
+                while claimed:
+                    claimed = False
+                    for name, task in TASKS:
+                        attempts = self._claim(db, entry_id, name)
+                        if attempts is None:
+                            continue
+                        claimed = True
+                        delay = self._run(db, tenant, entry_id, name, task, attempts)
+                        if delay is not None:
+                            retry_in = delay if retry_in is None else min(retry_in, delay)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Error processing saved entry {entry_id}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._queued.discard(key)
+        if retry_in is not None:
+            self.schedule(tenant, entry_id, retry_in)
+
+    @staticmethod
+    def _claim(db, entry_id, name):
+        """认领一项到期的 pending 任务，返回已尝试的次数；其他进程已认领或未到重试时间时返回 None"""
+        now = datetime.now().isoformat(timespec='seconds')
+        claimed = db.execute('''
+            UPDATE entry_tasks SET status = ?, claimed_by = ?, claimed_at = ?
+            WHERE entry_id = ? AND task = ? AND status = ?
+                AND (not_before IS NULL OR not_before <= ?)
+        ''', (STATUS_RUNNING, WORKER_ID, now, entry_id, name, STATUS_PENDING, now)).rowcount
+        attempts = None
+        if claimed:
+            attempts = db.execute(
+                "SELECT attempts FROM entry_tasks WHERE entry_id = ? AND task = ?", (entry_id, name)
+            ).fetchone()[0]
+        commit_quietly(db)
+        return attempts
+
+    @staticmethod
+    def _run(db, tenant, entry_id, name, task, attempts):
+        """执行一项已认领的任务；失败且还能重试时返回等待的秒数"""
+        try:
+            task(db, tenant, entry_id)
+            db.commit()
+            status, error = STATUS_DONE, None
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Task {name} failed for entry {entry_id}: {e}", exc_info=True)
+            status, error = STATUS_FAILED, str(e)[:500]
+        delay = not_before = None
+        now = datetime.now()
+        if status == STATUS_FAILED and attempts + 1 < SAVE_CONFIG['max_attempts']:
+            delay = SAVE_CONFIG['retry_delay'] * 2 ** attempts
+            status = STATUS_PENDING
+            not_before = (now + timedelta(seconds=delay)).isoformat(timespec='seconds')
+        # 认领期间日记被再次保存时任务行已被替换，不覆盖新的 pending 状态
+        db.execute('''
+            UPDATE entry_tasks
+            SET attempts = attempts + 1, status = ?, error = ?, finished_at = ?,
+                not_before = ?, claimed_by = NULL, claimed_at = NULL
+            WHERE entry_id = ? AND task = ? AND status = ? AND claimed_by = ?
+        ''', (status, error, now.isoformat(timespec='seconds'), not_before,
+              entry_id, name, STATUS_RUNNING, WORKER_ID))
+        commit_quietly(db)
+        return delay
+
+    def shutdown(self):
+        with self._lock:
+            timers, self._timers = self._timers, set()
+        for timer in timers:
+            timer.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_save_worker():
+    """获取进程内共享的后台执行器"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SaveWorker(SAVE_CONFIG['workers'])
+        return _worker
+
+
+def resume_pending(db, tenant):
+    """重新提交上次进程退出时仍未完成的派生工作
+
+    认领超过 claim_timeout 秒的任务先放回 pending；等待重试的任务到 not_before 时再提交。
+    """
+    now = datetime.now()
+    stale = (now - timedelta(seconds=SAVE_CONFIG['claim_timeout'])).isoformat(timespec='seconds')
+    db.execute('''
+        UPDATE entry_tasks SET status = ?, claimed_by = NULL, claimed_at = NULL
+        WHERE status = ? AND claimed_at < ?
+    ''', (STATUS_PENDING, STATUS_RUNNING, stale))
+    commit_quietly(db)
+    rows = db.execute('''
+        SELECT entry_id, MIN(COALESCE(not_before, '')) FROM entry_tasks
+        WHERE status = ?
+        GROUP BY entry_id
+    ''', (STATUS_PENDING,)).fetchall()
+    for entry_id, not_before in rows:
+        delay = (datetime.fromisoformat(not_before) - now).total_seconds() if not_before else 0
+        get_save_worker().schedule(tenant, entry_id, delay)
+    if rows:
+        logger.info(f"Resumed derived work for {len(rows)} entries")
+    return len(rows)
+
+
+# ---------------------------------------------------------------------------
+# 状态
+# ---------------------------------------------------------------------------
+
+def entry_status(db, entry_ids):
+    """{entry_id: {'title', 'tasks': {任务: 状态}, 'previews': {状态: 附件数}}}，按 entry_ids 的顺序"""
+    if not entry_ids:
+        return {}
+    placeholders = ','.join('?' for _ in entry_ids)
+    status = {
+        entry_id: {'title': title, 'tasks': {}, 'previews': {}}
+        for entry_id, title in db.execute(
+            f"SELECT id, title FROM entries WHERE id IN ({placeholders})", entry_ids
+        )
+    }
+    for entry_id, task, state in db.execute(
+        f"SELECT entry_id, task, status FROM entry_tasks WHERE entry_id IN ({placeholders})", entry_ids
+    ):
+        status[entry_id]['tasks'][task] = state
+    for entry_id, state, count in db.execute(f'''
+        SELECT entry_id, status, COUNT(*) FROM attachment_extracts
+        WHERE entry_id IN ({placeholders})
+        GROUP BY entry_id, status
+    ''', entry_ids):
+        status[entry_id]['previews'][state] = count
+    return {entry_id: status[entry_id] for entry_id in entry_ids if entry_id in status}
@@ -0,0 +1,155 @@
+"""用户数据库的建表和迁移，网页端和 API 共用
+
+create_tables() 建立最初的几张表；ensure_schema() 在此之上添加各模块的列、表和
+索引；migrate() 补算已有日记的派生列。prepare() 在每个进程中对每个用户只做一次，
+打开没有迁移过的旧数据库时查询不会因为缺少列而失败。
+
+改写大量行的存储迁移（正文压缩、心情等转为词表 id）和随后的 VACUUM 不在请求中
+进行，由后台维护的 storage 任务完成，也可以在升级后手动运行：
+
+    python src/schema.py migrate [--user <用户名>]
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+import threading
+
+from attachment_text import ensure_schema as ensure_attachment_schema
+from entry_bodies import ensure_schema as ensure_body_schema, migrate as migrate_bodies
+from local_time import backfill as backfill_local_time, ensure_schema as ensure_local_time_schema
+from save_pipeline import ensure_schema as ensure_save_schema
+from sentiment import ensure_schema as ensure_sentiment_schema
+from tag_query import ensure_index as ensure_tag_index
+from tenancy import ensure_schema as ensure_version_schema, get_tenant, list_users
+from text_metrics import backfill as backfill_text_metrics, ensure_schema as ensure_text_metrics_schema
+from topic_model import ensure_schema as ensure_topic_schema
+from vector_index import ensure_schema as ensure_vector_schema
+from vocabulary import ensure_schema as ensure_vocabulary_schema, migrate as migrate_vocabulary
+
+logger = logging.getLogger(__name__)
+
+BASE_TABLES = '''
+    CREATE TABLE IF NOT EXISTS entries (
+        id TEXT PRIMARY KEY,
+        date TEXT NOT NULL,
+        title TEXT NOT NULL,
+        content TEXT,
+        attachments TEXT,
+        mood TEXT,
+        weather TEXT,
+        location TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS tags (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE IF NOT EXISTS entry_tags (
+        entry_id TEXT,
+        tag_id TEXT,
+        PRIMARY KEY (entry_id, tag_id),
+        FOREIGN KEY (entry_id) REFERENCES entries(id) ON DELETE CASCADE,
+        FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS topics (
+        id TEXT PRIMARY KEY,
+        entry_id TEXT,
+        topic TEXT,
+        keywords TEXT,
+        sentiment REAL,
+        FOREIGN KEY (entry_id) REFERENCES entries(id) ON DELETE CASCADE
+    );
+'''
+
+
+def create_tables(db):
+    """建立日记、标签和主题表"""
+    db.executescript(BASE_TABLES)
+
+
+def ensure_schema(db):
+    """建表，并添加各模块的列、表和索引"""
+    create_tables(db)
+    ensure_version_schema(db)
+    ensure_tag_index(db)
+    ensure_text_metrics_schema(db)
+    ensure_vector_schema(db)
+    ensure_topic_schema(db)
+    ensure_sentiment_schema(db)
+    ensure_attachment_schema(db)
+    ensure_body_schema(db)
+    ensure_vocabulary_schema(db)
+    ensure_save_schema(db)
+    ensure_local_time_schema(db)
+    db.commit()
+
+
+def migrate(db):
+    """补算已有日记的派生列；须在 ensure_schema 之后调用"""
+    backfill_text_metrics(db)
+    backfill_local_time(db)
+
+
+def migrate_storage(db):
+    """把旧的心情等文本列转为词表 id，按 STORAGE_CONFIG 压缩或解压正文，返回改写的行数
+
+    不执行 VACUUM，由调用方决定何时归还空间。
+    """
+    return migrate_vocabulary(db) + migrate_bodies(db)
+
+
+_lock = threading.Lock()
+_prepared = set()   # 本进程内已经建表和补算过的用户；与网页端的 Tenant.initialized 无关
+
+
+def prepare(tenant):
+    """建表并补算一个用户的数据库，每个进程中每个用户只做一次"""
+    if tenant.username in _prepared:
+        return
+    with _lock:
+        if tenant.username in _prepared:
+            return
+        db = tenant.connect()
+        try:
+            ensure_schema(db)
+            migrate(db)
+        finally:
+            db.close()
+        _prepared.add(tenant.username)
+        logger.info(f"Prepared database of {tenant.username}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and migrate diary databases")
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = commands.add_parser(
+        'migrate', help="apply schema changes, migrate storage and VACUUM")
+    migrate_parser.add_argument('--user', help="account to migrate (default: all accounts)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for username in [args.user] if args.user else list_users():
+        tenant = get_tenant(username)
+        if not tenant.db_path.exists():
+            continue
+        connection = tenant.connect()
+        try:
+            ensure_schema(connection)
+            migrate(connection)
+            moved = migrate_storage(connection)
+            connection.commit()
+        finally:
+            connection.close()
+        if moved:
+            tenant.close_idle()
+            vacuum = sqlite3.connect(str(tenant.db_path), isolation_level=None)
+            # 顺便切换到增量模式，之后的维护只需增量 VACUUM
+            vacuum.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            vacuum.execute("VACUUM")
+            vacuum.close()
+        print(f"{username}: migrated {moved} rows")
+    sys.exit(0)
@@ -0,0 +1,246 @@
+"""情感分析：基于词典的中英文情感打分
+
+分词后逐词查表得到情感权重、否定词和程度副词标记，然后按批次用 NumPy
+计算：每个情感词受同一分句内前 NEGATION_WINDOW 个词的否定和加权影响，
+按日记汇总后归一化到 [-1, 1]。查表结果按词缓存。
+"""
+import argparse
+import logging
+import math
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from config import Config
+from entry_bodies import ensure_schema as ensure_body_schema
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+NEGATION_WINDOW = 3
+# 否定后情感反转并减弱（"不开心" 没有 "难过" 那么负面）
+NEGATION_SCALE = -0.75
+# 归一化常数：score / sqrt(score^2 + ALPHA)
+ALPHA = 15.0
+
+POSITIVE = {
+    # 中文
+    '开心': 2.0, '高兴': 2.0, '快乐': 2.0, '愉快': 1.8, '幸福': 2.5, '兴奋': 2.0, '激动': 1.5,
+    '满足': 1.8, '满意': 1.8, '放松': 1.5, '轻松': 1.5, '平静': 0.8, '安心': 1.2, '舒服': 1.5,
+    '感动': 1.8, '感恩': 2.0, '感谢': 1.5, '温暖': 1.8, '美好': 2.0, '美味': 1.5, '好吃': 1.5,
+    '很棒': 2.0, '棒': 1.8, '好': 1.0, '不错': 1.5, '喜欢': 1.8, '爱': 2.0, '享受': 1.8,
+    '充实': 1.5, '期待': 1.2, '希望': 1.0, '乐观': 1.8, '珍惜': 1.2, '胜利': 2.0, '成功': 2.0,
+    '顺利': 1.5, '进步': 1.5, '收获': 1.5, '干劲': 1.5, '努力': 0.8, '坚持': 0.8, '精彩': 2.0,
+    '有趣': 1.5, '漂亮': 1.5, '健康': 1.2, '自信': 1.5, '骄傲': 1.5, '惊喜': 2.0, '欣慰': 1.8,
+    '晴朗': 0.8, '大晴天': 1.0,
+    # English
+    'happy': 2.0, 'glad': 1.8, 'joy': 2.2, 'great': 2.0, 'good': 1.5, 'nice': 1.5, 'love': 2.2,
+    'like': 1.0, 'excited': 2.0, 'calm': 0.8, 'relaxed': 1.5, 'grateful': 2.0, 'thankful': 2.0,
+    'wonderful': 2.5, 'amazing': 2.5, 'awesome': 2.5, 'fun': 1.8, 'proud': 1.8, 'success': 2.0,
+    'hope': 1.0, 'enjoy': 1.8, 'enjoyed': 1.8, 'beautiful': 2.0, 'better': 1.2, 'best': 2.2,
+}
+
+NEGATIVE = {
+    # 中文
+    '难过': -2.0, '伤心': -2.2, '悲伤': -2.5, '痛苦': -2.5, '失望': -2.0, '沮丧': -2.0,
+    '焦虑': -2.0, '紧张': -1.2, '担心': -1.5, '害怕': -1.8, '恐惧': -2.2, '生气': -2.0,
+    '愤怒': -2.5, '烦': -1.5, '烦躁': -1.8, '郁闷': -1.8, '无聊': -1.2, '孤独': -1.8,
+    '寂寞': -1.5, '疲惫': -1.5, '累': -1.2, '辛苦': -1.0, '困': -0.8, '压力': -1.2,
+    '糟糕': -2.2, '差': -1.5, '坏': -1.5, '讨厌': -2.0, '后悔': -1.8, '遗憾': -1.5,
+    '失败': -2.0, '生病': -1.8, '头疼': -1.5, '崩溃': -2.5, '委屈': -1.8, '感慨': -0.3,
+    '不安': -1.5, '迷茫': -1.2, '尴尬': -1.2, '吵架': -2.0, '加班': -0.8, '下雨': -0.3,
+    # English
+    'sad': -2.0, 'unhappy': -2.0, 'bad': -1.8, 'terrible': -2.5, 'awful': -2.5, 'angry': -2.2,
+    'upset': -1.8, 'tired': -1.2, 'anxious': -2.0, 'worried': -1.5, 'afraid': -1.8, 'hate': -2.5,
+    'lonely': -1.8, 'bored': -1.2, 'stress': -1.5, 'stressed': -1.5, 'sick': -1.8, 'fail': -2.0,
+    'failed': -2.0, 'worse': -1.5, 'worst': -2.5, 'disappointed': -2.0, 'cry': -1.8, 'cried': -1.8,
+}
+
+NEGATIONS = frozenset(
+    '不 没 没有 别 不要 不是 无 非 未 从未 并不 不太 不怎么 毫不 never not no nothing none '
+    "don't doesn't didn't isn't wasn't aren't can't cannot won't".split()
+)
+
+INTENSIFIERS = {
+    '很': 1.3, '非常': 1.5, '特别': 1.5, '十分': 1.5, '超级': 1.8, '极其': 1.8, '太': 1.5,
+    '真': 1.3, '真的': 1.3, '好': 1.2, '挺': 1.2, '更': 1.3, '最': 1.6, '格外': 1.5,
+    '有点': 0.7, '有些': 0.7, '略': 0.6, '略显': 0.6, '稍微': 0.6, '一点': 0.7, '比较': 0.9,
+    'very': 1.3, 'really': 1.3, 'so': 1.3, 'extremely': 1.8, 'super': 1.5, 'too': 1.3,
+    'quite': 1.1, 'slightly': 0.6, 'somewhat': 0.7, 'little': 0.7,
+}
+
+CLAUSE_BREAKS = frozenset('，。！？；：、,.!?;:\n…')
+
+LEXICON = {**POSITIVE, **NEGATIVE}
+
+
+@lru_cache(maxsize=200000)
+def _token_code(token):
+    """查表：返回 (情感权重, 是否否定词, 程度系数, 是否分句边界)"""
+    if token in CLAUSE_BREAKS:
+        return 0.0, False, 1.0, True
+    key = token.lower()
+    weight = LEXICON.get(key, 0.0)
+    if not weight and 1 < len(key) <= 6:
+        # jieba 常把修饰词和情感词切成一个词（"有点累"、"不太好"），拆开前缀再查表
+        for split in range(min(3, len(key) - 1), 0, -1):
+            prefix, rest = key[:split], key[split:]
+            if prefix in NEGATIONS or prefix in INTENSIFIERS:
+                rest_weight = _token_code(rest)[0]
+                if rest_weight:
+                    scale = NEGATION_SCALE if prefix in NEGATIONS else INTENSIFIERS[prefix]
+                    return rest_weight * scale, False, 1.0, False
+    return weight, key in NEGATIONS, INTENSIFIERS.get(key, 1.0), False
+
+
+def _tokens(text):
+    import jieba
+
+    return [token for token in jieba.cut(text or '', HMM=False) if not token.isspace()]
+
+
+def score_texts(texts):
+    """批量计算情感分数，返回 float32 数组，取值范围 [-1, 1]"""
+    codes = []
+    doc_ids = []
+    for doc_id, text in enumerate(texts):
+        tokens = _tokens(text)
+        codes.extend(map(_token_code, tokens))
+        doc_ids.extend([doc_id] * len(tokens))
+    if not codes:
+        return np.zeros(len(texts), dtype=np.float32)
+
+    weights, negations, multipliers, breaks = (np.array(column) for column in zip(*codes))
+    doc_ids = np.array(doc_ids, dtype=np.int64)
+    # 分句编号：分句边界或新日记处开始新的分句
+    starts = breaks.copy()
+    starts[1:] |= doc_ids[1:] != doc_ids[:-1]
+    clauses = np.cumsum(starts)
+
+    factors = np.ones(len(codes), dtype=np.float64)
+    for offset in range(1, NEGATION_WINDOW + 1):
+        if offset >= len(codes):
+            break
+        same_clause = clauses[offset:] == clauses[:-offset]
+        factors[offset:] *= np.where(same_clause & negations[:-offset], NEGATION_SCALE, 1.0)
+        factors[offset:] *= np.where(same_clause, multipliers[:-offset], 1.0)
+
+    # 作为修饰词出现的程度副词自身不计分（如 "好开心" 里的 "好"）
+    modifies_next = np.zeros(len(codes), dtype=bool)
+    modifies_next[:-1] = (multipliers[:-1] != 1.0) & (weights[1:] != 0) & (clauses[1:] == clauses[:-1])
+    contributions = np.where(modifies_next, 0.0, weights * factors)
+
+    totals = np.bincount(doc_ids, weights=contributions, minlength=len(texts))
+    return (totals / np.sqrt(totals * totals + ALPHA)).astype(np.float32)
+
+
+def score_text(text):
+    """计算一段文本的情感分数"""
+    return float(score_texts([text])[0])
+
+
+def ensure_schema(db):
+    """按情感排序读取重要事件，需要索引"""
+    db.execute("CREATE INDEX IF NOT EXISTS idx_topics_sentiment ON topics(sentiment, entry_id)")
+
+
+def write_sentiment(db, rows):
+    """批量写回 (entry_id, sentiment)，保留已有的主题和关键词"""
+    payload = [(float(score), entry_id) for entry_id, score in rows]
+    db.executemany("UPDATE topics SET sentiment = ? WHERE entry_id = ?", payload)
+    db.executemany('''
+        INSERT INTO topics (id, entry_id, sentiment)
+        SELECT ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM topics WHERE entry_id = ?)
+    ''', [(f"topic_{entry_id}", entry_id, score, entry_id) for score, entry_id in payload])
+    db.commit()
+
+
+def _pending_entries(db, entry_ids, batch_size):
+    """分批返回需要打分的日记；未指定 entry_ids 时查找所有还没有情感分数的日记"""
+    if entry_ids is not None:
+        entry_ids = list(entry_ids)
+        for start in range(0, len(entry_ids), batch_size):
+            batch = entry_ids[start:start + batch_size]
+            placeholders = ','.join('?' for _ in batch)
+            yield db.execute(
+                f"""
+                SELECT e.id, e.title, x.content
+                FROM entries e
+                JOIN entry_texts x ON x.entry_id = e.id
+                WHERE e.id IN ({placeholders})
+                """, batch
+            ).fetchall()
+        return
+    while True:
+        rows = db.execute('''
+            SELECT e.id, e.title, x.content
+            FROM entries e
+            JOIN entry_texts x ON x.entry_id = e.id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM topics tp WHERE tp.entry_id = e.id AND tp.sentiment IS NOT NULL
+            )
+            LIMIT ?
+        ''', (batch_size,)).fetchall()
+        if not rows:
+            return
+        yield rows
+
+
+def score_entries(db, entry_ids=None, batch_size=BATCH_SIZE, workers=1):
+    """为日记计算并写回情感分数，返回处理的日记数
+
+    entry_ids 为空时处理所有还没有情感分数的日记；workers 大于 1 时用进程池分词打分。
+    """
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    total = 0
+    try:
+        for rows in _pending_entries(db, entry_ids, batch_size):
+            if not rows:
+                continue
+            texts = [f"{title or ''}。{content or ''}" for _, title, content in rows]
+            if pool is None:
+                scores = score_texts(texts)
+            else:
+                chunk = math.ceil(len(texts) / workers)
+                scores = np.concatenate(list(pool.map(
+                    score_texts, [texts[i:i + chunk] for i in range(0, len(texts), chunk)]
+                )))
+            write_sentiment(db, zip((row[0] for row in rows), scores))
+            total += len(rows)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if total and entry_ids is None:
+        logger.info(f"Scored sentiment for {total} entries")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score sentiment for entries that have none yet")
+    parser.add_argument('--workers', type=int, default=1, help="scoring processes")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--rescore', action='store_true', help="clear and recompute all scores")
+    parser.add_argument('--user', help="account whose diary to process (default: the single-user database)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.user:
+        from tenancy import get_tenant
+        # 用户的连接提交时会更新数据版本
+        connection = get_tenant(args.user).connect()
+    else:
+        connection = sqlite3.connect(str(Config.DB_PATH))
+    ensure_body_schema(connection)
+    ensure_schema(connection)
+    if args.rescore:
+        connection.execute("UPDATE topics SET sentiment = NULL")
+        connection.commit()
+    count = score_entries(connection, batch_size=args.batch_size * max(1, args.workers),
+                          workers=args.workers)
+    connection.close()
+    print(f"Processed {count} entries")
+    sys.exit(0)
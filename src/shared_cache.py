@@ -0,0 +1,287 @@
+"""多级计算结果缓存：进程内 LRU（L1）和多个进程共用的 SQLite 文件（L2）
+
+多个 Streamlit 副本挂载同一个数据卷时，一个副本算出的统计结果可以被其他副本
+直接读取。每条缓存属于一个 scope（通常是某个用户的数据库），并带有该 scope
+的数据版本（Tenant.data_version，改动数据的提交次数）；写入新版本时同一 scope 的旧版本被删除，
+数据变化后不会再读到过期结果。
+
+缓存层可以替换：register_backend() 注册新的后端，CACHE_CONFIG['layers']
+决定使用哪些层以及查找顺序。
+"""
+import hashlib
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from memory_budget import estimate_size
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONFIG = Config.CACHE_CONFIG
+
+MISSING = object()
+
+
+# ---------------------------------------------------------------------------
+# 缓存层
+# ---------------------------------------------------------------------------
+
+class MemoryCache:
+    """进程内 LRU，条目数和估计的总字节数都有上限"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (scope, version, value, size)
+        self._scopes = {}               # scope -> (最新写入的版本, 该 scope 的键)
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return MISSING
+            self._entries.move_to_end(key)
+            return cached[2]
+
+    def _discard(self, key):
+        scope, _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        # 最后一个条目被删除时 scope 也一起删除，scope 的数量不超过条目数
+        keys = self._scopes[scope][1]
+        keys.discard(key)
+        if not keys:
+            del self._scopes[scope]
+
+    def set(self, key, scope, version, value):
+        size = estimate_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            current = self._scopes.get(scope)
+            if current is not None and current[0] != version:
+                for k in list(current[1]):
+                    self._discard(k)
+            if key in self._entries:
+                self._discard(key)
+            self._scopes.setdefault(scope, (version, set()))[1].add(key)
+            self._entries[key] = (scope, version, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                self._discard(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._bytes = 0
+
+    def info(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+
+class SQLiteCache:
+    """同一数据卷上的进程共用的缓存文件
+
+    值用 pickle 序列化。读取不写库，淘汰按写入时间，总大小超过上限时删除最早的条目。
+    缓存只是加速手段，数据库错误只记录日志并当作未命中。
+    """
+
+    name = 'sqlite'
+
+    TRIM_EVERY = 64     # 每写入这么多次检查一次总大小
+
+    def __init__(self, path, max_bytes, ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            ''')
+            db.execute("CREATE INDEX IF NOT EXISTS idx_cache_scope ON cache(scope, version)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_cache_stored_at ON cache(stored_at)")
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        row = self._db().execute(
+            "SELECT value, stored_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time() - self.ttl:
+            return MISSING
+        return pickle.loads(row[0])
+
+    def set(self, key, scope, version, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes // 16:
+            return
+        db = self._db()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM cache WHERE scope = ? AND version <> ?", (scope, version))
+            db.execute(
+                "INSERT OR REPLACE INTO cache (key, scope, version, value, size, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, scope, version, blob, len(blob), time.time())
+            )
+        self._writes += 1
+        if self._writes % self.TRIM_EVERY == 0:
+            self.trim()
+
+    def trim(self):
+        """删除过期条目，总大小超过上限时从最早写入的开始删除到上限的 90%"""
+        db = self._db()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM cache WHERE stored_at < ?", (time.time() - self.ttl,))
+            total, = db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()
+            excess = total - int(self.max_bytes * 0.9)
+            if total > self.max_bytes:
+                cutoff = 0
+                for key, size in db.execute("SELECT key, size FROM cache ORDER BY stored_at"):
+                    cutoff += 1
+                    excess -= size
+                    if excess <= 0:
+                        break
+                db.execute("""
+                    DELETE FROM cache WHERE key IN (
+                        SELECT key FROM cache ORDER BY stored_at LIMIT ?
+                    )
+                """, (cutoff,))
+
+    def clear(self):
+        self._db().execute("DELETE FROM cache")
+
+    def info(self):
+        entries, size = self._db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        return {'entries': entries, 'bytes': size}
+
+
+BACKENDS = {
+    'memory': lambda: MemoryCache(CACHE_CONFIG['memory_max_entries'], CACHE_CONFIG['memory_max_bytes']),
+    'sqlite': lambda: SQLiteCache(Config.CACHE_DB_PATH, CACHE_CONFIG['sqlite_max_bytes'],
+                                  CACHE_CONFIG['ttl']),
+}
+
+
+def register_backend(name, factory):
+    """注册缓存层；factory 无参数，返回实现 get/set/clear/info 的对象"""
+    BACKENDS[name] = factory
+
+
+# ---------------------------------------------------------------------------
+# 多级缓存
+# ---------------------------------------------------------------------------
+
+def make_key(scope, version, name, params):
+    """缓存键：scope、数据版本、计算名称和参数的摘要，在各进程间一致"""
+    raw = repr((scope, version, name, tuple(params)))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class TieredCache:
+    """按顺序查找各层，命中时回填前面的层；全部未命中时计算并写入所有层"""
+
+    def __init__(self, layers):
+        self.layers = list(layers)
+        self._lock = threading.Lock()
+        self._stats = {layer.name: {'hits': 0, 'misses': 0, 'errors': 0} for layer in self.layers}
+        self._computes = 0
+        self._compute_seconds = 0.0
+
+    def _count(self, layer, field):
+        with self._lock:
+            self._stats[layer.name][field] += 1
+
+    def _get(self, layer, key):
+        try:
+            value = layer.get(key)
+        except Exception as e:
+            logger.warning(f"Cache layer {layer.name} read failed: {e}")
+            self._count(layer, 'errors')
+            return MISSING
+        self._count(layer, 'misses' if value is MISSING else 'hits')
+        return value
+
+    def _set(self, layers, key, scope, version, value):
+        for layer in layers:
+            try:
+                layer.set(key, scope, version, value)
+            except Exception as e:
+                logger.warning(f"Cache layer {layer.name} write failed: {e}")
+                self._count(layer, 'errors')
+
+    def get_or_compute(self, scope, version, name, params, compute):
+        """返回缓存的结果，未命中时调用 compute() 并缓存其返回值"""
+        key = make_key(scope, version, name, params)
+        for index, layer in enumerate(self.layers):
+            value = self._get(layer, key)
+            if value is not MISSING:
+                self._set(self.layers[:index], key, scope, version, value)
+                return value
+
+        started = time.perf_counter()
+        value = compute()
+        with self._lock:
+            self._computes += 1
+            self._compute_seconds += time.perf_counter() - started
+        self._set(self.layers, key, scope, version, value)
+        return value
+
+    def clear(self):
+        for layer in self.layers:
+            layer.clear()
+
+    def stats(self):
+        """每一层的命中/未命中次数、命中率和大小，以及重新计算的次数和耗时"""
+        with self._lock:
+            layers = {name: dict(counts) for name, counts in self._stats.items()}
+            computes, seconds = self._computes, self._compute_seconds
+        for layer in self.layers:
+            counts = layers[layer.name]
+            lookups = counts['hits'] + counts['misses']
+            counts['hit_rate'] = counts['hits'] / lookups if lookups else 0.0
+            try:
+                counts.update(layer.info())
+            except Exception as e:
+                logger.warning(f"Cache layer {layer.name} info failed: {e}")
+        return {'layers': layers, 'computes': computes, 'compute_seconds': seconds}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """获取进程内共享的多级缓存，层次由 CACHE_CONFIG['layers'] 决定"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TieredCache(BACKENDS[name]() for name in CACHE_CONFIG['layers'])
+        return _cache
@@ -0,0 +1,70 @@
+"""标签查询：支持 AND / OR / NOT 组合的标签筛选"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODE_ALL = 'all'
+MODE_ANY = 'any'
+
+# entry_tags 的主键是 (entry_id, tag_id)，按标签查日记需要反向索引
+INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_entry_tags_tag ON entry_tags(tag_id, entry_id)"
+
+
+def ensure_index(db):
+    """创建按标签查询所需的索引"""
+    db.execute(INDEX_SQL)
+
+
+def resolve_tag_ids(db, names):
+    """把标签名解析为标签 id，返回 {name: id}"""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    placeholders = ','.join('?' for _ in names)
+    cursor = db.execute(f"SELECT name, id FROM tags WHERE name IN ({placeholders})", names)
+    return dict(cursor.fetchall())
+
+
+def build_tag_filter(db, all_of=(), any_of=(), none_of=(), entry_column='e.id'):
+    """构建标签筛选条件
+
+    all_of 中的标签必须全部存在，any_of 中至少存在一个，none_of 中一个都不能有。
+    每个子条件都是走 idx_entry_tags_tag 的子查询，不需要把 tags 连接进主查询，
+    也就不会产生行膨胀。返回 (conditions, params)，可以直接拼到 WHERE 里。
+    """
+    conditions = []
+    params = []
+    tag_ids = resolve_tag_ids(db, [*all_of, *any_of, *none_of])
+
+    if all_of:
+        ids = [tag_ids.get(name) for name in dict.fromkeys(all_of)]
+        if None in ids:
+            # 不存在的标签不可能被全部匹配
+            return ["0"], []
+        intersect = ' INTERSECT '.join(
+            'SELECT entry_id FROM entry_tags WHERE tag_id = ?' for _ in ids
+        )
+        conditions.append(f"{entry_column} IN ({intersect})")
+        params.extend(ids)
+
+    if any_of:
+        ids = [tag_ids[name] for name in dict.fromkeys(any_of) if name in tag_ids]
+        if not ids:
+            return ["0"], []
+        placeholders = ','.join('?' for _ in ids)
+        conditions.append(
+            f"{entry_column} IN (SELECT entry_id FROM entry_tags WHERE tag_id IN ({placeholders}))"
+        )
+        params.extend(ids)
+
+    if none_of:
+        ids = [tag_ids[name] for name in dict.fromkeys(none_of) if name in tag_ids]
+        if ids:
+            placeholders = ','.join('?' for _ in ids)
+            conditions.append(
+                f"{entry_column} NOT IN (SELECT entry_id FROM entry_tags "
+                f"WHERE tag_id IN ({placeholders}) AND entry_id IS NOT NULL)"
+            )
+            params.extend(ids)
+
+    return conditions, params
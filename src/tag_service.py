@@ -0,0 +1,167 @@
+"""标签服务：使用次数、最近使用时间和前缀/模糊补全"""
+import bisect
+import heapq
+import logging
+import threading
+
+from pypinyin import Style, lazy_pinyin
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 20
+
+
+def _is_cjk(char):
+    return '一' <= char <= '鿿'
+
+
+def search_keys(name):
+    """生成一个标签的检索键：小写名称，以及中文标签的拼音首字母和全拼"""
+    lowered = name.lower()
+    keys = {lowered}
+    if any(_is_cjk(char) for char in name):
+        initials = lazy_pinyin(name, style=Style.FIRST_LETTER)
+        syllables = lazy_pinyin(name)
+        keys.add(''.join(initials).lower())
+        keys.add(''.join(syllables).lower())
+    return keys
+
+
+def _is_subsequence(query, text):
+    it = iter(text)
+    return all(char in it for char in query)
+
+
+class TagIndex:
+    """内存中的标签索引
+
+    所有检索键放在一个有序数组里，前缀查询用二分查找定位；刷新时只读取
+    tags / entry_tags 中 rowid 大于上次水位的新行，因此是增量的。水位上的那一行
+    同时记下内容，数据库被重建过（行数无论变多还是变少）时内容对不上，从头加载。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []          # 有序的 (key, name)
+        self._stats = {}         # name -> [usage_count, last_used]
+        self._tag_names = {}     # tag_id -> name
+        self._tag_rowid = 0      # 已加载的 tags 最大 rowid
+        self._link_rowid = 0     # 已加载的 entry_tags 最大 rowid
+        self._tag_mark = None    # 水位上那一行的 (id,)
+        self._link_mark = None   # 水位上那一行的 (entry_id, tag_id)
+
+    def _reset(self):
+        self._keys = []
+        self._stats = {}
+        self._tag_names = {}
+        self._tag_rowid = 0
+        self._link_rowid = 0
+        self._tag_mark = None
+        self._link_mark = None
+
+    def _unchanged(self, db):
+        """上次加载到的最后一行是否还在原处"""
+        if self._tag_rowid and db.execute(
+            "SELECT id FROM tags WHERE rowid = ?", (self._tag_rowid,)
+        ).fetchone() != self._tag_mark:
+            return False
+        if self._link_rowid and db.execute(
+            "SELECT entry_id, tag_id FROM entry_tags WHERE rowid = ?", (self._link_rowid,)
+        ).fetchone() != self._link_mark:
+            return False
+        return True
+
+    def refresh(self, db):
+        """从数据库增量加载新标签和新的标签关联"""
+        with self._lock:
+            if not self._unchanged(db):
+                # 数据库被重建过（例如重新生成模拟数据），从头加载
+                self._reset()
+
+            cursor = db.execute(
+                "SELECT rowid, id, name FROM tags WHERE rowid > ? ORDER BY rowid",
+                (self._tag_rowid,)
+            )
+            for rowid, tag_id, name in cursor:
+                self._tag_rowid, self._tag_mark = rowid, (tag_id,)
+                self._tag_names[tag_id] = name
+                if name not in self._stats:
+                    self._stats[name] = [0, '']
+                    for key in search_keys(name):
+                        bisect.insort(self._keys, (key, name))
+
+            cursor = db.execute("""
+                SELECT et.rowid, et.entry_id, et.tag_id, e.created_at
+                FROM entry_tags et
+                LEFT JOIN entries e ON e.id = et.entry_id
+                WHERE et.rowid > ?
+                ORDER BY et.rowid
+            """, (self._link_rowid,))
+            for rowid, entry_id, tag_id, created_at in cursor:
+                self._link_rowid, self._link_mark = rowid, (entry_id, tag_id)
+                name = self._tag_names.get(tag_id)
+                if name is None:
+                    continue
+                stats = self._stats[name]
+                stats[0] += 1
+                if created_at and created_at > stats[1]:
+                    stats[1] = created_at
+
+    def search(self, query='', limit=DEFAULT_LIMIT):
+        """按前缀（含拼音首字母）检索标签，不足时用子序列模糊匹配补齐
+
+        模糊匹配只检查首字符与查询相同的键（有序数组中的一段），不必遍历所有键。
+        结果按使用次数、最近使用时间排序。
+        """
+        query = query.strip().lower()
+        with self._lock:
+            if not query:
+                candidates = set(self._stats)
+            else:
+                candidates = set()
+                start = bisect.bisect_left(self._keys, (query,))
+                for key, name in self._keys[start:]:
+                    if not key.startswith(query):
+                        break
+                    candidates.add(name)
+                if len(candidates) < limit:
+                    first = query[0]
+                    end = bisect.bisect_left(self._keys, (chr(ord(first) + 1),))
+                    start = bisect.bisect_left(self._keys, (first,))
+                    candidates.update(
+                        name for key, name in self._keys[start:end]
+                        if _is_subsequence(query[1:], key[1:])
+                    )
+            return heapq.nlargest(
+                limit, candidates, key=lambda name: tuple(self._stats[name])
+            )
+
+    def usage(self, name):
+        """返回 (使用次数, 最近使用时间)"""
+        with self._lock:
+            count, last_used = self._stats.get(name, (0, ''))
+            return count, last_used or None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_tag_index(db_path):
+    """获取指定数据库的共享标签索引"""
+    with _indexes_lock:
+        index = _indexes.get(str(db_path))
+        if index is None:
+            index = _indexes[str(db_path)] = TagIndex()
+        return index
+
+
+def suggest_tags(db, db_path, query='', selected=(), limit=DEFAULT_LIMIT):
+    """刷新索引并返回补全候选，已选中的标签始终包含在内"""
+    index = get_tag_index(db_path)
+    try:
+        index.refresh(db)
+    except Exception as e:
+        logger.error(f"Error refreshing tag index: {e}")
+    suggestions = index.search(query, limit)
+    return list(dict.fromkeys([*selected, *suggestions]))
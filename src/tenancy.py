@@ -0,0 +1,463 @@
+"""多用户：账户、按用户分片的数据目录和数据库连接
+
+每个用户有独立的数据目录，里面是该用户的数据库、上传文件、向量索引和主题模型。
+打开过的用户保存在 LRU 中，每个用户持有少量可复用的数据库连接，被淘汰时关闭
+空闲连接。跨用户的统计由线程池并行扫描各用户的数据库。
+
+第一个管理员只能在没有任何账户时创建，并接管单用户时代的数据：
+
+    python src/tenancy.py create-admin <用户名>
+
+登录页在核对旧的站点密码（st.secrets["password"]）后也可以创建，注册表单只创建
+普通账户。
+"""
+import argparse
+import getpass
+import hashlib
+import hmac
+import logging
+import os
+import re
+import secrets
+import shutil
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import Config
+from entry_bodies import register_functions
+
+logger = logging.getLogger(__name__)
+
+TENANCY_CONFIG = Config.TENANCY_CONFIG
+USERNAME_RE = re.compile(r'^[a-z0-9_-]{3,32}$')
+PBKDF2_ITERATIONS = 200000
+
+
+class AccountError(ValueError):
+    """账户操作失败，参数为对应的翻译键"""
+
+
+# ---------------------------------------------------------------------------
+# 账户
+# ---------------------------------------------------------------------------
+
+def _accounts_db():
+    db = sqlite3.connect(str(Config.ACCOUNTS_DB_PATH))
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password_hash TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            is_admin INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return db
+
+
+def hash_password(password, salt):
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), bytes.fromhex(salt),
+                               PBKDF2_ITERATIONS).hex()
+
+
+def normalize_username(username):
+    return (username or '').strip().lower()
+
+
+def _insert_user(username, password, is_admin, only_if_empty=False):
+    username = normalize_username(username)
+    if not USERNAME_RE.match(username):
+        raise AccountError('account.invalid_username')
+    if len(password or '') < TENANCY_CONFIG['min_password_length']:
+        raise AccountError('account.weak_password')
+
+    salt = secrets.token_hex(16)
+    # 是否已有账户的判断和插入在同一条语句中完成，两个请求同时创建时只有一个成功
+    condition = "WHERE NOT EXISTS (SELECT 1 FROM users)" if only_if_empty else ""
+    db = _accounts_db()
+    try:
+        try:
+            inserted = db.execute(
+                f"INSERT INTO users (username, password_hash, salt, is_admin) SELECT ?, ?, ?, ? {condition}",
+                (username, hash_password(password, salt), salt, int(is_admin))
+            ).rowcount
+        except sqlite3.IntegrityError:
+            raise AccountError('account.exists')
+        if not inserted:
+            raise AccountError('account.already_set_up')
+        db.commit()
+    finally:
+        db.close()
+    logger.info(f"Created {'admin ' if is_admin else ''}account {username}")
+    return {'username': username, 'is_admin': is_admin}
+
+
+def create_user(username, password, is_admin=False):
+    """创建账户，返回用户信息"""
+    return _insert_user(username, password, is_admin)
+
+
+def create_first_admin(username, password):
+    """在还没有任何账户时创建管理员，并把单用户时代的数据移入其目录
+
+    已有账户时抛出 AccountError('account.already_set_up')。
+    """
+    user = _insert_user(username, password, True, only_if_empty=True)
+    adopt_legacy_data(get_tenant(user['username']))
+    return user
+
+
+def has_users():
+    """是否已经创建过账户"""
+    db = _accounts_db()
+    try:
+        return db.execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None
+    finally:
+        db.close()
+
+
+def authenticate(username, password):
+    """校验用户名和密码，成功时返回用户信息，否则返回 None"""
+    username = normalize_username(username)
+    db = _accounts_db()
+    try:
+        row = db.execute(
+            "SELECT password_hash, salt, is_admin FROM users WHERE username = ?", (username,)
+        ).fetchone()
+    finally:
+        db.close()
+    if row is None or not hmac.compare_digest(row[0], hash_password(password or '', row[1])):
+        return None
+    return {'username': username, 'is_admin': bool(row[2])}
+
+
+def list_users():
+    """返回所有用户名"""
+    db = _accounts_db()
+    try:
+        return [row[0] for row in db.execute("SELECT username FROM users ORDER BY username")]
+    finally:
+        db.close()
+
+
+# ---------------------------------------------------------------------------
+# 数据版本
+# ---------------------------------------------------------------------------
+
+def ensure_schema(db):
+    """创建数据版本表：token 在建库时随机生成，version 是改动了数据的提交次数"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS data_changes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            token TEXT NOT NULL,
+            version INTEGER NOT NULL
+        )
+    ''')
+    db.execute("INSERT OR IGNORE INTO data_changes (id, token, version) VALUES (1, lower(hex(randomblob(8))), 0)")
+
+
+def mark_changed(db):
+    """在当前事务中把数据版本加一，随调用方的提交生效
+
+    通过 Tenant.connect() 打开的连接在提交时自动调用；直接用 sqlite3.connect()
+    写用户数据库的代码须自己调用。只改动任务状态、索引水位等记录的提交用
+    commit_quietly()，不改变版本。
+    """
+    try:
+        db.execute("UPDATE data_changes SET version = version + 1")
+    except sqlite3.OperationalError:
+        pass    # 还没有建表的旧数据库
+
+
+def commit_quietly(db):
+    """提交不影响用户可见数据的改动（任务状态、索引水位等），不改变数据版本"""
+    if isinstance(db, PooledConnection):
+        db.commit(changed=False)
+    else:
+        db.commit()
+
+
+# ---------------------------------------------------------------------------
+# 用户数据目录和连接
+# ---------------------------------------------------------------------------
+
+class PooledConnection(sqlite3.Connection):
+    """close() 时把连接还给所属用户的空闲池，而不是真正关闭
+
+    commit() 时如果这个事务改动过行，把数据版本加一；ANALYZE、VACUUM 等不改动
+    行的操作不改变版本，changed 为 False 的提交（见 commit_quietly()）也不改变。
+    """
+
+    tenant = None
+    _committed_changes = 0
+
+    def commit(self, changed=True):
+        if changed and self.tenant is not None and self.total_changes != self._committed_changes:
+            mark_changed(self)
+        super().commit()
+        self._committed_changes = self.total_changes
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        if self.tenant is None:
+            super().close()
+        else:
+            self.tenant._release(self)
+
+    def _close(self):
+        super().close()
+
+
+# 本进程内已完成建表和迁移的用户。放在 Tenant 之外，用户从 LRU 淘汰后再次打开
+# 时不必重做
+_initialized = set()
+
+
+class Tenant:
+    """一个用户的数据目录和可复用的数据库连接"""
+
+    def __init__(self, username, root=None):
+        self.username = username
+        self.data_dir = Path(root or Config.USERS_DIR) / username
+        self.upload_dir = self.data_dir / 'uploads'
+        self.db_path = self.data_dir / 'diary.db'
+        self.drafts_path = self.data_dir / 'drafts.db'
+        self.vector_dir = self.data_dir / 'vectors'
+        self.topic_model_path = self.data_dir / 'topic_model.npz'
+        self._lock = threading.Lock()
+        self._idle = []
+        self._closed = False
+        self._watch = None            # 只用来读 PRAGMA data_version 的连接
+        self._seen = None             # 上次读到的 PRAGMA data_version
+        self._version = None
+
+    @property
+    def initialized(self):
+        """本进程内是否已完成建表和迁移"""
+        return self.username in _initialized
+
+    @initialized.setter
+    def initialized(self, value):
+        if value:
+            _initialized.add(self.username)
+        else:
+            _initialized.discard(self.username)
+
+    def data_version(self):
+        """数据版本 '<token>.<提交次数>'，改动了数据的提交之后才会改变
+
+        检查点、ANALYZE 和 VACUUM 不改变版本。值存在数据库中，共用数据卷的各个
+        进程得到相同的版本。PRAGMA data_version 没有变化（期间没有任何提交）时
+        直接返回上次的结果，不查表。
+        """
+        with self._lock:
+            try:
+                if self._watch is None:
+                    self._watch = sqlite3.connect(f"{self.db_path.as_uri()}?mode=ro", uri=True,
+                                                  check_same_thread=False)
+                seen = self._watch.execute("PRAGMA data_version").fetchone()[0]
+                if seen != self._seen or self._version is None:
+                    token, version = self._watch.execute(
+                        "SELECT token, version FROM data_changes"
+                    ).fetchone() or ('0', 0)
+                    self._seen, self._version = seen, f"{token}.{version}"
+            except sqlite3.OperationalError:
+                # 还没有建表；下次重新读
+                self._seen, self._version = None, None
+                return '0'
+            return self._version
+
+    def connect(self):
+        """取出一个空闲连接，没有时打开新的连接"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(self.db_path), factory=PooledConnection,
+                             check_same_thread=False)
+        # 只对还没有表的新数据库生效；旧数据库由维护任务 VACUUM 一次后切换
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("PRAGMA foreign_keys = ON")
+        db.execute("PRAGMA journal_mode = WAL")
+        register_functions(db)
+        db.tenant = self
+        return db
+
+    def _release(self, db):
+        with self._lock:
+            if not self._closed and len(self._idle) < TENANCY_CONFIG['max_idle_connections']:
+                self._idle.append(db)
+                return
+        db._close()
+
+    def close_idle(self):
+        """关闭所有空闲连接（例如重建数据库文件之前）"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            watch, self._watch, self._version = self._watch, None, None
+        for db in idle:
+            db._close()
+        if watch is not None:
+            watch.close()
+
+    def close(self):
+        """从 LRU 淘汰时调用：关闭空闲连接，正在使用的连接归还时关闭"""
+        with self._lock:
+            self._closed = True
+        self.close_idle()
+
+
+class TenantPool:
+    """按最近使用保留打开的用户"""
+
+    def __init__(self, max_open):
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._tenants = OrderedDict()
+
+    def get(self, username):
+        evicted = None
+        with self._lock:
+            tenant = self._tenants.get(username)
+            if tenant is None:
+                tenant = self._tenants[username] = Tenant(username)
+                if len(self._tenants) > self.max_open:
+                    _, evicted = self._tenants.popitem(last=False)
+            else:
+                self._tenants.move_to_end(username)
+        if evicted is not None:
+            evicted.close()
+        return tenant
+
+    def __len__(self):
+        return len(self._tenants)
+
+
+_pool = TenantPool(TENANCY_CONFIG['max_open_tenants'])
+
+
+def get_tenant(username):
+    """获取用户的数据目录和连接池"""
+    return _pool.get(username)
+
+
+def adopt_legacy_data(tenant):
+    """把单用户时代的数据（data/diary.db 等）移入第一个账户的目录"""
+    if not Config.DB_PATH.exists() or tenant.db_path.exists():
+        return False
+    tenant.close_idle()
+    tenant.data_dir.mkdir(parents=True, exist_ok=True)
+    for suffix in ('', '-wal', '-shm'):
+        source = Path(f"{Config.DB_PATH}{suffix}")
+        if source.exists():
+            shutil.move(str(source), f"{tenant.db_path}{suffix}")
+    moves = ((Config.VECTOR_DIR, tenant.vector_dir), (Config.TOPIC_MODEL_PATH, tenant.topic_model_path))
+    for source, target in moves:
+        if source.exists() and not target.exists():
+            shutil.move(str(source), str(target))
+    # 附件路径相对于数据目录保存（uploads/xxx.jpg），移动后仍然有效
+    tenant.upload_dir.mkdir(parents=True, exist_ok=True)
+    if Config.UPLOAD_DIR.exists():
+        for path in Config.UPLOAD_DIR.iterdir():
+            if path.name != '.gitkeep':
+                shutil.move(str(path), str(tenant.upload_dir / path.name))
+    logger.info(f"Moved single-user data into {tenant.data_dir}")
+    return True
+
+
+# ---------------------------------------------------------------------------
+# 跨用户统计
+# ---------------------------------------------------------------------------
+
+def _directory_size(path):
+    total = files = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat().st_size
+                files += 1
+    return total, files
+
+
+def _scan_shard(username):
+    """只读打开一个用户的数据库并统计"""
+    tenant = Tenant(username)
+    stats = {'username': username, 'entries': 0, 'tags': 0, 'first_date': None,
+             'last_date': None, 'db_bytes': 0, 'upload_bytes': 0, 'upload_files': 0}
+    stats['upload_bytes'], stats['upload_files'] = _directory_size(tenant.upload_dir)
+    if not tenant.db_path.exists():
+        return stats
+    stats['db_bytes'] = sum(
+        os.path.getsize(f"{tenant.db_path}{suffix}")
+        for suffix in ('', '-wal') if os.path.exists(f"{tenant.db_path}{suffix}")
+    )
+    db = sqlite3.connect(f"{tenant.db_path.as_uri()}?mode=ro", uri=True)
+    try:
+        stats['entries'], stats['first_date'], stats['last_date'] = db.execute(
+            "SELECT COUNT(*), MIN(date), MAX(date) FROM entries"
+        ).fetchone()
+        stats['tags'] = db.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+    except sqlite3.Error as e:
+        logger.error(f"Error scanning shard {username}: {e}")
+    finally:
+        db.close()
+    return stats
+
+
+def scan_shards(usernames=None, workers=None):
+    """并行扫描所有用户的数据库，返回每个用户的统计"""
+    usernames = list_users() if usernames is None else list(usernames)
+    workers = workers or TENANCY_CONFIG['scan_workers']
+    if not usernames:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(usernames))) as pool:
+        return list(pool.map(_scan_shard, usernames))
+
+
+# ---------------------------------------------------------------------------
+# 命令行
+# ---------------------------------------------------------------------------
+
+def _read_password():
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Confirm password: "):
+        sys.exit("Passwords do not match")
+    return password
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage diary accounts")
+    commands = parser.add_subparsers(dest='command', required=True)
+    admin_parser = commands.add_parser(
+        'create-admin', help="create the first account as admin and move the single-user data into it")
+    admin_parser.add_argument('username')
+    user_parser = commands.add_parser('create-user', help="create another account")
+    user_parser.add_argument('username')
+    user_parser.add_argument('--admin', action='store_true', help="give the account admin rights")
+    commands.add_parser('list', help="list accounts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    Config()  # 创建数据目录
+    if args.command == 'list':
+        print('\n'.join(list_users()))
+        sys.exit(0)
+    try:
+        if args.command == 'create-admin':
+            create_first_admin(args.username, _read_password())
+        else:
+            create_user(args.username, _read_password(), is_admin=args.admin)
+    except AccountError as e:
+        sys.exit(f"Error: {e}")
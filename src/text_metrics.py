@@ -0,0 +1,71 @@
+"""文本统计：字数、词数、句数
+
+统计在保存或回填时计算一次并存入 entries 表，图表直接读取这些列。
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+METRIC_COLUMNS = ('char_count', 'cjk_count', 'word_count', 'sentence_count')
+
+_CJK_RE = re.compile(r'[㐀-䶿一-鿿豈-﫿]')
+_WORD_RE = re.compile(r'[\w㐀-䶿一-鿿豈-﫿]')
+_SENTENCE_SPLIT_RE = re.compile(r'[。！？!?…\n]+|\.(?=\s|$)')
+
+
+def compute_metrics(text):
+    """计算一段文本的统计值，返回 (char_count, cjk_count, word_count, sentence_count)
+
+    char_count 为非空白字符数；word_count 使用 jieba 分词，忽略标点和空白。
+    """
+    if not text:
+        return 0, 0, 0, 0
+
+    import jieba
+
+    char_count = sum(1 for char in text if not char.isspace())
+    cjk_count = len(_CJK_RE.findall(text))
+    word_count = sum(1 for token in jieba.cut(text) if _WORD_RE.search(token))
+    sentence_count = sum(1 for part in _SENTENCE_SPLIT_RE.split(text) if _WORD_RE.search(part))
+    return char_count, cjk_count, word_count, sentence_count
+
+
+def ensure_schema(db):
+    """添加统计列和索引"""
+    columns = {row[1] for row in db.execute("PRAGMA table_info(entries)")}
+    for column in METRIC_COLUMNS:
+        if column not in columns:
+            db.execute(f"ALTER TABLE entries ADD COLUMN {column} INTEGER")
+    db.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_entries_date_metrics
+            ON entries(date, word_count, char_count, sentence_count);
+        CREATE INDEX IF NOT EXISTS idx_entries_metrics_pending
+            ON entries(id) WHERE word_count IS NULL;
+    ''')
+
+
+def backfill(db, batch_size=BACKFILL_BATCH_SIZE):
+    """为尚未统计的日记补算统计值，返回处理的条数"""
+    total = 0
+    while True:
+        rows = db.execute('''
+            SELECT e.id, x.content
+            FROM entries e
+            JOIN entry_texts x ON x.entry_id = e.id
+            WHERE e.word_count IS NULL
+            LIMIT ?
+        ''', (batch_size,)).fetchall()
+        if not rows:
+            break
+        db.executemany(
+            f"UPDATE entries SET {', '.join(f'{c} = ?' for c in METRIC_COLUMNS)} WHERE id = ?",
+            [(*compute_metrics(content), entry_id) for entry_id, content in rows]
+        )
+        db.commit()
+        total += len(rows)
+    if total:
+        logger.info(f"Backfilled text metrics for {total} entries")
+    return total
@@ -0,0 +1,172 @@
+"""时间线卡片渲染"""
+import base64
+import hashlib
+import html
+import json
+import logging
+from datetime import date as date_cls
+from pathlib import Path
+
+from config import Config
+from shared_cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+# 日期格式，按 date.weekday() 索引（0 为周一）
+ZH_MONTHS = ('一月', '二月', '三月', '四月', '五月', '六月',
+             '七月', '八月', '九月', '十月', '十一月', '十二月')
+ZH_WEEKDAYS = ('周一', '周二', '周三', '周四', '周五', '周六', '周日')
+EN_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+             'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+EN_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# 共享样式：时间线在组件 iframe 中渲染，所以样式表随标题页下发一次，
+# 每张卡片只引用类名，不再重复内联样式
+CARD_CSS = """<style>
+.dc-title{font-size:12px;font-weight:500;color:#1a237e;margin-bottom:4px;
+  font-family:-apple-system,'PingFang SC','Microsoft YaHei';text-shadow:none;
+  white-space:nowrap;overflow:hidden;text-overflow:ellipsis}
+.dc-date{font-size:11px;color:#666;margin:6px 0;padding:2px 0;
+  border-bottom:1px solid #eee;line-height:1.4}
+.dc-weekend .dc-title{color:#d32f2f}
+.dc-weekend .dc-date{color:#e57373}
+.dc-card{background-color:#fff;padding:8px;border-radius:6px;
+  border:1px solid #e0e0e0;font-size:12px;overflow:hidden}
+.dc-card.dc-weekend{background-color:#fff5f5;border-color:#ffebee}
+.dc-meta{margin:4px 0}
+.dc-meta span{padding:1px 4px;border-radius:4px;font-size:10px;margin-right:4px}
+.dc-mood{background-color:#ffcdd2}
+.dc-weather{background-color:#b3e5fc}
+.dc-location{background-color:#c8e6c9}
+.dc-content{color:#333;font-size:14px;line-height:1.5;margin:6px 0;
+  font-family:-apple-system,'PingFang SC','Microsoft YaHei';text-shadow:none;
+  display:-webkit-box;-webkit-line-clamp:3;-webkit-box-orient:vertical;
+  overflow:hidden;background-color:#fafafa;padding:8px;border-radius:4px}
+.dc-attachments{margin-top:8px}
+.dc-attachments img{max-width:100%;height:auto;margin:4px 0;border-radius:4px}
+.dc-tags{margin-top:4px}
+.dc-tag{display:inline-block;padding:1px 6px;margin:1px;border-radius:8px;
+  background-color:#e3f2fd;color:#1565c0;font-size:10px}
+</style>"""
+
+# 预编译模板
+HEADLINE_TEMPLATE = (
+    '<div class="{weekend}"><div class="dc-title">{title}</div>'
+    '<div class="dc-date">{date_label}</div></div>'
+)
+CARD_TEMPLATE = (
+    '<div class="dc-card {weekend}">'
+    '<div class="dc-meta">{meta}</div>'
+    '<div class="dc-content">{content}</div>'
+    '{attachments}'
+    '<div class="dc-tags">{tags}</div>'
+    '</div>'
+)
+META_TEMPLATE = '<span class="dc-{kind}">{value}</span>'
+TAG_TEMPLATE = '<span class="dc-tag">{tag}</span>'
+IMAGE_TEMPLATE = '<img src="data:image/png;base64,{data}" alt="Attachment">'
+
+# 缓存的卡片只含标记，内联图片在取出缓存后再填入，不进入共享缓存
+ATTACHMENTS_MARKER = '<!--dc-attachments-->'
+
+
+def entry_version(row):
+    """根据卡片用到的字段计算版本号，任一字段变化都会使缓存失效"""
+    digest = hashlib.blake2b(digest_size=8)
+    for value in row:
+        digest.update(str(value).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+def format_date_label(day, lang):
+    """格式化卡片上的日期，例如 “三月 5日 周二” / “Mar 5 Tue”"""
+    weekday = day.weekday()
+    if lang == 'zh':
+        return f"{ZH_MONTHS[day.month - 1]} {day.day}日 {ZH_WEEKDAYS[weekday]}"
+    return f"{EN_MONTHS[day.month - 1]} {day.day} {EN_WEEKDAYS[weekday]}"
+
+
+def _render_attachments(attachments, data_dir, previews=None):
+    """把图片附件和文档附件的首页预览图编码为内联 base64"""
+    if not attachments:
+        return ''
+    try:
+        attachment_list = json.loads(attachments)
+        preview_map = json.loads(previews) if previews else {}
+    except json.JSONDecodeError:
+        logger.error(f"Failed to parse attachments JSON: {attachments}")
+        return ''
+
+    images = []
+    for attachment in attachment_list or []:
+        if not attachment.lower().endswith(IMAGE_EXTENSIONS):
+            # PDF / Word 附件在后台提取完成后才有预览图
+            attachment = preview_map.get(attachment)
+            if not attachment:
+                continue
+        file_path = Path(data_dir or Config.DATA_DIR) / attachment
+        if not file_path.exists():
+            continue
+        try:
+            img_data = base64.b64encode(file_path.read_bytes()).decode()
+            images.append(IMAGE_TEMPLATE.format(data=img_data))
+        except Exception as e:
+            logger.error(f"Error loading image: {e}")
+
+    if not images:
+        return ''
+    return '<div class="dc-attachments">' + ''.join(images) + '</div>'
+
+
+def _render(date_str, title, content, mood, weather, location, tags, lang):
+    day = date_cls.fromisoformat(date_str)
+    weekend = 'dc-weekend' if day.weekday() >= 5 else ''
+    escape = html.escape
+
+    meta = ''.join(
+        META_TEMPLATE.format(kind=kind, value=escape(value))
+        for kind, value in (('mood', mood), ('weather', weather), ('location', location))
+        if value
+    )
+    tags_html = ''
+    if tags:
+        tags_html = ''.join(TAG_TEMPLATE.format(tag=escape(tag.strip())) for tag in tags.split(','))
+
+    headline = HEADLINE_TEMPLATE.format(
+        weekend=weekend,
+        title=escape(title or ''),
+        date_label=format_date_label(day, lang),
+    )
+    text = CARD_TEMPLATE.format(
+        weekend=weekend,
+        meta=meta,
+        content=escape(content or ''),
+        attachments=ATTACHMENTS_MARKER,
+        tags=tags_html,
+    )
+    return headline, text
+
+
+def render_card(entry_id, version, lang, date_str, title, content, mood=None,
+                weather=None, location=None, tags=None, attachments=None, previews=None,
+                data_dir=None):
+    """渲染一张时间线卡片，返回 TimelineJS 事件字典
+
+    渲染结果存入共享缓存，每张卡片以 (data_dir, entry_id) 为 scope、version 为版本，
+    未变化的日记不会重复渲染，日记修改后旧版本被替换。缓存中只有卡片的文字和
+    标记，图片附件每次从磁盘读取后内联，路径相对于 data_dir（各用户的数据目录）解析。
+    """
+    headline, text = get_cache().get_or_compute(
+        f"card:{data_dir}:{entry_id}", version, 'timeline_card', (lang,),
+        lambda: _render(date_str, title, content, mood, weather, location, tags, lang)
+    )
+    text = text.replace(ATTACHMENTS_MARKER, _render_attachments(attachments, data_dir, previews), 1)
+    year, month, day = date_str.split('-')
+    return {
+        "start_date": {"year": year, "month": month, "day": day},
+        "text": {"headline": headline, "text": text},
+    }
+
@@ -0,0 +1,336 @@
+"""主题建模：用 NMF 为日记分配主题和关键词
+
+完整训练：按月份分片并行分词，构建稀疏 TF-IDF 文档-词矩阵，用乘法更新
+求解 NMF，然后把每篇日记的主题和关键词批量写回 topics 表。
+增量折入：对没有主题的新日记，固定主题-词矩阵 H，只求解它们的主题权重。
+"""
+import argparse
+import json
+import logging
+import math
+import re
+import sqlite3
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from config import Config
+from entry_bodies import ensure_schema as ensure_body_schema, register_functions
+from tenancy import mark_changed
+
+logger = logging.getLogger(__name__)
+
+TOPIC_CONFIG = Config.TOPIC_MODEL_CONFIG
+EPSILON = 1e-9
+
+_WORD_RE = re.compile(r'[A-Za-z㐀-䶿一-鿿]')
+STOPWORDS = frozenset(
+    '今天 明天 昨天 一个 一些 一下 一点 这个 那个 这样 那样 什么 怎么 因为 所以 但是 '
+    '然后 还是 已经 可以 没有 自己 我们 你们 他们 就是 觉得 感觉 时候 真的 非常 特别 '
+    'the and for with that this was are'.split()
+)
+
+
+def tokenize(text):
+    """分词，只保留长度大于 1 的实词"""
+    import jieba
+
+    return [
+        token.lower() for token in jieba.cut(text or '')
+        if len(token) > 1 and _WORD_RE.search(token) and token.lower() not in STOPWORDS
+    ]
+
+
+def ensure_schema(db):
+    """topics 按 entry_id 查询和更新，需要索引"""
+    db.execute("CREATE INDEX IF NOT EXISTS idx_topics_entry ON topics(entry_id)")
+
+
+# ---------------------------------------------------------------------------
+# 分词（可并行）
+# ---------------------------------------------------------------------------
+
+def _tokenize_shard(db_path, month):
+    """分词一个月份分片的日记，返回 [(entry_id, Counter)]"""
+    db = sqlite3.connect(db_path)
+    register_functions(db)
+    try:
+        cursor = db.execute('''
+            SELECT e.id, e.title, x.content
+            FROM entries e
+            JOIN entry_texts x ON x.entry_id = e.id
+            WHERE e.date >= ? AND e.date < ?
+        ''', (f"{month}-01", f"{month}-32"))
+        return [(entry_id, Counter(tokenize(f"{title or ''} {content or ''}")))
+                for entry_id, title, content in cursor]
+    finally:
+        db.close()
+
+
+def tokenize_corpus(db_path, workers=None):
+    """按月份分片分词全部日记；分片较多时使用进程池"""
+    db = sqlite3.connect(db_path)
+    try:
+        # 分片在子进程中通过 entry_texts 视图读取正文
+        ensure_body_schema(db)
+        db.commit()
+        months = [row[0] for row in db.execute(
+            "SELECT DISTINCT substr(date, 1, 7) FROM entries ORDER BY 1"
+        )]
+    finally:
+        db.close()
+
+    workers = workers if workers is not None else TOPIC_CONFIG['workers']
+    documents = []
+    if workers > 1 and len(months) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for shard in pool.map(_tokenize_shard, [db_path] * len(months), months):
+                documents.extend(shard)
+    else:
+        for month in months:
+            documents.extend(_tokenize_shard(db_path, month))
+    return documents
+
+
+# ---------------------------------------------------------------------------
+# 矩阵构建与 NMF
+# ---------------------------------------------------------------------------
+
+def build_vocabulary(counters, max_features, min_df, max_df):
+    """按文档频率筛选词表，返回 (vocab, idf)"""
+    df = Counter()
+    for counter in counters:
+        df.update(counter.keys())
+    n_docs = len(counters)
+    max_count = max(1, int(max_df * n_docs))
+    candidates = [(count, term) for term, count in df.items() if min_df <= count <= max_count]
+    if not candidates:
+        # 语料太小时放宽限制
+        candidates = [(count, term) for term, count in df.items()]
+    candidates.sort(key=lambda item: (-item[0], item[1]))
+    vocab = [term for _, term in candidates[:max_features]]
+    idf = np.array([math.log((1 + n_docs) / (1 + df[term])) + 1 for term in vocab], dtype=np.float32)
+    return vocab, idf
+
+
+def tfidf_matrix(counters, vocab_index, idf):
+    """构建行归一化的稀疏 TF-IDF 矩阵（词频取对数）"""
+    indptr = [0]
+    indices = []
+    data = []
+    for counter in counters:
+        for term, count in counter.items():
+            col = vocab_index.get(term)
+            if col is not None:
+                indices.append(col)
+                data.append(1.0 + math.log(count))
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr)),
+        shape=(len(counters), len(vocab_index))
+    )
+    matrix = matrix.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr().astype(np.float32)
+
+
+def nmf(X, n_topics, iterations, seed=0):
+    """用 Lee-Seung 乘法更新分解 X ≈ W H，返回 (W, H)"""
+    rng = np.random.default_rng(seed)
+    n_docs, n_terms = X.shape
+    scale = math.sqrt(X.mean() / n_topics) if X.nnz else 1.0
+    W = (rng.random((n_docs, n_topics), dtype=np.float32) * scale) + EPSILON
+    H = (rng.random((n_topics, n_terms), dtype=np.float32) * scale) + EPSILON
+    for _ in range(iterations):
+        H *= np.asarray(X.T @ W).T / (W.T @ W @ H + EPSILON)
+        W *= np.asarray(X @ H.T) / (W @ (H @ H.T) + EPSILON)
+    return W, H
+
+
+def fold_in_weights(X, H, iterations=50):
+    """固定 H，求解新文档的主题权重 W"""
+    n_docs, n_topics = X.shape[0], H.shape[0]
+    W = np.full((n_docs, n_topics), 1.0 / n_topics, dtype=np.float32)
+    XHt = np.asarray(X @ H.T)
+    HHt = H @ H.T
+    for _ in range(iterations):
+        W *= XHt / (W @ HHt + EPSILON)
+    return W
+
+
+def topic_labels(H, vocab, words=2):
+    """用每个主题权重最高的词作为主题名"""
+    return ['·'.join(vocab[i] for i in np.argsort(-row)[:words]) for row in H]
+
+
+def entry_keywords(X, topic_ids, H, vocab, count):
+    """每篇日记的关键词：本文 TF-IDF 与所属主题词权重的乘积最高的词"""
+    keywords = []
+    for row_idx, topic_id in enumerate(topic_ids):
+        row = X.getrow(row_idx)
+        if row.nnz == 0:
+            keywords.append([])
+            continue
+        weights = row.data * H[topic_id, row.indices]
+        order = np.argsort(-weights)[:count]
+        keywords.append([vocab[row.indices[i]] for i in order])
+    return keywords
+
+
+# ---------------------------------------------------------------------------
+# 模型存取与写回
+# ---------------------------------------------------------------------------
+
+def save_model(path, vocab, idf, H, labels):
+    np.savez(path, vocab=np.array(vocab), idf=idf, H=H, labels=np.array(labels))
+
+
+def load_model(path):
+    """加载已训练的模型，不存在时返回 None"""
+    try:
+        with np.load(path) as data:
+            return {
+                'vocab': data['vocab'].tolist(),
+                'idf': data['idf'],
+                'H': data['H'],
+                'labels': data['labels'].tolist(),
+            }
+    except FileNotFoundError:
+        return None
+
+
+def write_topics(db, rows):
+    """批量写回 (entry_id, topic, keywords)，保留已有的 sentiment"""
+    payload = [(topic, json.dumps(keywords, ensure_ascii=False), entry_id)
+               for entry_id, topic, keywords in rows]
+    db.executemany("UPDATE topics SET topic = ?, keywords = ? WHERE entry_id = ?", payload)
+    db.executemany('''
+        INSERT INTO topics (id, entry_id, topic, keywords)
+        SELECT ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM topics WHERE entry_id = ?)
+    ''', [(f"topic_{entry_id}", entry_id, topic, keywords, entry_id)
+          for topic, keywords, entry_id in payload])
+    db.commit()
+
+
+def _assign(X, W, H, labels, vocab, entry_ids):
+    topic_ids = np.argmax(W, axis=1)
+    keywords = entry_keywords(X, topic_ids, H, vocab, TOPIC_CONFIG['keywords'])
+    return [(entry_id, labels[topic_id], words)
+            for entry_id, topic_id, words in zip(entry_ids, topic_ids, keywords)]
+
+
+def train(db_path=None, n_topics=None, workers=None, model_path=None):
+    """完整训练并为所有日记写回主题，返回处理的日记数"""
+    db_path = str(db_path or Config.DB_PATH)
+    model_path = model_path or Config.TOPIC_MODEL_PATH
+    documents = tokenize_corpus(db_path, workers)
+    if not documents:
+        return 0
+
+    entry_ids = [entry_id for entry_id, _ in documents]
+    counters = [counter for _, counter in documents]
+    vocab, idf = build_vocabulary(
+        counters, TOPIC_CONFIG['max_features'], TOPIC_CONFIG['min_df'], TOPIC_CONFIG['max_df']
+    )
+    if not vocab:
+        return 0
+    X = tfidf_matrix(counters, {term: i for i, term in enumerate(vocab)}, idf)
+    n_topics = min(n_topics or TOPIC_CONFIG['n_topics'], len(documents), len(vocab))
+    W, H = nmf(X, n_topics, TOPIC_CONFIG['iterations'])
+    labels = topic_labels(H, vocab)
+    save_model(model_path, vocab, idf, H, labels)
+
+    db = sqlite3.connect(db_path)
+    try:
+        ensure_schema(db)
+        write_topics(db, _assign(X, W, H, labels, vocab, entry_ids))
+        mark_changed(db)
+        db.commit()
+    finally:
+        db.close()
+    logger.info(f"Trained {n_topics} topics over {len(documents)} entries")
+    return len(documents)
+
+
+def _pending_entries(db, entry_ids, batch_size):
+    """分批返回需要折入的日记；未指定 entry_ids 时查找所有没有主题的日记"""
+    if entry_ids is not None:
+        entry_ids = list(entry_ids)
+        for start in range(0, len(entry_ids), batch_size):
+            batch = entry_ids[start:start + batch_size]
+            placeholders = ','.join('?' for _ in batch)
+            yield db.execute(
+                f"""
+                SELECT e.id, e.title, x.content
+                FROM entries e
+                JOIN entry_texts x ON x.entry_id = e.id
+                WHERE e.id IN ({placeholders})
+                """, batch
+            ).fetchall()
+        return
+    while True:
+        rows = db.execute('''
+            SELECT e.id, e.title, x.content
+            FROM entries e
+            JOIN entry_texts x ON x.entry_id = e.id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM topics tp WHERE tp.entry_id = e.id AND tp.topic IS NOT NULL
+            )
+            LIMIT ?
+        ''', (batch_size,)).fetchall()
+        if not rows:
+            return
+        yield rows
+
+
+def fold_in(db, entry_ids=None, model_path=None, batch_size=1000):
+    """把新日记折入已有模型，返回处理的日记数
+
+    entry_ids 为空时处理所有还没有主题的日记。
+    """
+    model = load_model(model_path or Config.TOPIC_MODEL_PATH)
+    if model is None:
+        return 0
+    vocab_index = {term: i for i, term in enumerate(model['vocab'])}
+    total = 0
+    for rows in _pending_entries(db, entry_ids, batch_size):
+        if not rows:
+            continue
+        counters = [Counter(tokenize(f"{title or ''} {content or ''}")) for _, title, content in rows]
+        X = tfidf_matrix(counters, vocab_index, model['idf'])
+        W = fold_in_weights(X, model['H'])
+        write_topics(db, _assign(X, W, model['H'], model['labels'], model['vocab'],
+                                 [row[0] for row in rows]))
+        total += len(rows)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the topic model and assign topics to entries")
+    parser.add_argument('--topics', type=int, default=None, help="number of topics")
+    parser.add_argument('--workers', type=int, default=None, help="tokenizer processes")
+    parser.add_argument('--fold-in', action='store_true', help="only assign topics to new entries")
+    parser.add_argument('--user', help="account whose diary to process (default: the single-user database)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db_path, model_path, tenant = Config.DB_PATH, Config.TOPIC_MODEL_PATH, None
+    if args.user:
+        from tenancy import get_tenant
+        tenant = get_tenant(args.user)
+        db_path, model_path = tenant.db_path, tenant.topic_model_path
+    if args.fold_in:
+        # 用户的连接提交时会更新数据版本
+        connection = tenant.connect() if tenant else sqlite3.connect(str(db_path))
+        ensure_body_schema(connection)
+        count = fold_in(connection, model_path=model_path)
+        connection.close()
+    else:
+        count = train(db_path, n_topics=args.topics, workers=args.workers, model_path=model_path)
+    print(f"Processed {count} entries")
+    sys.exit(0)
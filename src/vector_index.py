@@ -0,0 +1,333 @@
+"""相似日记检索：哈希 n-gram 向量 + 倒排（IVF）近似最近邻索引
+
+向量保存在数据目录下的内存映射文件里，行号与日记 id 的对应关系存放在
+entry_vectors 表中。索引按 entries 的 rowid 水位增量更新。
+"""
+import logging
+import math
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from tenancy import commit_quietly
+
+logger = logging.getLogger(__name__)
+
+DIM = 256
+INITIAL_CAPACITY = 1024
+SYNC_BATCH_SIZE = 500
+
+# 少于这个数量时直接暴力计算，超过后使用 IVF 索引
+IVF_MIN_ROWS = 20000
+IVF_PROBES = 8
+KMEANS_SAMPLE = 20000
+KMEANS_ITERATIONS = 10
+
+_TOKEN_RE = re.compile(r'[\w㐀-䶿一-鿿]')
+_CJK_RE = re.compile(r'[㐀-䶿一-鿿]')
+
+# 高频虚词不参与相似度计算
+STOPWORDS = frozenset('了 的 地 得 是 在 我 你 他 她 它 们 很 也 和 就 都 而 及 与 着 或 把 被 这 那 有 个 一个 今天 the a an and or of to in is it'.split())
+
+
+def _features(text):
+    """提取特征：jieba 词语、词语二元组，以及中文单字和二元组"""
+    import jieba
+
+    tokens = [token.lower() for token in jieba.cut(text or '')
+              if _TOKEN_RE.search(token) and token.lower() not in STOPWORDS]
+    features = list(tokens)
+    features.extend(f"{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    cjk = ''.join(char for char in _CJK_RE.findall(text or '') if char not in STOPWORDS)
+    features.extend(cjk)
+    features.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return features
+
+
+def vectorize(text, dim=DIM):
+    """把文本转换为 L2 归一化的哈希特征向量（带符号哈希，词频取对数）"""
+    counts = {}
+    for feature in _features(text):
+        digest = zlib.crc32(feature.encode('utf-8'))
+        counts[digest] = counts.get(digest, 0) + 1
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for digest, count in counts.items():
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        vector[digest % dim] += sign * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def ensure_schema(db):
+    """创建行号映射表和元数据表"""
+    db.executescript('''
+        CREATE TABLE IF NOT EXISTS entry_vectors (
+            entry_id TEXT PRIMARY KEY,
+            row INTEGER NOT NULL UNIQUE,
+            FOREIGN KEY (entry_id) REFERENCES entries(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS vector_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    ''')
+
+
+def _get_meta(db, key, default=0):
+    row = db.execute("SELECT value FROM vector_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(db, key, value):
+    db.execute("INSERT OR REPLACE INTO vector_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+class VectorIndex:
+    """一个数据库对应的向量索引"""
+
+    def __init__(self, directory, dim=DIM):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._training = False
+        self._vectors = None
+        self._lists = None
+        self._centroids = None
+        self._capacity = 0
+
+    @property
+    def _vectors_path(self):
+        return self.directory / 'vectors.f16'
+
+    @property
+    def _lists_path(self):
+        return self.directory / 'lists.i32'
+
+    @property
+    def _centroids_path(self):
+        return self.directory / 'centroids.npy'
+
+    # -- 存储 ---------------------------------------------------------------
+
+    def _open(self, capacity):
+        """打开（必要时扩容）内存映射文件"""
+        capacity = max(capacity, INITIAL_CAPACITY)
+        if self._vectors is not None and capacity <= self._capacity:
+            return
+        if self._capacity:
+            capacity = max(capacity, self._capacity * 2)
+        for path, itemsize in ((self._vectors_path, 2 * self.dim), (self._lists_path, 4)):
+            size = capacity * itemsize
+            with open(path, 'ab') as f:
+                if f.tell() < size:
+                    f.truncate(size)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float16, mode='r+',
+                                  shape=(capacity, self.dim))
+        self._lists = np.memmap(self._lists_path, dtype=np.int32, mode='r+', shape=(capacity,))
+        self._capacity = capacity
+        if self._centroids is None and self._centroids_path.exists():
+            self._centroids = np.load(self._centroids_path)
+
+    def _reset(self):
+        """数据库被重建后清空索引文件"""
+        self._vectors = self._lists = self._centroids = None
+        self._capacity = 0
+        for path in (self._vectors_path, self._lists_path, self._centroids_path):
+            path.unlink(missing_ok=True)
+
+    # -- 写入 ---------------------------------------------------------------
+
+    def sync(self, db):
+        """为 rowid 超过水位的新日记计算向量，返回新增条数
+
+        共用数据目录的多个进程可能同时同步：每一批都先用 BEGIN IMMEDIATE 取得
+        数据库的写锁，再读取行数和水位，写入向量文件并在提交前刷盘，两个进程
+        不会把各自的向量写进同一行。会先提交连接上未提交的改动。
+        """
+        with self._lock:
+            added = 0
+            if db.in_transaction:
+                db.commit()
+            while True:
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    count = _get_meta(db, 'count')
+                    if count == 0 and (self._capacity or self._vectors_path.exists()):
+                        self._reset()
+                    watermark = _get_meta(db, 'watermark')
+                    added_now = self._sync_batch(db, count, watermark)
+                    # 向量和行号映射不影响洞察等按数据版本缓存的结果
+                    commit_quietly(db)
+                except BaseException:
+                    db.rollback()
+                    raise
+                if not added_now:
+                    break
+                added += added_now
+
+            count = _get_meta(db, 'count')
+            if added:
+                logger.debug(f"Indexed {added} entries, {count} vectors in total")
+            trained = _get_meta(db, 'trained_count')
+            if count >= IVF_MIN_ROWS and count >= 2 * trained and not self._training:
+                self._start_training(count, db)
+            return added
+
+    def _sync_batch(self, db, count, watermark):
+        """在写事务中为水位之后的一批日记写入向量，返回本批条数"""
+        rows = db.execute('''
+            SELECT e.rowid, e.id, e.title, x.content
+            FROM entries e
+            JOIN entry_texts x ON x.entry_id = e.id
+            WHERE e.rowid > ?
+            ORDER BY e.rowid
+            LIMIT ?
+        ''', (watermark, SYNC_BATCH_SIZE)).fetchall()
+        if not rows:
+            return 0
+        self._open(count + len(rows))
+        mapping = []
+        for rowid, entry_id, title, content in rows:
+            vector = vectorize(f"{title or ''}\n{content or ''}", self.dim)
+            self._vectors[count] = vector
+            self._lists[count] = self._nearest_list(vector)
+            mapping.append((entry_id, count))
+            count += 1
+            watermark = rowid
+        db.executemany("INSERT OR REPLACE INTO entry_vectors (entry_id, row) VALUES (?, ?)", mapping)
+        _set_meta(db, 'count', count)
+        _set_meta(db, 'watermark', watermark)
+        # 先把向量写到文件，再提交行数，其他进程读到的行一定已经写好
+        self._vectors.flush()
+        self._lists.flush()
+        return len(rows)
+
+    def _nearest_list(self, vector):
+        if self._centroids is None:
+            return -1
+        return int(np.argmax(self._centroids @ vector))
+
+    # -- IVF 训练 -----------------------------------------------------------
+
+    def _start_training(self, count, db):
+        """在后台线程中重新训练聚类中心，训练期间查询继续使用旧索引"""
+        self._training = True
+        db_path = db.execute("PRAGMA database_list").fetchone()[2]
+        thread = threading.Thread(target=self._train, args=(count, db_path), daemon=True)
+        thread.start()
+
+    def _train(self, count, db_path):
+        try:
+            nlist = int(min(4096, max(16, math.sqrt(count))))
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(count, size=min(count, KMEANS_SAMPLE), replace=False))
+            sample = np.asarray(self._vectors[sample_rows], dtype=np.float32)
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+            for _ in range(KMEANS_ITERATIONS):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                nonempty = norms[:, 0] > 0
+                centroids[nonempty] = sums[nonempty] / norms[nonempty]
+
+            lists = np.empty(count, dtype=np.int32)
+            for start in range(0, count, 65536):
+                chunk = np.asarray(self._vectors[start:min(start + 65536, count)], dtype=np.float32)
+                lists[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+            db = sqlite3.connect(db_path)
+            try:
+                with self._lock:
+                    self._lists[:count] = lists
+                    self._centroids = centroids
+                    # 训练期间新增的行按新的中心重新分配
+                    current = _get_meta(db, 'count')
+                    if current > count:
+                        chunk = np.asarray(self._vectors[count:current], dtype=np.float32)
+                        self._lists[count:current] = np.argmax(chunk @ centroids.T, axis=1)
+                    self._lists.flush()
+                    np.save(self._centroids_path, centroids)
+                    _set_meta(db, 'trained_count', count)
+                    db.commit()
+            finally:
+                db.close()
+            logger.info(f"Trained vector index with {nlist} lists over {count} vectors")
+        except Exception as e:
+            logger.error(f"Vector index training failed: {e}", exc_info=True)
+        finally:
+            self._training = False
+
+    # -- 查询 ---------------------------------------------------------------
+
+    def _query(self, db, vector, k, exclude_row=None):
+        with self._lock:
+            count = _get_meta(db, 'count')
+            if count == 0:
+                return []
+            self._open(count)
+            vectors = self._vectors[:count]
+            if self._centroids is not None and count >= IVF_MIN_ROWS:
+                probes = np.argsort(self._centroids @ vector)[-IVF_PROBES:]
+                lists = self._lists[:count]
+                rows = np.flatnonzero(np.isin(lists, probes) | (lists == -1))
+                scores = np.asarray(vectors[rows], dtype=np.float32) @ vector
+            else:
+                rows = np.arange(count)
+                scores = np.asarray(vectors, dtype=np.float32) @ vector
+
+        if exclude_row is not None:
+            scores[rows == exclude_row] = -np.inf
+        k = min(k, len(rows))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = [(int(rows[i]), float(scores[i])) for i in top if np.isfinite(scores[i]) and scores[i] > 0]
+        if not top:
+            return []
+
+        placeholders = ','.join('?' for _ in top)
+        ids = dict(db.execute(
+            f"SELECT row, entry_id FROM entry_vectors WHERE row IN ({placeholders})",
+            [row for row, _ in top]
+        ).fetchall())
+        return [(ids[row], score) for row, score in top if row in ids]
+
+    def search(self, db, text, k=10):
+        """语义搜索，返回 [(entry_id, score)]"""
+        return self._query(db, vectorize(text, self.dim), k)
+
+    def similar(self, db, entry_id, k=10):
+        """查找与某篇日记最相似的日记，返回 [(entry_id, score)]"""
+        row = db.execute("SELECT row FROM entry_vectors WHERE entry_id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return []
+        with self._lock:
+            self._open(row[0] + 1)
+            vector = np.asarray(self._vectors[row[0]], dtype=np.float32)
+        return self._query(db, vector, k, exclude_row=row[0])
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(directory=None):
+    """获取共享的向量索引"""
+    directory = str(directory or Config.VECTOR_DIR)
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = _indexes[directory] = VectorIndex(directory)
+        return index
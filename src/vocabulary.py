@@ -0,0 +1,137 @@
+"""心情、天气、地点的词表
+
+三种取值各有一张词表（moods、weathers、locations），entries 用 mood_id、
+weather_id、location_id 引用，不再在每一行重复存文本。统计按整数 id 分组，
+(date, mood_id, weather_id, location_id) 索引覆盖按时间段的分类统计。
+新用户的词表用 VOCABULARY_CONFIG['defaults'] 初始化，之后在编辑器中输入的
+新值追加到词表末尾。
+
+旧的 mood、weather、location 文本列保留但不再写入。migrate() 把其中的值
+原样（不截断）转换成 id；旧值在下一次 migrate() 时才清空，转换和清空不在同一个
+事务中。
+"""
+import logging
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+VOCABULARY_CONFIG = Config.VOCABULARY_CONFIG
+
+KINDS = ('mood', 'weather', 'location')
+TABLES = {'mood': 'moods', 'weather': 'weathers', 'location': 'locations'}
+
+
+def ensure_schema(db):
+    """创建词表、entries 的 id 列和索引；空词表填入默认值"""
+    columns = {row[1] for row in db.execute("PRAGMA table_info(entries)")}
+    for kind in KINDS:
+        table = TABLES[kind]
+        db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                position INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        if f'{kind}_id' not in columns:
+            db.execute(f"ALTER TABLE entries ADD COLUMN {kind}_id INTEGER REFERENCES {table}(id)")
+        if db.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None:
+            db.executemany(f"INSERT INTO {table} (name, position) VALUES (?, ?)",
+                           [(name, position) for position, name in enumerate(VOCABULARY_CONFIG['defaults'][kind])])
+    _ensure_index(db)
+
+
+def _ensure_index(db):
+    db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_entries_date_categories
+            ON entries(date, mood_id, weather_id, location_id)
+    ''')
+
+
+def options(db, kind):
+    """词表中的取值，按编辑器中的顺序"""
+    return [row[0] for row in db.execute(f"SELECT name FROM {TABLES[kind]} ORDER BY position, id")]
+
+
+def names(db, kind):
+    """{id: 名称}"""
+    return dict(db.execute(f"SELECT id, name FROM {TABLES[kind]}"))
+
+
+def resolve(db, kind, name, truncate=True):
+    """名称对应的 id，词表中没有时追加到末尾；空值返回 None
+
+    truncate 为 False 时不按 VOCABULARY_CONFIG['max_length'] 截断（迁移旧值时）。
+    """
+    name = (name or '').strip()
+    if truncate:
+        name = name[:VOCABULARY_CONFIG['max_length']]
+    if not name:
+        return None
+    table = TABLES[kind]
+    db.execute(f'''
+        INSERT OR IGNORE INTO {table} (name, position)
+        VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM {table}))
+    ''', (name,))
+    return db.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+
+
+def migrate(db):
+    """把旧文本列中的值换成词表 id，返回改写的行数；须在 ensure_schema 之后调用
+
+    先清空上一次已经转换（已有 id）的行的旧值并提交，再转换还没有 id 的行并提交；
+    刚转换的旧值留到下一次运行再清空。出现次数多的值先加入词表，排在前面。
+    由维护任务或命令行（schema.py migrate）调用，腾出的页由随后的 VACUUM 归还。
+    """
+    moved = _clear_converted(db)
+    pending = {
+        kind: [row[0] for row in db.execute(f'''
+            SELECT {kind} FROM entries
+            WHERE {kind}_id IS NULL AND trim({kind}) != ''
+            GROUP BY {kind}
+            ORDER BY COUNT(*) DESC
+        ''')]
+        for kind in KINDS
+    }
+    if not any(pending.values()):
+        return moved
+    # 旧值到 id 的映射放进临时表，一条 UPDATE 扫描一遍 entries 改写三列；
+    # 逐行维护索引比改写完再重建慢得多，先删除索引
+    db.execute("DROP INDEX IF EXISTS idx_entries_date_categories")
+    db.execute("CREATE TEMP TABLE vocabulary_map (kind TEXT, name TEXT, id INTEGER, PRIMARY KEY (kind, name))")
+    try:
+        db.executemany("INSERT INTO temp.vocabulary_map (kind, name, id) VALUES (?, ?, ?)",
+                       [(kind, name, resolve(db, kind, name, truncate=False)) for kind, values in pending.items() for name in values])
+        assignments = ', '.join(
+            f"{kind}_id = COALESCE({kind}_id, (SELECT id FROM temp.vocabulary_map m "
+            f"WHERE m.kind = '{kind}' AND m.name = entries.{kind}))"
+            for kind in KINDS
+        )
+        converted = db.execute(f'''
+            UPDATE entries SET {assignments}
+            WHERE {' OR '.join(f"({kind}_id IS NULL AND trim({kind}) != '')" for kind in KINDS)}
+        ''').rowcount
+    finally:
+        db.execute("DROP TABLE temp.vocabulary_map")
+    _ensure_index(db)
+    db.commit()
+    if converted:
+        logger.info(f"Moved mood/weather/location of {converted} entries into lookup tables")
+    return moved + converted
+
+
+def _clear_converted(db):
+    """清空已有 id 的行（以及只有空白的值）的旧文本列并提交，返回改写的行数"""
+    assignments = ', '.join(
+        f"{kind} = CASE WHEN {kind}_id IS NOT NULL OR trim({kind}) = '' THEN NULL ELSE {kind} END"
+        for kind in KINDS
+    )
+    cleared = db.execute(f'''
+        UPDATE entries SET {assignments}
+        WHERE {' OR '.join(f"({kind} IS NOT NULL AND ({kind}_id IS NOT NULL OR trim({kind}) = ''))" for kind in KINDS)}
+    ''').rowcount
+    db.commit()
+    if cleared:
+        logger.info(f"Cleared legacy mood/weather/location text of {cleared} entries")
+    return cleared
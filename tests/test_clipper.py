@@ -0,0 +1,139 @@
+"""Clipper against a local http.server: revalidation, extraction and images."""
+import asyncio
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from clipper import ClipError, Clipper  # noqa: E402
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+ARTICLE = """<html><head><title>Page title</title></head><body>
+<nav><p>Home, About, Contact, and a long list of other navigation links here</p></nav>
+<div class="post-content">
+  <p>The first paragraph of the article, long enough to be scored as body text.</p>
+  <p>A second paragraph, also long enough, with commas, and a full stop.</p>
+  <img src="/image.png">
+  <img src="/missing.png">
+</div>
+<div class="sidebar"><p>Related posts, share buttons, and other sidebar content go here.</p></div>
+</body></html>"""
+
+# 没有任何段落标签，只能退回到整个节点的文本
+BARE = """<html><head><meta property="og:title" content="Bare page"></head>
+<body><div>Just some text without paragraph markup</div></body></html>"""
+
+
+class Handler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/article':
+            if self.headers.get('If-None-Match') == self.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send(ARTICLE.encode(), 'text/html; charset=utf-8', ETag=self.etag)
+        elif self.path == '/bare':
+            self._send(BARE.encode(), 'text/html; charset=utf-8')
+        elif self.path == '/image.png':
+            self._send(PNG, 'image/png')
+        elif self.path == '/large':
+            self._send(b'x' * 4096, 'text/plain')
+        elif self.path == '/stream':
+            # 不带 Content-Length，只能边读边计数
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.end_headers()
+            self.wfile.write(b'x' * 4096)
+        else:
+            self.send_error(404)
+
+    def _send(self, body, content_type, **headers):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ClipperTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.requests = []
+        self.root = Path(tempfile.mkdtemp(prefix='clipper-test-'))
+        (self.root / 'uploads').mkdir()
+
+    def clipper(self, **settings):
+        return Clipper(upload_dir=self.root / 'uploads', data_dir=self.root, cache_dir=self.root / 'cache',
+                       settings={'allow_private_hosts': True, **settings})
+
+    def run_clipper(self, method, *args, **settings):
+        async def run():
+            async with self.clipper(**settings) as clipper:
+                return await getattr(clipper, method)(*args)
+        return asyncio.run(run())
+
+    def test_revalidates_with_etag(self):
+        first = self.run_clipper('fetch', f"{self.base}/article")
+        second = self.run_clipper('fetch', f"{self.base}/article")
+        self.assertEqual(first, second)
+        self.assertEqual(Handler.requests, [('/article', None), ('/article', '"v1"')])
+
+    def test_extracts_article_and_localises_images(self):
+        article = self.run_clipper('clip', f"{self.base}/article")
+        self.assertIsNone(article['error'])
+        self.assertEqual(article['title'], 'Page title')
+        self.assertIn('The first paragraph', article['text'])
+        self.assertNotIn('sidebar', article['text'])
+        self.assertNotIn('navigation', article['text'])
+        self.assertEqual(article['images'], [f"{self.base}/image.png", f"{self.base}/missing.png"])
+        self.assertEqual(len(article['attachments']), 1)
+        path = article['attachments'][0]
+        self.assertTrue(path.startswith('uploads/') and path.endswith('.png'))
+        self.assertEqual((self.root / path).read_bytes(), PNG)
+
+    def test_falls_back_to_node_text(self):
+        article = self.run_clipper('clip', f"{self.base}/bare")
+        self.assertEqual(article['title'], 'Bare page')
+        self.assertEqual(article['text'], 'Just some text without paragraph markup')
+
+    def test_rejects_oversized_response(self):
+        for path in ('/large', '/stream'):
+            with self.subTest(path=path), self.assertRaises(ClipError):
+                self.run_clipper('fetch', f"{self.base}{path}", max_bytes=1024)
+        self.assertEqual(len(self.run_clipper('fetch', f"{self.base}/stream")[0]), 4096)
+
+    def test_rejects_private_hosts(self):
+        for url in (f"{self.base}/article", "http://localhost/", "http://169.254.169.254/latest/meta-data/"):
+            with self.subTest(url=url), self.assertRaises(ClipError):
+                self.run_clipper('fetch', url, allow_private_hosts=False)
+        self.assertEqual(Handler.requests, [])
+
+
+if __name__ == "__main__":
+    unittest.main()